@@ -12,19 +12,27 @@ Steps:
 5. Options (🤌) - Delete data from board
 """
 
+import sys
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Headless mode (python Ibis.py provision ...): hand off before tkinter is imported
+    from ibis_cli import main as cli_main
+    sys.exit(cli_main())
+
+# Only what the first frame needs is imported here. Serial port listing,
+# the browser, HTTP and the OAuth server load on first use - python
+# ibis_bench.py startup keeps an eye on that.
 import tkinter as tk
-from tkinter import ttk, messagebox
-import serial
-import serial.tools.list_ports
-import json
+from tkinter import ttk
+import os
 import time
-import webbrowser
-import threading
-import urllib.parse
-import urllib.request
-import http.server
-import socketserver
 import random
+import threading
+from ibis_link import (BoardLink, BAUD_RATE, SPORT_TYPES,
+                       TRACK_PERIODS, REFRESH_OPTIONS, ApplyTransaction)
+from ibis_tasks import TkExecutor, AnimationClock
+from ibis_ports import PortWatcher, find_board, port_label, is_usb
+from ibis_trace import Trace
 
 APP_TITLE = "🪶 Ibis Setup 🪶"
 APP_VERSION = "4.1"
@@ -32,9 +40,14 @@ WINDOW_WIDTH = 650
 WINDOW_HEIGHT = 630
 LOADING_WIDTH = 450
 LOADING_HEIGHT = 250
-BAUD_RATE = 115200
-SERIAL_TIMEOUT = 15
-WRITE_TIMEOUT = 15
+PROGRESS_POLL_MS = 100
+FEATHER_INTERVAL_MS = 150
+PROGRESS_WIDTH = 360
+PROGRESS_HEIGHT = 8
+DEBUG_WIDTH = 620
+DEBUG_HEIGHT = 380
+DEBUG_REFRESH_MS = 500
+DEBUG_ROWS = 60
 
 # ╔═══════════════════════════════════════════════════════════════════════════════╗
 # ║                        🎨 COLOR SCHEME - EDIT HERE 🎨                         ║
@@ -68,22 +81,27 @@ COLOR_STEP_COMPLETE = "#4fd2b0"
 SUBTITLE_FONT = ('Segoe UI', 11)
 SUBTITLE_COLOR = "#ffffff"
 
-SPORT_TYPES = ["Run", "Ride", "Swim", "Hike", "Walk"]
-TRACK_PERIODS = ["Yearly", "Monthly", "Weekly"]
-REFRESH_OPTIONS = [
-    ("Every hour", 1, "~3-5 days battery"),
-    ("Every 6 hours", 6, "~2-3 weeks battery"),
-    ("Every 12 hours", 12, "~1 month battery"),
-    ("Once a day", 24, "~2 months battery"),
-    ("Every 2 days", 48, "~3-4 months battery"),
-    ("Once a week", 168, "~6+ months battery")
-]
 F = "🪶"
 
-OAUTH_REDIRECT_PORT = 8089
-OAUTH_REDIRECT_URI = f"http://localhost:{OAUTH_REDIRECT_PORT}/callback"
-STRAVA_AUTH_URL = "https://www.strava.com/oauth/authorize"
-STRAVA_TOKEN_URL = "https://www.strava.com/oauth/token"
+OAUTH_READY_TIMEOUT = 5
+
+# What the progress bar says during each stage of FETCH_STRAVA
+FETCH_STAGE_LABELS = {
+    'wifi': "Joining WiFi",
+    'token': "Logging in to Strava",
+    'pages': "Reading activities",
+    'aggregate': "Adding it all up",
+    'render': "Drawing the dashboard",
+}
+
+# Loading message category for each ApplyTransaction stage
+APPLY_MESSAGES = {
+    'save': 'save_config',
+    'test_wifi': 'test_wifi',
+    'fetch': 'fetch_strava',
+    'summary': 'fetch_strava',
+    'setup_screen': 'update_display',
+}
 
 # Funny loading messages for different operations
 FUNNY_MESSAGES = {
@@ -144,36 +162,6 @@ FUNNY_MESSAGES = {
 }
 
 
-class OAuthCallbackHandler(http.server.SimpleHTTPRequestHandler):
-    def __init__(self, *args, callback=None, **kwargs):
-        self.callback = callback
-        super().__init__(*args, **kwargs)
-    
-    def do_GET(self):
-        if self.path.startswith('/callback'):
-            query = urllib.parse.urlparse(self.path).query
-            params = urllib.parse.parse_qs(query)
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            if 'code' in params:
-                self.wfile.write("""<html><body style="font-family:'Segoe UI',Arial,sans-serif;background:#1a1a2e;color:#eaeaea;text-align:center;padding:60px 20px;">
-                    <h1 style="color:#4ecca3;font-size:52px;font-weight:900;letter-spacing:3px;margin-bottom:10px;">SUCCESS!!!</h1>
-                    <p style="font-size:20px;color:#9da3cc;margin-top:20px;">YOU CAN NOW CLOSE THIS WINDOW</p></body></html>""".encode())
-                if self.callback:
-                    self.callback(params['code'][0])
-            else:
-                self.wfile.write(b"<html><body style='font-family:Arial;background:#1a1a2e;color:#e94560;text-align:center;padding:50px;'><h1>Authorization failed.</h1></body></html>")
-                if self.callback:
-                    self.callback(None)
-        else:
-            self.send_response(404)
-            self.end_headers()
-    
-    def log_message(self, format, *args):
-        pass
-
-
 class IbisSetupWizard:
     def __init__(self, root):
         self.root = root
@@ -189,12 +177,33 @@ class IbisSetupWizard:
         y = (screen_height - WINDOW_HEIGHT) // 2
         self.root.geometry(f"{WINDOW_WIDTH}x{WINDOW_HEIGHT}+{x}+{y}")
         
-        self.serial_conn = None
+        self.link = None
         self.connected = False
         self.current_step = 0
         self.total_steps = 5  # Connect, WiFi, Strava, Personalize, Options
         self.loading_overlay = None
-        self.loading_animation_id = None
+        self.loading_visible = False
+        self.fetch_progress = None
+        # Serial and HTTP work runs here; results come back on the Tk thread
+        self.tasks = TkExecutor(root).start()
+        # Every animation ticks off this one clock
+        self.clock = AnimationClock(root)
+        # Hot-plug: the port list follows what's plugged in and new boards connect themselves
+        self.port_watcher = PortWatcher(lambda *change: self.tasks.call_soon(self._ports_changed, *change))
+        self.port_devices = {}      # combobox label -> device
+        self.probing = False
+        self.connect_pending = None  # what to do once a running probe comes back empty
+        # Opt-in: IBIS_TRACE=file.jsonl, or Ctrl+Shift+D for the debug panel
+        self.trace = Trace()
+        if os.environ.get('IBIS_TRACE'):
+            self.trace.start(self.clock, os.environ['IBIS_TRACE'])
+        self.debug_panel = None
+        self.root.bind('<Control-Shift-D>', self.toggle_debug_panel)
+        # Future for the OAuth callback server - started once, kept until the window closes
+        self.oauth_arming = None
+        # Keep-alive Strava connections, shared by every worker (see strava_client)
+        self.strava = None
+        self.strava_lock = threading.Lock()
         
         # Track which steps are complete (properly validated)
         self.wifi_complete = False
@@ -202,6 +211,8 @@ class IbisSetupWizard:
         
         # Track if setup has been completed at least once this session
         self.setup_done = False
+        # Last save/test/fetch run - a failed one is resumed at the stage that failed
+        self.apply = None
         
         # Data variables
         self.port_var = tk.StringVar()
@@ -220,7 +231,9 @@ class IbisSetupWizard:
         
         self.create_ui()
         self.show_step(0)
-        self.scan_ports()
+        # Once the first frame is up: look for boards and get the loading window ready
+        self.root.after_idle(self.port_watcher.start)
+        self.root.after_idle(self._build_loading_overlay)
     
     def create_ui(self):
         self.main_frame = tk.Frame(self.root, bg=COLOR_BG)
@@ -238,6 +251,13 @@ class IbisSetupWizard:
         # Content area
         self.content_frame = tk.Frame(self.main_frame, bg=COLOR_CARD)
         self.content_frame.pack(fill=tk.BOTH, expand=True, pady=12)
+        self.content_frame.grid_rowconfigure(0, weight=1)
+        self.content_frame.grid_columnconfigure(0, weight=1)
+        # Step views are built on first visit and kept; navigation just swaps them
+        self.step_builders = [self.build_connect_step, self.build_wifi_step, self.build_strava_step,
+                              self.build_settings_step, self.build_options_step]
+        self.step_frames = {}
+        self.visible_step = None
         
         # Navigation
         self.create_navigation()
@@ -330,10 +350,17 @@ class IbisSetupWizard:
     
     def show_step(self, step_num):
         self.current_step = step_num
+        self.trace.record('step', step=step_num)
+        if step_num == 2:
+            self.arm_oauth()   # listening well before Let Ibis In is clicked
         self.update_step_indicator()
         
-        for widget in self.content_frame.winfo_children():
-            widget.destroy()
+        if step_num not in self.step_frames:
+            self.step_frames[step_num] = self.step_builders[step_num]()
+        if self.visible_step is not None and self.visible_step != step_num:
+            self.step_frames[self.visible_step].grid_remove()
+        self.step_frames[step_num].grid(row=0, column=0, sticky='nsew')
+        self.visible_step = step_num
         
         if step_num == 0:
             self.back_btn.pack_forget()
@@ -341,33 +368,27 @@ class IbisSetupWizard:
             self.back_btn.pack(side=tk.LEFT)
         
         if step_num == 0:
-            self.show_connect_step()
             self.next_btn.config(text="Next \u2192", bg=COLOR_BTN_PRIMARY, 
                                 activebackground=COLOR_BTN_PRIMARY_HOVER)
             self.next_btn.pack(side=tk.RIGHT)
         elif step_num == 1:
-            self.show_wifi_step()
             self.next_btn.config(text="Save WiFi \u2192", bg=COLOR_BTN_SUCCESS,
                                 activebackground=COLOR_BTN_SUCCESS_HOVER)
             self.next_btn.pack(side=tk.RIGHT)
         elif step_num == 2:
-            self.show_strava_step()
             self.next_btn.config(text="Save Strava \u2192", bg=COLOR_BTN_SUCCESS,
                                 activebackground=COLOR_BTN_SUCCESS_HOVER)
             self.next_btn.pack(side=tk.RIGHT)
         elif step_num == 3:
-            self.show_settings_step()
             self.next_btn.config(text="Finish Setup", bg=COLOR_BTN_SUCCESS,
                                 activebackground=COLOR_BTN_SUCCESS_HOVER)
             self.next_btn.pack(side=tk.RIGHT)
         elif step_num == 4:
-            self.show_options_step()
             self.next_btn.pack_forget()
     
     # ==================== STEP 1: CONNECT ====================
-    def show_connect_step(self):
+    def build_connect_step(self):
         content = tk.Frame(self.content_frame, bg=COLOR_CARD, padx=30, pady=25)
-        content.pack(fill=tk.BOTH, expand=True)
         
         tk.Label(content, text=f"Connect Your Board",
                 font=('Segoe UI', 16, 'bold'), bg=COLOR_CARD, fg=COLOR_ACCENT).pack(pady=(0, 8))
@@ -398,17 +419,22 @@ class IbisSetupWizard:
                                    bg=COLOR_CARD, fg=COLOR_DISCONNECTED, font=('Segoe UI', 11))
         self.conn_status.pack()
         
+        find_link = tk.Label(content, text="Not sure which port? Find my board",
+                            bg=COLOR_CARD, fg=COLOR_LINK, font=('Segoe UI', 11, 'underline'), cursor='hand2')
+        find_link.pack(pady=(10, 0))
+        find_link.bind('<Button-1>', lambda e: self.find_my_board())
+        
         help_link = tk.Label(content, text=f"Connection issues? Click here for help",
                             bg=COLOR_CARD, fg=COLOR_LINK, font=('Segoe UI', 11, 'underline'), cursor='hand2')
         help_link.pack(pady=(15, 0))
         help_link.bind('<Button-1>', lambda e: self.show_connection_help())
         
         self.update_connect_ui()
+        return content
     
     # ==================== STEP 2: WIFI ====================
-    def show_wifi_step(self):
+    def build_wifi_step(self):
         content = tk.Frame(self.content_frame, bg=COLOR_CARD, padx=30, pady=25)
-        content.pack(fill=tk.BOTH, expand=True)
         
         tk.Label(content, text=f"{F} WiFi Settings {F}",
                 font=('Segoe UI', 16, 'bold'), bg=COLOR_CARD, fg=COLOR_ACCENT).pack(pady=(0, 8))
@@ -443,11 +469,11 @@ class IbisSetupWizard:
                 text="*WiFi only connects briefly to fetch Strava stats at each refresh interval.",
                 bg=COLOR_CARD, fg=COLOR_TEXT_DIM, font=('Segoe UI', 9),
                 justify=tk.CENTER).pack(pady=(20, 0))
+        return content
     
     # ==================== STEP 3: STRAVA ====================
-    def show_strava_step(self):
+    def build_strava_step(self):
         content = tk.Frame(self.content_frame, bg=COLOR_CARD, padx=30, pady=25)
-        content.pack(fill=tk.BOTH, expand=True)
         
         tk.Label(content, text=f"Connect Strava",
                 font=('Segoe UI', 16, 'bold'), bg=COLOR_CARD, fg=COLOR_ACCENT).pack(pady=(0, 8))
@@ -459,7 +485,7 @@ class IbisSetupWizard:
         strava_link = tk.Label(subtitle_frame, text=" strava.com/settings/api ",
                               font=('Segoe UI', 11, 'underline'), bg=COLOR_CARD, fg=COLOR_LINK, cursor='hand2')
         strava_link.pack(side=tk.LEFT)
-        strava_link.bind('<Button-1>', lambda e: webbrowser.open("https://www.strava.com/settings/api"))
+        strava_link.bind('<Button-1>', lambda e: self.open_browser("https://www.strava.com/settings/api"))
         tk.Label(subtitle_frame, text="and find your API credentials.",
                 font=SUBTITLE_FONT, bg=COLOR_CARD, fg=SUBTITLE_COLOR).pack(side=tk.LEFT)
 
@@ -494,15 +520,25 @@ class IbisSetupWizard:
                  bg=COLOR_BTN_SUCCESS, fg=COLOR_BTN_TEXT, font=('Segoe UI', 12, 'bold'),
                  relief=tk.FLAT, padx=25, pady=10, cursor='hand2', highlightthickness=0).pack()
         
-        # Checkmark right under the button
+        # Checkmark right under the button, shown whenever there is a refresh token
+        self.token_check = tk.Label(token_section, text="\u2713 The Ibis has Strava access!", bg=COLOR_CARD,
+                                    fg=COLOR_SUCCESS, font=('Segoe UI', 11, 'bold'))
+        self.token_status = tk.Label(token_section, textvariable=self.token_status_var, bg=COLOR_CARD,
+                                     fg=COLOR_TEXT_DIM, font=('Segoe UI', 10))
+        self.token_status.pack(pady=(8, 0))
+        self.refresh_token_var.trace_add('write', self.update_token_check)
+        self.update_token_check()
+        return content
+    
+    def update_token_check(self, *args):
         if self.refresh_token_var.get():
-            tk.Label(token_section, text="\u2713 The Ibis has Strava access!", bg=COLOR_CARD,
-                    fg=COLOR_SUCCESS, font=('Segoe UI', 11, 'bold')).pack(pady=(8, 0))
+            self.token_check.pack(before=self.token_status, pady=(8, 0))
+        else:
+            self.token_check.pack_forget()
     
     # ==================== STEP 4: PERSONALIZE ====================
-    def show_settings_step(self):
+    def build_settings_step(self):
         content = tk.Frame(self.content_frame, bg=COLOR_CARD, padx=30, pady=25)
-        content.pack(fill=tk.BOTH, expand=True)
         
         tk.Label(content, text=f"Personalize Your Dashboard",
                 font=('Segoe UI', 16, 'bold'), bg=COLOR_CARD, fg=COLOR_ACCENT).pack(pady=(0, 8))
@@ -553,11 +589,11 @@ class IbisSetupWizard:
         
         tk.Label(row5, textvariable=self.battery_var, bg=COLOR_CARD,
                 fg=COLOR_SUCCESS, font=('Segoe UI', 10, 'bold')).pack(side=tk.LEFT, padx=(10, 0))
+        return content
     
     # ==================== STEP 5: OPTIONS ====================
-    def show_options_step(self):
+    def build_options_step(self):
         content = tk.Frame(self.content_frame, bg=COLOR_CARD, padx=30, pady=25)
-        content.pack(fill=tk.BOTH, expand=True)
         
         tk.Label(content, text=" Delete Data From Board ",
                 font=('Segoe UI', 16, 'bold'), bg=COLOR_CARD, fg=COLOR_DANGER).pack(pady=(0, 8))
@@ -571,6 +607,7 @@ class IbisSetupWizard:
                  font=('Segoe UI', 11, 'bold'), relief=tk.FLAT,
                  padx=25, pady=10, cursor='hand2', highlightthickness=0,
                  activebackground=COLOR_BTN_DANGER_HOVER).pack()
+        return content
     
     # ==================== CUSTOM STYLED POPUP ====================
     def _center_on_parent(self, window, w, h):
@@ -716,6 +753,26 @@ class IbisSetupWizard:
                 self.battery_var.set(est)
                 break
     
+    def build_config(self):
+        """Everything the wizard knows, as the dict SET_CONFIG expects"""
+        config = {
+            'ssid': self.ssid_var.get().strip(),
+            'password': self.password_var.get(),
+            'name': self.name_var.get().strip(),
+            'title': '',
+            'clientID': self.client_id_var.get().strip(),
+            'clientSecret': self.client_secret_var.get().strip(),
+            'refreshToken': self.refresh_token_var.get().strip(),
+            'sport': self.sport_var.get(),
+            'goal': self.get_goal_value() or 1000,
+            'trackPeriod': TRACK_PERIODS.index(self.period_var.get())
+        }
+        for n, v, _ in REFRESH_OPTIONS:
+            if n == self.refresh_var.get():
+                config['refreshHours'] = v
+                break
+        return config
+    
     def get_goal_value(self):
         goal_str = self.goal_var.get().strip()
         if not goal_str:
@@ -747,84 +804,102 @@ class IbisSetupWizard:
             self.finish_setup()
     
     # ==================== LOADING OVERLAY ====================
-    def show_loading(self, title, message, show_dashboard_msg=False):
+    def _build_loading_overlay(self):
+        """The one loading window: built once, then only shown and hidden"""
         if self.loading_overlay:
-            self.loading_overlay.destroy()
-        
+            return
         self.loading_overlay = tk.Toplevel(self.root)
-        self.loading_overlay.title(title)
+        self.loading_overlay.withdraw()
         self.loading_overlay.geometry(f"{LOADING_WIDTH}x{LOADING_HEIGHT}")
         self.loading_overlay.resizable(False, False)
         self.loading_overlay.transient(self.root)
-        self.loading_overlay.grab_set()
-        
-        self._center_on_parent(self.loading_overlay, LOADING_WIDTH, LOADING_HEIGHT)
-        
         self.loading_overlay.configure(bg=COLOR_LOADING_BG)
+        # It goes away by itself once the board answers
+        self.loading_overlay.protocol("WM_DELETE_WINDOW", lambda: None)
         
         center = tk.Frame(self.loading_overlay, bg=COLOR_LOADING_BG)
         center.place(relx=0.5, rely=0.5, anchor='center')
         
-        tk.Label(center, text=title, font=('Segoe UI', 16, 'bold'),
-                bg=COLOR_LOADING_BG, fg=COLOR_ACCENT).pack(pady=(0, 15))
+        self.loading_title = tk.Label(center, font=('Segoe UI', 16, 'bold'),
+                                      bg=COLOR_LOADING_BG, fg=COLOR_ACCENT)
+        self.loading_title.pack(pady=(0, 15))
         
         self.feather_label = tk.Label(center, text=F, font=('Segoe UI', 12),
                                       bg=COLOR_LOADING_BG, fg=COLOR_ACCENT)
         self.feather_label.pack(pady=(0, 12))
         
-        self.loading_msg = tk.Label(center, text=message, font=('Segoe UI', 11),
+        self.loading_msg = tk.Label(center, font=('Segoe UI', 11),
                                    bg=COLOR_LOADING_BG, fg=COLOR_SUCCESS, wraplength=400)
         self.loading_msg.pack(pady=(0, 8))
         
-        # Only show the dashboard message for Finish Setup
+        # Packed only while a fetch reports progress
+        self.progress_canvas = tk.Canvas(center, width=PROGRESS_WIDTH, height=PROGRESS_HEIGHT,
+                                         bg=COLOR_STEP_INACTIVE, highlightthickness=0)
+        self.progress_fill = self.progress_canvas.create_rectangle(
+            0, 0, 0, PROGRESS_HEIGHT, fill=COLOR_SUCCESS, width=0)
+        self.progress_label = tk.Label(center, font=('Segoe UI', 9),
+                                       bg=COLOR_LOADING_BG, fg=COLOR_TEXT_DIM)
+        
+        # Packed only for Finish Setup
+        self.dashboard_msg = tk.Label(center, text="This window will close once your dashboard\nsuccessfully displays your stats",
+                                      font=('Segoe UI', 11), bg=COLOR_LOADING_BG, fg=COLOR_TEXT,
+                                      justify=tk.CENTER)
+    
+    def show_loading(self, title, message, show_dashboard_msg=False):
+        self.trace.begin(title.replace(F, '').strip())
+        self._build_loading_overlay()
+        self.loading_overlay.title(title)
+        self.loading_title.config(text=title)
+        self.loading_msg.config(text=message)
+        self.feather_label.config(text=F)
+        self.progress_canvas.pack_forget()
+        self.progress_label.pack_forget()
         if show_dashboard_msg:
-            tk.Label(center, text="This window will close once your dashboard\nsuccessfully displays your stats",
-                    font=('Segoe UI', 11), bg=COLOR_LOADING_BG, fg=COLOR_TEXT,
-                    justify=tk.CENTER).pack()
-        
-        self.grow_feathers()
-        # Don't call update() here - it blocks the animation loop
-        self.loading_overlay.update_idletasks()
+            self.dashboard_msg.pack()
+        else:
+            self.dashboard_msg.pack_forget()
+        
+        if not self.loading_visible:
+            self._center_on_parent(self.loading_overlay, LOADING_WIDTH, LOADING_HEIGHT)
+            self.loading_overlay.deiconify()
+            self.loading_overlay.lift()
+            self.loading_overlay.grab_set()
+            self.loading_visible = True
+        self.clock.add('feathers', self.grow_feathers, FEATHER_INTERVAL_MS)
     
     def grow_feathers(self):
-        try:
-            if not self.loading_overlay or not self.loading_overlay.winfo_exists():
-                return
-            
-            current = self.feather_label.cget('text')
-            # Keep adding feathers up to 15, then cycle back to 1
-            # This ensures continuous animation that stays within the box
-            if len(current) < 15:
-                self.feather_label.config(text=current + F)
-            else:
-                self.feather_label.config(text=F)
-            
-            # Always reschedule the next animation frame
-            self.loading_animation_id = self.loading_overlay.after(150, self.grow_feathers)
-        except Exception as e:
-            print(f"Animation error (continuing): {e}")
-            # Even on error, try to reschedule
-            if self.loading_overlay and self.loading_overlay.winfo_exists():
-                self.loading_animation_id = self.loading_overlay.after(150, self.grow_feathers)
+        """One animation frame - the clock calls this every FEATHER_INTERVAL_MS"""
+        current = self.feather_label.cget('text')
+        # Keep adding feathers up to 15, then cycle back to 1
+        # This ensures continuous animation that stays within the box
+        if len(current) < 15:
+            self.feather_label.config(text=current + F)
+        else:
+            self.feather_label.config(text=F)
+    
+    def set_loading_progress(self, fraction, text):
+        """Show a bar under the loading message"""
+        if not self.loading_visible:
+            return
+        if not self.progress_canvas.winfo_ismapped():
+            self.progress_canvas.pack(after=self.loading_msg, pady=(0, 4))
+            self.progress_label.pack(after=self.progress_canvas, pady=(0, 8))
+        self.progress_canvas.coords(self.progress_fill, 0, 0, PROGRESS_WIDTH * fraction, PROGRESS_HEIGHT)
+        if self.progress_label.cget('text') != text:
+            self.progress_label.config(text=text)
     
     def update_loading(self, message):
-        if self.loading_overlay and self.loading_overlay.winfo_exists():
+        if self.loading_visible:
             self.loading_msg.config(text=message)
-            # Use update_idletasks instead of update to avoid blocking the animation
-            self.loading_overlay.update_idletasks()
-            # Ensure animation is still running
-            if not self.loading_animation_id or self.loading_animation_id not in self.loading_overlay.tk.call('after', 'info'):
-                self.grow_feathers()
     
     def hide_loading(self):
-        if self.loading_animation_id and self.loading_overlay:
-            try:
-                self.loading_overlay.after_cancel(self.loading_animation_id)
-            except:
-                pass
-        if self.loading_overlay:
-            self.loading_overlay.destroy()
-            self.loading_overlay = None
+        self.trace.end()
+        self.clock.remove('feathers')
+        self.clock.remove('fetch_progress')
+        if self.loading_visible:
+            self.loading_overlay.grab_release()
+            self.loading_overlay.withdraw()
+            self.loading_visible = False
     
     def get_funny_message(self, category):
         if category in FUNNY_MESSAGES:
@@ -833,11 +908,78 @@ class IbisSetupWizard:
     
     # ==================== SERIAL COMMUNICATION ====================
     def scan_ports(self):
-        ports = [f"{p.device} - {p.description}" for p in serial.tools.list_ports.comports()]
-        if hasattr(self, 'port_combo'):
-            self.port_combo['values'] = ports
-            if ports:
+        """Refresh button - the watcher lists the ports on its own thread"""
+        self.port_watcher.rescan()
+    
+    def _ports_changed(self, ports, added, removed):
+        self.port_devices = {port_label(p): p.device for p in ports}
+        labels = list(self.port_devices)
+        self.port_combo['values'] = labels
+        if self.port_var.get() not in self.port_devices:
+            if labels:
                 self.port_combo.current(0)
+            else:
+                self.port_var.set('')
+        
+        if self.connected and any(p.device == self.link.port for p in removed):
+            print(f"{self.link.port} unplugged")
+            self.handle_disconnection()
+            return
+        
+        # Something new on USB: see if it's the board while the user is still looking for it
+        candidates = [p.device for p in added if is_usb(p)]
+        if candidates and not self.connected and not self.loading_visible and not self.probing:
+            self.conn_status.config(text=f"{F} Looking for your board...", fg=COLOR_TEXT_DIM)
+            self._probe_ports(candidates)
+    
+    def find_my_board(self):
+        """Try every port at once and connect to whichever one is the board"""
+        if self.connected:
+            return
+        self.show_loading(f"{F} Finding Your Board {F}", self.get_funny_message('connect'))
+        if self.probing:
+            self.connect_pending = self._search_all_ports
+            return
+        self._search_all_ports()
+    
+    def _search_all_ports(self):
+        devices = list(self.port_devices.values())
+        if not devices:
+            self._board_not_found()
+            return
+        self._probe_ports(devices, on_missing=self._board_not_found)
+    
+    def _board_not_found(self):
+        self.hide_loading()
+        self.show_popup(f"{F} No Board Found",
+                       "None of the USB ports answered like an Ibis board.\n\n"
+                       "Check the cable and make sure the board is in setup mode!",
+                       popup_type="error")
+    
+    def _probe_ports(self, devices, on_missing=None):
+        """Probe devices side by side on a worker; the first Ibis Dash to answer gets connected"""
+        self.probing = True
+        done = lambda found: self._on_board_found(found, on_missing)
+        self.tasks.submit(find_board, devices, on_done=done, on_error=lambda e: done(None))
+    
+    def _on_board_found(self, found, on_missing=None):
+        self.probing = False
+        waiting, self.connect_pending = self.connect_pending, None
+        if found and not self.connected and (waiting or on_missing or not self.loading_visible):
+            link, config = found
+            for label, device in self.port_devices.items():
+                if device == link.port:
+                    self.port_var.set(label)
+            print(f"Found your board on {link.port}")
+            self._on_connected(found)
+            return
+        if found:
+            found[0].close()    # the user got there first
+        self.update_connect_ui()
+        if waiting:
+            waiting()
+        elif on_missing:
+            on_missing()
     
     def toggle_connection(self):
         if self.connected:
@@ -852,86 +994,95 @@ class IbisSetupWizard:
             return
         
         self.show_loading(f"{F} Connecting {F}", self.get_funny_message('connect'))
-        
-        try:
-            port = port_str.split(' - ')[0]
-            self.serial_conn = serial.Serial(port, BAUD_RATE, timeout=SERIAL_TIMEOUT,
-                                            write_timeout=WRITE_TIMEOUT)
-            time.sleep(2)
-            self.serial_conn.reset_input_buffer()
-            
-            self.update_loading(self.get_funny_message('connect'))
-            
-            response = self.send_command("PING", wait_for="PONG")
-            if response and "PONG" in response:
-                self.connected = True
-                self.update_connect_ui()
-                
-                self.update_loading(self.get_funny_message('load_config'))
-                self.auto_load_config()
-                
-                self.hide_loading()
-                
-                # Auto-advance after successful connect
-                if self.wifi_complete and self.strava_complete:
-                    self.show_step(3)  # Everything set up -> Personalize
-                elif self.wifi_complete:
-                    self.show_step(2)  # WiFi done -> Strava
-                else:
-                    self.show_step(1)  # Fresh board -> WiFi
-            else:
-                raise Exception("No response from board")
-        except Exception as e:
+        if self.probing:
+            # The probe may hold the port open - take its answer rather than fight over it
+            self.connect_pending = self._open_selected
+            return
+        self._open_selected()
+    
+    def _open_selected(self):
+        port = self.port_devices.get(self.port_var.get())
+        if not port:
             self.hide_loading()
-            self.show_popup(f"{F} Connection Failed", f"Could not connect:\n{e}\n\nMake sure board is in setup mode!", popup_type="error")
-            if self.serial_conn:
-                self.serial_conn.close()
-                self.serial_conn = None
+            self.show_popup(f"{F} No Port", "Please select a USB port!", popup_type="warning")
+            return
+        self.tasks.submit(self._open_board, port, on_done=self._on_connected,
+                          on_error=self._on_connect_failed)
     
-    def auto_load_config(self):
-        response = self.send_command("GET_CONFIG", wait_for="OK")
+    def _open_board(self, port):
+        """Worker: open the port, wait for PONG and read the stored config"""
+        link = BoardLink(port, BAUD_RATE)
+        link.on_command = self.trace.command
+        link.open()
+        try:
+            hello = link.handshake()
+            print(f"Handshake on {port}: {hello['elapsed']:.2f}s, {hello['pings']} ping(s)")
+            self.tasks.call_soon(self.update_loading, self.get_funny_message('load_config'))
+            response = link.command("GET_CONFIG")
+        except Exception:
+            link.close()
+            raise
+        return link, response.payload if response else None
+    
+    def _on_connected(self, result):
+        self.link, config = result
+        self.link.on_command = self.trace.command
+        self.connected = True
+        self.update_connect_ui()
         
-        if not response:
-            return
+        if config:
+            self.auto_load_config(config)
         
+        self.hide_loading()
+        
+        # Auto-advance after successful connect
+        if self.wifi_complete and self.strava_complete:
+            self.show_step(3)  # Everything set up -> Personalize
+        elif self.wifi_complete:
+            self.show_step(2)  # WiFi done -> Strava
+        else:
+            self.show_step(1)  # Fresh board -> WiFi
+    
+    def _on_connect_failed(self, e):
+        self.hide_loading()
+        self.show_popup(f"{F} Connection Failed", f"Could not connect:\n{e}\n\nMake sure board is in setup mode,\n"
+                       "or let 'Find my board' try every port!", popup_type="error")
+    
+    def auto_load_config(self, c):
         try:
-            start, end = response.find('{'), response.rfind('}') + 1
-            if start >= 0 and end > start:
-                c = json.loads(response[start:end])
-                
-                if c.get('ssid'):
-                    self.ssid_var.set(c.get('ssid', ''))
-                    self.password_var.set(c.get('password', ''))
-                    self.wifi_complete = True
-                
-                if c.get('clientID'):
-                    self.client_id_var.set(c.get('clientID', ''))
-                    self.client_secret_var.set(c.get('clientSecret', ''))
-                    self.refresh_token_var.set(c.get('refreshToken', ''))
-                    if c.get('clientID') and c.get('clientSecret') and c.get('refreshToken'):
-                        self.strava_complete = True
-                
-                self.name_var.set(c.get('name', ''))
-                self.sport_var.set(c.get('sport', 'Run'))
-                self.goal_var.set(str(c.get('goal', 1000)))
-                idx = c.get('trackPeriod', 0)
-                if idx < len(TRACK_PERIODS):
-                    self.period_var.set(TRACK_PERIODS[idx])
-                hrs = c.get('refreshHours', 24)
-                for n, v, e in REFRESH_OPTIONS:
-                    if v == hrs:
-                        self.refresh_var.set(n)
-                        self.battery_var.set(e)
-                        break
-                
-                self.update_step_indicator()
+            if c.get('ssid'):
+                self.ssid_var.set(c.get('ssid', ''))
+                self.password_var.set(c.get('password', ''))
+                self.wifi_complete = True
+            
+            if c.get('clientID'):
+                self.client_id_var.set(c.get('clientID', ''))
+                self.client_secret_var.set(c.get('clientSecret', ''))
+                self.refresh_token_var.set(c.get('refreshToken', ''))
+                if c.get('clientID') and c.get('clientSecret') and c.get('refreshToken'):
+                    self.strava_complete = True
+            
+            self.name_var.set(c.get('name', ''))
+            self.sport_var.set(c.get('sport', 'Run'))
+            self.goal_var.set(str(c.get('goal', 1000)))
+            idx = c.get('trackPeriod', 0)
+            if idx < len(TRACK_PERIODS):
+                self.period_var.set(TRACK_PERIODS[idx])
+            hrs = c.get('refreshHours', 24)
+            for n, v, e in REFRESH_OPTIONS:
+                if v == hrs:
+                    self.refresh_var.set(n)
+                    self.battery_var.set(e)
+                    break
+            
+            self.update_step_indicator()
         except Exception as e:
             print(f"Auto-load failed: {e}")
     
     def disconnect(self):
-        if self.serial_conn:
-            self.serial_conn.close()
-            self.serial_conn = None
+        if self.link:
+            self.link.close()
+            self.link = None
         self.connected = False
         self.wifi_complete = False
         self.strava_complete = False
@@ -951,88 +1102,61 @@ class IbisSetupWizard:
         except:
             pass
     
-    def send_command(self, command, wait_for=None, timeout=SERIAL_TIMEOUT):
-        if not self.serial_conn:
-            return None
-        
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                self.serial_conn.reset_input_buffer()
-                self.serial_conn.reset_output_buffer()
-                time.sleep(0.2)
-                
-                cmd_bytes = f"{command}\n".encode('utf-8')
-                
-                for i in range(0, len(cmd_bytes), 32):
-                    self.serial_conn.write(cmd_bytes[i:i+32])
-                    self.serial_conn.flush()
-                    time.sleep(0.05)
-                
-                time.sleep(0.5)
-                
-                response = ""
-                start_time = time.time()
-                while time.time() - start_time < timeout:
-                    # Process Tkinter events to keep animations running
-                    try:
-                        self.root.update()
-                    except:
-                        pass
-                    
-                    if self.serial_conn.in_waiting > 0:
-                        response += self.serial_conn.read(self.serial_conn.in_waiting).decode('utf-8', errors='ignore')
-                        if wait_for and wait_for in response:
-                            time.sleep(0.3)
-                            if self.serial_conn.in_waiting > 0:
-                                response += self.serial_conn.read(self.serial_conn.in_waiting).decode('utf-8', errors='ignore')
-                            break
-                        if any(x in response for x in ["OK", "SUCCESS", "WIPED", "ERROR", "FAILED"]):
-                            if not wait_for:
-                                break
-                    time.sleep(0.05)
-                
-                if response:
-                    return response
-                    
-            except (PermissionError, OSError, serial.SerialException) as e:
-                print(f"Connection lost or port busy (attempt {attempt+1}/{max_retries}): {e}")
-                # Connection lost - update UI
-                if self.connected and (isinstance(e, OSError) or isinstance(e, serial.SerialException)):
-                    print("Board disconnected!")
-                    self.root.after(0, self.handle_disconnection)
-                    return None
-                time.sleep(1)
-                if attempt < max_retries - 1:
-                    continue
-                else:
-                    print(f"Send error after {max_retries} attempts: {e}")
-                    return None
-            except Exception as e:
-                print(f"Send error: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(0.5)
-                    continue
-                return None
+    def send_command(self, command, on_done, timeout=None):
+        """Run one board command on a worker; on_done(response) runs on the Tk thread"""
+        if not self.link:
+            on_done(None)
+            return
+        def failed(error):
+            if self._board_error(error):
+                on_done(None)
         
-        return None
+        self.tasks.submit(self.link.command, command, timeout, on_done=on_done, on_error=failed)
+    
+    def _board_error(self, error):
+        """Deal with a failed board call - False if the board is gone and the UI already reset"""
+        import serial
+        if isinstance(error, (PermissionError, OSError, serial.SerialException)):
+            print(f"Connection lost or port busy: {error}")
+            if self.connected:
+                print("Board disconnected!")
+                self.handle_disconnection()
+                return False
+        else:
+            print(f"Send error: {error}")
+        return True
+    
+    def shutdown(self):
+        """Window closed: stop background work and let go of the port"""
+        self.tasks.shutdown()
+        self.clock.stop()
+        self.port_watcher.stop()
+        self.trace.stop()
+        if self.oauth_arming and self.oauth_arming.done() and not self.oauth_arming.exception():
+            self.oauth_arming.result().shutdown()
+        if self.strava:
+            self.strava.close()
+        if self.clock.over_budget:
+            print(f"Animation frames over budget: {self.clock.stats()}")
+        if self.link:
+            self.link.close()
+            self.link = None
     
     def handle_disconnection(self):
         """Handle board disconnection - update UI to show disconnected state"""
-        if self.serial_conn:
+        if self.link:
             try:
-                self.serial_conn.close()
+                self.link.close()
             except:
                 pass
-            self.serial_conn = None
+            self.link = None
         
         self.connected = False
         self.update_connect_ui()
         self.update_step_indicator()
         
         # Hide any loading overlay
-        if self.loading_overlay:
-            self.hide_loading()
+        self.hide_loading()
         
         # Show error popup
         self.show_popup(f"{F} Connection Lost", 
@@ -1057,10 +1181,10 @@ class IbisSetupWizard:
             return
         
         self.show_loading(f"{F} Deleting Data {F}", self.get_funny_message('wipe'))
-        
-        response = self.send_command("DELETE_DATA", wait_for="SETUP_SCREEN_DRAWN", timeout=60)
-        
-        if response and "WIPED" in response:
+        self.send_command("DELETE_DATA", self._wiped)
+    
+    def _wiped(self, response):
+        if response and "WIPED" in response.lines:
             self.ssid_var.set('')
             self.password_var.set('')
             self.name_var.set('')
@@ -1085,40 +1209,69 @@ class IbisSetupWizard:
             self.show_popup(f"{F} Error", "Failed to delete data from board.", popup_type="error")
     
     # ==================== SAVE FUNCTIONS ====================
+    def apply_config(self, stages, on_done):
+        """Save the wizard's settings and run the follow-up stages in one go
+        
+        Only changed settings are written (unchanged Strava fields keep the
+        board's cached token). If the previous run with the same settings
+        failed part way, it carries on from the stage that failed.
+        
+        Runs on a worker; on_done(apply) is called on the Tk thread.
+        """
+        config = self.build_config()
+        apply = self.apply
+        if not (apply and apply.link is self.link and apply.config == config
+                and apply.stages == list(stages) and not apply.done):
+            apply = self.apply = ApplyTransaction(
+                self.link, config, stages,
+                on_stage=lambda stage, step: self.tasks.call_soon(self._on_apply_stage, stage, step),
+                summary=self._build_summary)
+        elif apply.position:
+            print(f"Resuming at {apply.stage}")
+        
+        def failed(error):
+            if self._board_error(error):
+                on_done(apply)
+        
+        self.tasks.submit(apply.run, on_done=lambda ok: on_done(apply), on_error=failed)
+    
+    def _on_apply_stage(self, stage, step):
+        if step['status'] == 'running':
+            self.update_loading(self.get_funny_message(APPLY_MESSAGES[stage]))
+            self.fetch_progress = step['progress']
+            if self.fetch_progress:
+                self.clock.add('fetch_progress', self._draw_fetch_progress, PROGRESS_POLL_MS)
+            return
+        self.clock.remove('fetch_progress')
+        self.fetch_progress = None
+        print(f"{stage}: {step['status']} ({step['seconds']:.2f}s)")
+        for name, seconds in step.get('breakdown', {}).items():
+            print(f"  {name:<10} {seconds:6.2f}s")
+    
+    def _draw_fetch_progress(self):
+        """Move the progress bar along with the board's FETCH_STRAVA log"""
+        progress = self.fetch_progress
+        if not progress:
+            return
+        if progress.stage:
+            label = FETCH_STAGE_LABELS[progress.stage]
+            if progress.stage == 'pages' and progress.pages:
+                label += f" - page {progress.pages} ({progress.activities} so far)"
+            self.set_loading_progress(progress.fraction,
+                                      f"{label}  {time.time() - progress.start:.0f}s")
+    
     def save_wifi(self):
         self.show_loading(f"{F} Saving WiFi {F}", self.get_funny_message('save_config'))
+        self.apply_config(('save', 'test_wifi'), self._wifi_saved)
+    
+    def _wifi_saved(self, apply):
+        self.hide_loading()
         
-        config = {
-            'ssid': self.ssid_var.get().strip(),
-            'password': self.password_var.get(),
-            'name': self.name_var.get().strip(),
-            'title': '',
-            'clientID': self.client_id_var.get().strip(),
-            'clientSecret': self.client_secret_var.get().strip(),
-            'refreshToken': self.refresh_token_var.get().strip(),
-            'sport': self.sport_var.get(),
-            'goal': self.get_goal_value() or 1000,
-            'trackPeriod': TRACK_PERIODS.index(self.period_var.get())
-        }
-        for n, v, _ in REFRESH_OPTIONS:
-            if n == self.refresh_var.get():
-                config['refreshHours'] = v
-                break
-        
-        response = self.send_command(f"SET_CONFIG:{json.dumps(config, separators=(',', ':'))}", wait_for="SUCCESS", timeout=10)
-        
-        if not response or "SUCCESS" not in response:
-            self.hide_loading()
+        if apply.stage == 'save':
             self.show_popup(f"{F} Error", "Failed to save configuration.", popup_type="error")
             return
         
-        self.update_loading(self.get_funny_message('test_wifi'))
-        
-        wifi_response = self.send_command("TEST_WIFI", wait_for="WIFI_", timeout=25)
-        
-        self.hide_loading()
-        
-        if not wifi_response or "WIFI_OK" not in wifi_response:
+        if not apply.done:
             self.show_popup(f"{F} WiFi Failed", "WiFi connection failed!\n\nPlease check your credentials.", popup_type="warning")
             return
         
@@ -1146,32 +1299,13 @@ class IbisSetupWizard:
             return
         
         self.show_loading(f"{F} Saving Strava {F}", self.get_funny_message('save_config'))
-        
-        time.sleep(0.5)
-        
-        config = {
-            'ssid': self.ssid_var.get().strip(),
-            'password': self.password_var.get(),
-            'name': self.name_var.get().strip(),
-            'title': '',
-            'clientID': self.client_id_var.get().strip(),
-            'clientSecret': self.client_secret_var.get().strip(),
-            'refreshToken': self.refresh_token_var.get().strip(),
-            'sport': self.sport_var.get(),
-            'goal': self.get_goal_value() or 1000,
-            'trackPeriod': TRACK_PERIODS.index(self.period_var.get())
-        }
-        for n, v, _ in REFRESH_OPTIONS:
-            if n == self.refresh_var.get():
-                config['refreshHours'] = v
-                break
-        
-        response = self.send_command(f"SET_CONFIG:{json.dumps(config, separators=(',', ':'))}", wait_for="SUCCESS", timeout=15)
-        
+        self.apply_config(('save',), self._strava_saved)
+    
+    def _strava_saved(self, apply):
         self.hide_loading()
         
-        if not response or "SUCCESS" not in response:
-            if response and ("Configuration saved" in response or "saved" in response.lower() or "OK" in response):
+        if not apply.done:
+            if apply.response and "Configuration saved!" in apply.response.log:
                 self.strava_complete = True
                 self.update_step_indicator()
                 self.show_popup(f"{F} Strava Saved", 
@@ -1220,61 +1354,23 @@ class IbisSetupWizard:
         
         self.show_loading(f"{F} Finishing Setup {F}", self.get_funny_message('save_config'), show_dashboard_msg=True)
         
-        config = {
-            'ssid': self.ssid_var.get().strip(),
-            'password': self.password_var.get(),
-            'name': self.name_var.get().strip(),
-            'title': '',
-            'clientID': self.client_id_var.get().strip(),
-            'clientSecret': self.client_secret_var.get().strip(),
-            'refreshToken': self.refresh_token_var.get().strip(),
-            'sport': self.sport_var.get(),
-            'goal': self.get_goal_value() or 1000,
-            'trackPeriod': TRACK_PERIODS.index(self.period_var.get())
-        }
-        for n, v, _ in REFRESH_OPTIONS:
-            if n == self.refresh_var.get():
-                config['refreshHours'] = v
-                break
-        
-        response = self.send_command(f"SET_CONFIG:{json.dumps(config, separators=(',', ':'))}", wait_for="SUCCESS", timeout=10)
+        # Save and draw in one run; the next command goes out as soon as the board answers.
+        # Strava is added up here and sent over, so the board draws without joining WiFi
+        self.apply_config(('save', 'summary'), self._setup_finished)
+    
+    def _setup_finished(self, apply):
+        self.hide_loading()
         
-        if not response or "SUCCESS" not in response:
-            self.hide_loading()
+        if apply.stage == 'save':
             self.show_popup(f"{F} Error {F}", "Failed to save configuration.", popup_type="error")
-            return
-        
-        has_strava = bool(config['clientID'] and config['clientSecret'] and config['refreshToken'])
-        has_wifi = bool(config['ssid'])
-        
-        if has_strava and has_wifi:
-            self.update_loading(self.get_funny_message('fetch_strava'))
-            strava_response = self.send_command("FETCH_STRAVA", wait_for="DASHBOARD_DRAWN", timeout=90)
-            
-            self.hide_loading()
-            
-            if strava_response and "DASHBOARD_DRAWN" in strava_response:
-                self.setup_done = True
-                self.show_setup_complete_popup()
-            else:
-                self.show_popup(f"{F} Almost Done", 
-                               "Settings saved but couldn't fetch Strava data.\n\n"
-                               "Try pressing BOOT button on the board\n"
-                               "or click Finish Setup again.",
-                               popup_type="warning")
-        elif has_wifi:
-            self.update_loading("Updating display...")
-            self.send_command("SHOW_SETUP_SCREEN", wait_for="SETUP_SCREEN_DRAWN", timeout=60)
-            
-            self.hide_loading()
-            self.show_popup(f"{F} WiFi Saved", 
-                           "WiFi settings saved!\n\n"
-                           "Add Strava credentials to see your stats.",
-                           popup_type="success")
+        elif apply.done:
+            self.setup_done = True
+            self.show_setup_complete_popup()
         else:
-            self.hide_loading()
-            self.show_popup(f"{F} Missing Settings", 
-                           "Please enter WiFi credentials first!",
+            self.show_popup(f"{F} Almost Done", 
+                           "Settings saved but couldn't fetch Strava data.\n\n"
+                           "Try pressing BOOT button on the board\n"
+                           "or click Finish Setup again.",
                            popup_type="warning")
     
     # ==================== OAUTH ====================
@@ -1287,56 +1383,79 @@ class IbisSetupWizard:
             return
         
         self.token_status_var.set(f"{F} Opening browser...")
-        self.root.update()
-        
-        def run_server():
-            try:
-                handler = lambda *a, **k: OAuthCallbackHandler(*a, callback=self.oauth_callback, **k)
-                with socketserver.TCPServer(("", OAUTH_REDIRECT_PORT), handler) as httpd:
-                    httpd.timeout = 120
-                    httpd.handle_request()
-            except Exception as e:
-                self.root.after(0, lambda: self.token_status_var.set(f"Error: {e}"))
-        
-        threading.Thread(target=run_server, daemon=True).start()
-        time.sleep(0.3)
-        
-        auth_params = {
-            'client_id': cid,
-            'redirect_uri': OAUTH_REDIRECT_URI,
-            'response_type': 'code',
-            'scope': 'read,activity:read_all',
-            'approval_prompt': 'auto'
-        }
-        webbrowser.open(f"{STRAVA_AUTH_URL}?{urllib.parse.urlencode(auth_params)}")
+        self.tasks.submit(self._authorize_url, self.arm_oauth(), cid, on_done=self.open_browser,
+                          on_error=self._oauth_failed)
+    
+    def arm_oauth(self):
+        """Start the callback server on a worker (once); returns its Future"""
+        if self.oauth_arming is None:
+            self.oauth_arming = self.tasks.submit(self._start_oauth_server)
+        return self.oauth_arming
+    
+    def _start_oauth_server(self):
+        """Worker: bind the loopback server Strava redirects to"""
+        from ibis_oauth import OAuthServer
+        return OAuthServer(self.oauth_callback).start()
+    
+    def _authorize_url(self, arming, client_id):
+        """Worker: wait until the server is listening, then make a fresh authorize URL"""
+        server = arming.result(timeout=OAUTH_READY_TIMEOUT)
+        if not server.ready.wait(OAUTH_READY_TIMEOUT):
+            raise RuntimeError("OAuth callback server did not start")
+        return server.authorize_url(client_id)
+    
+    def _oauth_failed(self, error):
+        if self.oauth_arming and self.oauth_arming.done() and self.oauth_arming.exception():
+            self.oauth_arming = None   # try binding again on the next click
+        self.token_status_var.set(f"Error: {error}")
+    
+    def open_browser(self, url):
+        import webbrowser
+        webbrowser.open(url)
     
     def oauth_callback(self, code):
+        # Called on the server thread - hand over to Tk
         if code:
-            self.root.after(100, lambda: self.exchange_token(code))
+            self.tasks.call_soon(self.exchange_token, code)
         else:
-            self.root.after(0, lambda: self.token_status_var.set("Authorization failed"))
+            self.tasks.call_soon(self.token_status_var.set, "Authorization failed")
     
     def exchange_token(self, code):
         self.token_status_var.set(f"{F} Getting token...")
-        try:
-            data = urllib.parse.urlencode({
-                'client_id': self.client_id_var.get().strip(),
-                'client_secret': self.client_secret_var.get().strip(),
-                'code': code,
-                'grant_type': 'authorization_code'
-            }).encode()
-            
-            req = urllib.request.Request(STRAVA_TOKEN_URL, data=data, method='POST')
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                result = json.loads(resp.read().decode())
-                if 'refresh_token' in result:
-                    self.refresh_token_var.set(result['refresh_token'])
-                    self.token_status_var.set("")
-                    self.show_step(2)  # Refresh to show checkmark
-                else:
-                    self.token_status_var.set("No token in response")
-        except Exception as e:
-            self.token_status_var.set(f"Error: {e}")
+        self.tasks.submit(self._request_token, self.client_id_var.get().strip(),
+                          self.client_secret_var.get().strip(), code,
+                          on_done=self._on_token,
+                          on_error=lambda e: self.token_status_var.set(f"Error: {e}"))
+    
+    def _request_token(self, client_id, client_secret, code):
+        """Worker: trade the OAuth code for tokens"""
+        return self.strava_client().exchange_token(client_id, client_secret, code)
+    
+    def _build_summary(self, config):
+        """Worker: the SET_SUMMARY line for Finish Setup (ApplyTransaction's summary stage)"""
+        from ibis_summary import build_summary, summary_command
+        from ibis_store import ActivityStore, store_path
+        store = ActivityStore(store_path(config['clientID']))
+        summary = build_summary(self.strava_client(), config, store=store)
+        if 'refreshToken' in summary:
+            # Strava retired the old one - the next save must not send it back
+            self.tasks.call_soon(self.refresh_token_var.set, summary['refreshToken'])
+        return summary_command(summary)
+    
+    def strava_client(self):
+        """The shared Strava client - created on first use, from whichever thread gets there first"""
+        with self.strava_lock:
+            if self.strava is None:
+                from ibis_strava import StravaClient
+                self.strava = StravaClient()
+            return self.strava
+    
+    def _on_token(self, result):
+        if 'refresh_token' in result:
+            self.refresh_token_var.set(result['refresh_token'])  # checkmark follows the var
+            self.token_status_var.set("")
+        else:
+            self.token_status_var.set("No token in response")
     
     # ==================== HELP ====================
     def show_connection_help(self):
@@ -1360,11 +1479,87 @@ class IbisSetupWizard:
             "   Enter these in Ibis Setup.\n\n"
             "6. Then click 'Let Ibis In' to connect!")
 
+    
+    # ==================== DEBUG PANEL ====================
+    def toggle_debug_panel(self, event=None):
+        """Ctrl+Shift+D - UI stalls and board command timings, live"""
+        if self.debug_panel:
+            self.clock.remove('debug_panel')
+            self.debug_panel.destroy()
+            self.debug_panel = None
+            return
+        self.trace.start(self.clock)
+        
+        panel = self.debug_panel = tk.Toplevel(self.root)
+        panel.title(f"{F} Ibis Debug")
+        panel.geometry(f"{DEBUG_WIDTH}x{DEBUG_HEIGHT}")
+        panel.configure(bg=COLOR_LOADING_BG)
+        panel.protocol("WM_DELETE_WINDOW", self.toggle_debug_panel)
+        
+        self.debug_summary = tk.Label(panel, font=('Consolas', 10), bg=COLOR_LOADING_BG,
+                                      fg=COLOR_SUCCESS, anchor='w', justify=tk.LEFT)
+        self.debug_summary.pack(fill=tk.X, padx=10, pady=(10, 4))
+        
+        self.debug_log = tk.Text(panel, font=('Consolas', 9), bg=COLOR_BG, fg=COLOR_TEXT,
+                                 relief=tk.FLAT, height=16, wrap=tk.NONE)
+        self.debug_log.pack(fill=tk.BOTH, expand=True, padx=10)
+        
+        btn_frame = tk.Frame(panel, bg=COLOR_LOADING_BG)
+        btn_frame.pack(pady=8)
+        for text, command in (("Export JSONL", self.export_trace), ("Clear", self.trace.clear)):
+            tk.Button(btn_frame, text=text, command=command, bg=COLOR_CARD, fg=COLOR_TEXT,
+                     font=('Segoe UI', 10), relief=tk.FLAT, padx=15, cursor='hand2'
+                     ).pack(side=tk.LEFT, padx=5)
+        
+        self.debug_version = None
+        self.clock.add('debug_panel', self._draw_debug_panel, DEBUG_REFRESH_MS)
+    
+    def _draw_debug_panel(self):
+        if self.trace.version == self.debug_version:
+            return
+        self.debug_version = self.trace.version
+        events = self.trace.snapshot()
+        summary = self.trace.summary(events)
+        self.debug_summary.config(
+            text=f"stalls {summary['stalls']} (worst {summary['worst_stall_ms']:.0f} ms)   "
+                 f"commands {summary['commands']} ({summary['failed']} failed, "
+                 f"{summary['retries']} retries)   slowest {summary['slowest'] or '-'}")
+        
+        rows = []
+        for e in events[-DEBUG_ROWS:]:
+            when = time.strftime('%H:%M:%S', time.localtime(e['t']))
+            if e['kind'] == 'stall':
+                what = f"UI stall {e['ms']:.0f} ms"
+            elif e['kind'] == 'command':
+                first = e['first_byte_s']
+                what = (f"{e['command']:<18} {'ok' if e['ok'] else 'FAILED':<6} {e['total_s']:7.3f}s  "
+                        f"write {e['write_s'] or 0:.3f}s  first byte "
+                        f"{'-' if first is None else f'{first:.3f}s'}  "
+                        f"{e['bytes_out']}B out / {e['bytes_in']}B in  retries {e['retries']}")
+            elif e['kind'] == 'step':
+                what = f"step {e['step'] + 1}"
+            else:
+                what = f"{e['kind']} {e.get('name', '')}"
+            rows.append(f"{when}  [{e['action'] or 'idle'}]  {what}")
+        self.debug_log.delete('1.0', tk.END)
+        self.debug_log.insert(tk.END, "\n".join(rows))
+        self.debug_log.see(tk.END)
+    
+    def export_trace(self):
+        from tkinter import filedialog
+        path = filedialog.asksaveasfilename(parent=self.debug_panel, defaultextension=".jsonl",
+                                            initialfile="ibis-trace.jsonl",
+                                            filetypes=[("JSON lines", "*.jsonl")])
+        if path:
+            count = self.trace.export(path)
+            print(f"Exported {count} trace events to {path}")
+
 
 def main():
     root = tk.Tk()
     app = IbisSetupWizard(root)
     root.mainloop()
+    app.shutdown()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,815 @@
+#!/usr/bin/env python3
+"""
+🪶 Ibis Bench 🪶 - Timing harnesses for the Ibis Setup app
+
+Run from the app folder:
+    python ibis_bench.py write      # serial write pacing: legacy vs adaptive
+    python ibis_bench.py connect    # open + handshake + GET_CONFIG
+    python ibis_bench.py provision  # SET_CONFIG -> TEST_WIFI -> FETCH_STRAVA
+    python ibis_bench.py setup      # wizard's full setup: three saves vs one apply
+    python ibis_bench.py nav        # wizard step switching (needs a display)
+    python ibis_bench.py startup    # cold import + time to first frame
+    python ibis_bench.py hotplug    # board plugged in -> watcher -> PING -> connected
+    python ibis_bench.py find       # "Find my board": silent ports + one board, serial vs parallel
+    python ibis_bench.py summary    # board-style Strava paging vs the desktop summary + SET_SUMMARY
+    python ibis_bench.py cache      # summary from the activity cache: first sync vs repeat syncs
+    python ibis_bench.py stats      # NumPy totals vs the firmware rules: parity, then 100k activities
+    python ibis_bench.py route      # LAST ROUTE: polyline vs precompiled route, points and bytes
+    python ibis_bench.py geo        # batch polyline decode + grid index vs one route at a time
+
+Serial benches talk to ibis_sim's pretend board on a pseudo-terminal, so they
+only run on Linux/macOS and need no hardware. --budget turns a bench into a
+regression check: it exits non-zero when the measured time is over budget.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from ibis_link import BoardLink, ApplyTransaction, config_command
+from ibis_ports import PortWatcher, probe_board, find_board, is_usb, FIND_TIMEOUT
+from ibis_sim import SimulatedBoard, StravaStandIn
+
+# Roughly what the wizard sends on Finish Setup
+SAMPLE_CONFIG = {
+    'ssid': "Ibis Nest 5G",
+    'password': "worms-and-more-worms-2024",
+    'name': "Ibis",
+    'title': '',
+    'clientID': "123456",
+    'clientSecret': "0f1e2d3c4b5a69788796a5b4c3d2e1f00f1e2d3c",
+    'refreshToken': "a1b2c3d4e5f60718293a4b5c6d7e8f9012345678",
+    'sport': "Run",
+    'goal': 1000.0,
+    'trackPeriod': 0,
+    'refreshHours': 24,
+}
+
+
+# Ibis.py must not pull these in before the first frame
+DEFERRED_MODULES = ('serial.tools.list_ports', 'http.server', 'socketserver',
+                    'urllib.request', 'webbrowser')
+
+# Runs in a fresh interpreter per round so every import is a cold one
+_STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import Ibis
+result = {'import_ms': (time.perf_counter() - start) * 1000,
+          'eager': [m for m in %r if m in sys.modules]}
+import tkinter as tk
+try:
+    root = tk.Tk()
+except tk.TclError:
+    result['first_frame_ms'] = None
+else:
+    app = Ibis.IbisSetupWizard(root)
+    root.wait_visibility()
+    root.update_idletasks()
+    result['first_frame_ms'] = (time.perf_counter() - start) * 1000
+    app.shutdown()
+    root.destroy()
+print(json.dumps(result))
+""" % (DEFERRED_MODULES,)
+
+
+def _legacy_write(port, data):
+    """The old send_command pacing: 32-byte chunks, flush + 50 ms each, 0.2 s before, 0.5 s after"""
+    port.reset_output_buffer()
+    time.sleep(0.2)
+    for i in range(0, len(data), 32):
+        port.write(data[i:i+32])
+        port.flush()
+        time.sleep(0.05)
+    time.sleep(0.5)
+
+
+def _time_commands(link, command, rounds):
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        response = link.command(command, timeout=10)
+        times.append(time.perf_counter() - start)
+        if not response or not response.ok:
+            raise RuntimeError(f"{command[:20]} failed during bench")
+    return sum(times) / len(times)
+
+
+# ==================== BENCHES ====================
+def bench_write(args):
+    set_config = config_command(SAMPLE_CONFIG)
+    results = {}
+    for mode in ("legacy", "adaptive"):
+        board = SimulatedBoard(speed=0).start()
+        link = BoardLink(board.port).open()
+        if mode == "legacy":
+            link.pacer.write = _legacy_write
+        try:
+            ping = _time_commands(link, "PING", args.rounds)
+            save = _time_commands(link, set_config, args.rounds)
+        finally:
+            link.close()
+            board.stop()
+        results[mode] = {
+            'ping_s': round(ping, 4),
+            'set_config_s': round(save, 4),
+            'set_config_bytes': len(set_config) + 1,
+            'throughput_Bps': round((len(set_config) + 1) / save),
+        }
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+def _check_budget(args, results, seconds):
+    results['budget_s'] = args.budget
+    print(json.dumps(results, indent=2))
+    if args.budget is not None and seconds > args.budget:
+        print(f"Over budget: {seconds:.3f}s > {args.budget}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+def bench_connect(args):
+    """Cold connect as the wizard does it, board already awake"""
+    nvs = dict(SAMPLE_CONFIG)
+    times = []
+    for _ in range(args.rounds):
+        with SimulatedBoard(nvs=nvs, speed=args.speed) as board:
+            start = time.perf_counter()
+            link = BoardLink(board.port).open()
+            try:
+                link.handshake()
+                response = link.command("GET_CONFIG")
+                if not response or not response.ok:
+                    raise RuntimeError("GET_CONFIG failed during bench")
+            finally:
+                link.close()
+            times.append(time.perf_counter() - start)
+    worst = max(times)
+    return _check_budget(args, {'rounds': args.rounds, 'mean_s': round(sum(times) / len(times), 4),
+                                'worst_s': round(worst, 4)}, worst)
+
+
+def bench_provision(args):
+    """Full save -> WiFi test -> fetch round, with the board's own work scaled by --speed"""
+    with SimulatedBoard(speed=args.speed) as board:
+        link = BoardLink(board.port).open()
+        try:
+            link.handshake()
+            start = time.perf_counter()
+            apply = ApplyTransaction(link, SAMPLE_CONFIG)
+            if not apply.run():
+                raise RuntimeError(f"{apply.stage} failed during bench")
+            total = time.perf_counter() - start
+            stages = {stage: step['seconds'] for stage, step in apply.steps.items()}
+        finally:
+            link.close()
+    board_work = sum(board.latency[name] for name in ('SET_CONFIG', 'TEST_WIFI', 'FETCH_STRAVA'))
+    return _check_budget(args, {'speed': args.speed, 'stages_s': stages,
+                                'fetch_breakdown_s': apply.steps['fetch']['breakdown'],
+                                'total_s': round(total, 4),
+                                'board_work_s': round(board_work * args.speed, 4),
+                                'overhead_s': round(total - board_work * args.speed, 4)}, total)
+
+
+def _legacy_setup(link):
+    """What the wizard used to send: the full config on every save, then test and fetch"""
+    set_config = config_command(SAMPLE_CONFIG)
+    for command in (set_config, "TEST_WIFI", set_config, set_config, "FETCH_STRAVA"):
+        if command.startswith("FETCH"):
+            time.sleep(0.5)    # save_strava's settle delay
+        response = link.command(command, timeout=120)
+        if not response or not response.ok:
+            raise RuntimeError(f"{command[:20]} failed during bench")
+
+
+def bench_setup(args):
+    """Connect-to-dashboard as an operator clicks through it: legacy flow vs one apply"""
+    results = {}
+    for mode in ("legacy", "apply"):
+        with SimulatedBoard(speed=args.speed) as board:
+            link = BoardLink(board.port).open()
+            if mode == "legacy":
+                link.pacer.write = _legacy_write
+            try:
+                link.handshake()
+                link.command("GET_CONFIG")
+                start = time.perf_counter()
+                if mode == "legacy":
+                    _legacy_setup(link)
+                elif not ApplyTransaction(link, SAMPLE_CONFIG).run():
+                    raise RuntimeError("apply failed during bench")
+                total = time.perf_counter() - start
+            finally:
+                link.close()
+        results[mode] = {'total_s': round(total, 4), 'bytes_out': link.bytes_out}
+    board_work = sum(board.latency[name] for name in ('SET_CONFIG', 'TEST_WIFI', 'FETCH_STRAVA'))
+    results['board_work_s'] = round(board_work * args.speed, 4)
+    return _check_budget(args, results, results['apply']['total_s'])
+
+
+def bench_nav(args):
+    """Step switching in the real window
+
+    A step's first visit builds it - that is what every Back/Next/dot click
+    used to cost when show_step rebuilt the step. Later visits only swap
+    the cached frame in.
+    """
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"nav bench needs a display: {e}", file=sys.stderr)
+        return 1
+    import Ibis
+    app = Ibis.IbisSetupWizard(root)
+    app.connected = True
+
+    def switch(step):
+        start = time.perf_counter()
+        app.show_step(step)
+        root.update_idletasks()
+        return time.perf_counter() - start
+
+    try:
+        first = {step: switch(step) for step in (1, 2, 3, 4)}
+        cached = [switch(step) for _ in range(args.rounds) for step in (0, 1, 2, 3, 4)]
+    finally:
+        app.shutdown()
+        root.destroy()
+    worst = max(cached)
+    return _check_budget(args, {
+        'first_visit_ms': {step: round(t * 1000, 2) for step, t in first.items()},
+        'cached_mean_ms': round(sum(cached) / len(cached) * 1000, 3),
+        'cached_worst_ms': round(worst * 1000, 3),
+    }, worst)
+
+
+def bench_startup(args):
+    """Launch to first frame, the way Ibis.exe starts: import, build the window, draw it"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    rounds = []
+    for _ in range(args.rounds):
+        out = subprocess.run([sys.executable, '-c', _STARTUP_PROBE], cwd=here,
+                             capture_output=True, text=True, check=True).stdout
+        rounds.append(json.loads(out.splitlines()[-1]))
+    imports = [r['import_ms'] for r in rounds]
+    frames = [r['first_frame_ms'] for r in rounds if r['first_frame_ms'] is not None]
+    eager = sorted({m for r in rounds for m in r['eager']})
+    results = {
+        'import_mean_ms': round(sum(imports) / len(imports), 1),
+        'import_worst_ms': round(max(imports), 1),
+        'first_frame_mean_ms': round(sum(frames) / len(frames), 1) if frames else None,
+        'first_frame_worst_ms': round(max(frames), 1) if frames else None,
+        'eager_imports': eager,
+    }
+    if not frames:
+        print("No display - measured imports only", file=sys.stderr)
+    worst = max(frames or imports) / 1000
+    status = _check_budget(args, results, worst)
+    if eager:
+        print(f"Imported before the first frame: {', '.join(eager)}", file=sys.stderr)
+        return 1
+    return status
+
+
+def _usb_port(device, serial_number="IBIS0001"):
+    """A comports() entry for a pseudo-terminal, dressed up as the board's USB port"""
+    from serial.tools.list_ports_common import ListPortInfo
+    info = ListPortInfo(device, skip_link_detection=True)
+    info.vid, info.pid, info.serial_number = 0x303A, 0x1001, serial_number
+    info.description = "USB JTAG/serial debug unit"
+    return info
+
+
+def bench_hotplug(args):
+    """Plug-in to connected with no clicks: the watcher's next scan, then PING + GET_CONFIG"""
+    import threading
+    times = []
+    for _ in range(args.rounds):
+        plugged = []
+        connected = threading.Event()
+        found = {}
+
+        def on_change(ports, added, removed):
+            for info in added:
+                if is_usb(info):
+                    found['detected'] = time.perf_counter()
+                    found['result'] = probe_board(info.device)
+                    connected.set()
+
+        watcher = PortWatcher(on_change, scan=lambda: list(plugged)).start()
+        try:
+            with SimulatedBoard(nvs=SAMPLE_CONFIG, speed=args.speed, boot=True) as board:
+                start = time.perf_counter()
+                plugged.append(_usb_port(board.port))
+                if not connected.wait(30) or not found['result']:
+                    raise RuntimeError("board was not picked up during bench")
+                total = time.perf_counter() - start
+                found['result'][0].close()
+        finally:
+            watcher.stop()
+        times.append((found['detected'] - start, total))
+    worst = max(total for _, total in times)
+    return _check_budget(args, {
+        'rounds': args.rounds,
+        'detect_mean_s': round(sum(d for d, _ in times) / len(times), 4),
+        'connected_mean_s': round(sum(t for _, t in times) / len(times), 4),
+        'connected_worst_s': round(worst, 4),
+    }, worst)
+
+
+def _silent_port():
+    """A pseudo-terminal nobody answers on - a COM port with something else behind it"""
+    import tty
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    return master, slave, os.ttyname(slave)
+
+
+def bench_find(args):
+    """Three ports that never answer plus the board: one at a time vs all at once"""
+    duds = [_silent_port() for _ in range(3)]
+    try:
+        with SimulatedBoard(nvs=SAMPLE_CONFIG, speed=args.speed) as board:
+            ports = [port for _, _, port in duds] + [board.port]
+            start = time.perf_counter()
+            for port in ports:
+                found = probe_board(port, timeout=FIND_TIMEOUT)
+                if found:
+                    break
+            serial_s = time.perf_counter() - start
+            found[0].close()
+            times = []
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                found = find_board(ports)
+                times.append(time.perf_counter() - start)
+                if not found or found[0].port != board.port:
+                    raise RuntimeError("find_board missed the board during bench")
+                found[0].close()
+    finally:
+        for master, slave, _ in duds:
+            os.close(master)
+            os.close(slave)
+    worst = max(times)
+    return _check_budget(args, {'ports': len(ports), 'one_at_a_time_s': round(serial_s, 4),
+                                'parallel_mean_s': round(sum(times) / len(times), 4),
+                                'parallel_worst_s': round(worst, 4)}, worst)
+
+
+def _board_style_fetch(client, access_token, after, before):
+    """fetchStravaData()'s paging: 30 a page, one at a time, 200 ms apart, 10 pages at most"""
+    activities = []
+    for page in range(1, 11):
+        batch = client.activities(access_token, page=page, per_page=30, after=after, before=before)
+        if not batch:
+            break
+        activities += batch
+        time.sleep(0.2)
+    return activities
+
+
+def bench_summary(args):
+    """A year of activities from a Strava stand-in with real-world round trips"""
+    from ibis_strava import StravaClient
+    from ibis_summary import build_summary, summary_command, period_bounds, fetch_activities
+
+    with StravaStandIn(activities=args.activities or 600, latency=args.rtt, seed=1) as strava:
+        config = dict(SAMPLE_CONFIG, refreshToken=strava.refresh_token)
+        after, before, _ = period_bounds(config['trackPeriod'])
+        client = StravaClient(base_url=strava.url)
+        token = client.refresh_token(config['clientID'], config['clientSecret'], config['refreshToken'])
+
+        start = time.perf_counter()
+        board_style = _board_style_fetch(client, token['access_token'], after, before)
+        board_style_s = time.perf_counter() - start
+        start = time.perf_counter()
+        desktop = fetch_activities(client, token['access_token'], after, before)
+        desktop_s = time.perf_counter() - start
+
+        with SimulatedBoard(nvs=config, speed=args.speed) as board:
+            link = BoardLink(board.port).open()
+            try:
+                link.handshake()
+                link.command("GET_CONFIG")
+                requests = len(strava.requests)
+                start = time.perf_counter()
+                command = summary_command(build_summary(client, config))
+                apply = ApplyTransaction(link, config, ('summary',), summary=lambda c: command)
+                if not apply.run():
+                    raise RuntimeError("SET_SUMMARY failed during bench")
+                total = time.perf_counter() - start
+            finally:
+                link.close()
+        client.close()
+        results = {
+            'rtt_s': args.rtt,
+            'in_period': len(desktop),
+            'board_style': {'fetched': len(board_style), 'seconds': round(board_style_s, 4)},
+            'desktop': {'fetched': len(desktop), 'seconds': round(desktop_s, 4),
+                        'max_in_flight': strava.max_in_flight},
+            'summary_requests': len(strava.requests) - requests,
+            'payload_bytes': len(command.encode('utf-8')),
+            'summary_to_drawn_s': round(total, 4),
+            'connections': client.connections,
+        }
+    return _check_budget(args, results, total)
+
+
+def bench_cache(args):
+    """Requests and time per summary with the SQLite activity cache, cold then warm"""
+    import tempfile
+    from ibis_strava import StravaClient
+    from ibis_summary import build_summary, period_bounds
+    from ibis_store import ActivityStore
+
+    with tempfile.TemporaryDirectory() as folder, \
+            StravaStandIn(activities=args.activities or 600, latency=args.rtt, seed=1) as strava:
+        config = dict(SAMPLE_CONFIG, refreshToken=strava.refresh_token)
+        client = StravaClient(base_url=strava.url)
+        store = ActivityStore(os.path.join(folder, "activities.db"))
+        runs = []
+        for mode in ["uncached"] + ["cold"] + ["warm"] * args.rounds:
+            requests = len(strava.requests)
+            start = time.perf_counter()
+            build_summary(client, config, store=None if mode == "uncached" else store)
+            runs.append((mode, time.perf_counter() - start, len(strava.requests) - requests))
+
+        # Delete one activity and edit another, both older than SYNC_OVERLAP: only the
+        # period check (normally once a day) may notice, and then the store must match
+        after, before, _ = period_bounds(config['trackPeriod'])
+        older = [a for a in strava.activities if after < a['_epoch'] < before - 30 * 86400]
+        strava.activities.remove(older[0])
+        older[1]['distance'] += 1000.0
+        token = client.refresh_token(config['clientID'], config['clientSecret'], config['refreshToken'])
+        reconciled = store.reconcile(client, token['access_token'], after, before, max_age=0)
+        mirror = {a['id']: a['distance'] for a in strava.activities if after < a['_epoch'] < before}
+        if {a['id']: a['distance'] for a in store.activities(after, before)} != mirror:
+            raise RuntimeError("store does not match Strava after reconcile")
+        client.close()
+        stored = store.count()
+    warm = [seconds for mode, seconds, _ in runs if mode == "warm"]
+    results = {mode: {'seconds': round(seconds, 4), 'requests': requests}
+               for mode, seconds, requests in runs[:3]}
+    results.update(rtt_s=args.rtt, stored=stored, reconcile=reconciled,
+                   warm_worst_s=round(max(warm), 4))
+    return _check_budget(args, results, max(warm))
+
+
+# Every type the sport groups care about, plus some nobody selects
+STATS_TYPES = ("Run", "VirtualRun", "TrailRun", "Ride", "VirtualRide", "EBikeRide",
+               "MountainBikeRide", "GravelRide", "Swim", "Hike", "Walk", "Workout", "")
+
+
+def _synthetic_activities(count, now, seed=1):
+    """Activity dicts over the last ~14 months, with a share right on period
+    edges and a share outside the firmware's sanity bounds"""
+    import random
+    from ibis_summary import period_bounds
+    rng = random.Random(seed)
+    edges = sorted({bound for period in range(3) for bound in period_bounds(period, now)[:2]})
+    activities = []
+    for i in range(count):
+        if i % 10 == 0:
+            start = rng.choice(edges) + rng.choice((-1, 0, 1))
+        else:
+            start = now - rng.randint(0, 430 * 86400)
+        km = rng.choice((0, 1000, 999.99, -5, 0.001)) if i % 25 == 0 else rng.uniform(1, 120)
+        seconds = rng.choice((0, 360000, 359999)) if i % 31 == 0 else rng.randint(600, 6 * 3600)
+        activities.append({
+            'id': i,
+            'type': STATS_TYPES[i % len(STATS_TYPES)],
+            'start_date': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(start)),
+            'distance': km * 1000,
+            'moving_time': seconds,
+        })
+    return activities
+
+
+def _reference_totals(activities, now):
+    """summarize() - the firmware's rules activity by activity - for every sport and period"""
+    from ibis_link import SPORT_TYPES, TRACK_PERIODS
+    from ibis_summary import period_bounds, summarize
+    from ibis_store import start_epoch
+    starts = [start_epoch(a) for a in activities]
+    totals = {}
+    for sport in SPORT_TYPES:
+        totals[sport] = {}
+        for p, period in enumerate(TRACK_PERIODS):
+            after, before, _ = period_bounds(p, now)
+            chosen = [a for a, start in zip(activities, starts) if after < start < before]
+            summary = summarize(chosen, sport)
+            totals[sport][period] = {key: summary[key] for key in ('dist', 'hours', 'count')}
+    return totals
+
+
+# Worked out by hand from getTrackingPeriodTimestamps() in IBIS_V40.ino - weeks
+# run Monday to Monday, week number is tm_yday (0-based) / 7 + 1, all UTC:
+# (now, period, after, before, header)
+FIRMWARE_PERIODS = (
+    # Sunday 2026-10-18 23:59:59: still the week of Monday 12 Oct, yday 290 -> week 42
+    (1792367999, 2, 1791763200, 1792368000, {'year': 2026, 'month': 10, 'week': 42}),
+    # Monday 2026-10-19 00:00:00: the new week starts, yday 291 -> still week 42
+    (1792368000, 2, 1792368000, 1792972800, {'year': 2026, 'month': 10, 'week': 42}),
+    # Thursday 2026-01-01: the week began on Monday 29 Dec 2025, but it is week 1 of 2026
+    (1767225630, 2, 1766966400, 1767571200, {'year': 2026, 'month': 1, 'week': 1}),
+    (1767225630, 0, 1767225600, 1798761600, {'year': 2026}),
+    # Wednesday 2026-01-07: the second Monday-week, but yday 6 -> still week 1
+    (1767787200, 2, 1767571200, 1768176000, {'year': 2026, 'month': 1, 'week': 1}),
+    # Tuesday 2028-02-29, a leap day: February 2028 has 29 days, yday 59 -> week 9
+    (1835438400, 1, 1832976000, 1835481600, {'year': 2028, 'month': 2}),
+    (1835438400, 2, 1835308800, 1835913600, {'year': 2028, 'month': 2, 'week': 9}),
+    # Sunday 2028-12-31: yday 365 -> week 53
+    (1861876800, 2, 1861315200, 1861920000, {'year': 2028, 'month': 12, 'week': 53}),
+)
+
+# Activities around Sunday 2026-10-18 23:59:59 - (start, type, km, seconds) - and the
+# totals the board would show, by hand: strict period bounds, 0 < km < 1000,
+# 0 < hours < 100, Ride takes in VirtualRide and EBikeRide, Run doesn't take TrailRun
+FIRMWARE_NOW = 1792367999
+FIRMWARE_ACTIVITIES = (
+    (1791763200, "Run", 10, 3600),              # exactly Monday 00:00 - not this week
+    (1791763201, "Run", 5, 1800),
+    (1792000000, "VirtualRun", 0, 600),         # 0 km - dropped
+    (1792000000, "Run", 1000, 36000),           # 1000 km - dropped
+    (1792000000, "Run", 10, 360000),            # 100 h - dropped
+    (1791000000, "Run", 999.99, 36000),         # earlier in October
+    (1792100000, "TrailRun", 8, 3600),
+    (1792100000, "VirtualRide", 30, 3600),
+    (1780000000, "EBikeRide", 20, 1800),        # May
+    (1792100000, "GravelRide", 40, 7200),
+    (1792367999, "Walk", 3, 2700),
+    (1767225600, "Swim", 2, 3600),              # exactly New Year 00:00 - not this year
+)
+FIRMWARE_TOTALS = {
+    'Run': {'Yearly': (1014.99, 11.5, 3), 'Monthly': (1014.99, 11.5, 3), 'Weekly': (5, 0.5, 1)},
+    'Ride': {'Yearly': (50, 1.5, 2), 'Monthly': (30, 1, 1), 'Weekly': (30, 1, 1)},
+    'Walk': {'Yearly': (3, 0.75, 1), 'Monthly': (3, 0.75, 1), 'Weekly': (3, 0.75, 1)},
+    'Swim': {'Yearly': (0, 0, 0), 'Monthly': (0, 0, 0), 'Weekly': (0, 0, 0)},
+    'Hike': {'Yearly': (0, 0, 0), 'Monthly': (0, 0, 0), 'Weekly': (0, 0, 0)},
+}
+
+
+def _firmware_cases():
+    """Where period_bounds(), ActivityTable and summarize() disagree with FIRMWARE_*"""
+    from ibis_link import TRACK_PERIODS
+    from ibis_stats import ActivityTable
+    from ibis_summary import period_bounds, summarize
+    failures = []
+    for now, period, after, before, header in FIRMWARE_PERIODS:
+        got = period_bounds(period, now)
+        if got != (after, before, header):
+            failures.append({'now': now, 'period': TRACK_PERIODS[period],
+                             'expected': [after, before, header], 'got': list(got)})
+    activities = [{'id': i, 'type': kind, 'distance': km * 1000, 'moving_time': seconds,
+                   'start_date': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(start))}
+                  for i, (start, kind, km, seconds) in enumerate(FIRMWARE_ACTIVITIES)]
+    engine = ActivityTable.from_activities(activities).totals(FIRMWARE_NOW)
+    for sport, periods in FIRMWARE_TOTALS.items():
+        for p, period in enumerate(TRACK_PERIODS):
+            expected = dict(zip(('dist', 'hours', 'count'), periods[period]))
+            after, before, _ = period_bounds(p, FIRMWARE_NOW)
+            chosen = [a for a, (start, *_) in zip(activities, FIRMWARE_ACTIVITIES)
+                      if after < start < before]
+            reference = summarize(chosen, sport)
+            for name, got in (('engine', engine[sport][period]), ('summarize', reference)):
+                if any(got[key] != expected[key] for key in expected):
+                    failures.append({'sport': sport, 'period': period, 'by': name,
+                                     'expected': expected,
+                                     'got': {key: got[key] for key in expected}})
+    return failures
+
+
+def bench_stats(args):
+    """Hand-worked firmware cases, parity with summarize() around awkward dates, then
+    all totals over many activities"""
+    import calendar
+    from ibis_stats import ActivityTable
+
+    firmware_failures = _firmware_cases()
+    mismatches = []
+    # Sunday night, Monday midnight, New Year's Eve / Day, a leap day, the end of a month
+    for moment in ((2026, 10, 18, 23, 59, 59), (2026, 10, 19, 0, 0, 0), (2025, 12, 31, 23, 0, 0),
+                   (2026, 1, 1, 0, 0, 30), (2028, 2, 29, 12, 0, 0), (2026, 4, 30, 18, 0, 0)):
+        now = calendar.timegm(moment + (0, 0, 0))
+        activities = _synthetic_activities(3000, now, seed=now)
+        engine = ActivityTable.from_activities(activities).totals(now)
+        reference = _reference_totals(activities, now)
+        for sport, periods in reference.items():
+            for period, expected in periods.items():
+                got = engine[sport][period]
+                if (got['count'] != expected['count']
+                        or abs(got['dist'] - expected['dist']) > 0.011
+                        or abs(got['hours'] - expected['hours']) > 0.011):
+                    mismatches.append({'now': moment, 'sport': sport, 'period': period,
+                                       'engine': got, 'reference': expected})
+
+    count = args.activities or 100000
+    now = int(time.time())
+    activities = _synthetic_activities(count, now)
+    start = time.perf_counter()
+    table = ActivityTable.from_activities(activities)
+    build_s = time.perf_counter() - start
+    times = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        table.totals(now)
+        times.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    _reference_totals(activities, now)
+    reference_s = time.perf_counter() - start
+    worst = max(times)
+    results = {'firmware_failures': firmware_failures[:5], 'firmware_failed': len(firmware_failures),
+               'parity_mismatches': mismatches[:5], 'parity_failed': len(mismatches),
+               'activities': count, 'build_s': round(build_s, 4),
+               'totals_mean_s': round(sum(times) / len(times), 4), 'totals_worst_s': round(worst, 4),
+               'per_activity_python_s': round(reference_s, 4),
+               'speedup': round(reference_s / (sum(times) / len(times)), 1)}
+    if firmware_failures or mismatches:
+        print(json.dumps(results, indent=2))
+        print(f"{len(firmware_failures)} hand-worked firmware cases failed, {len(mismatches)} "
+              f"sport/period totals differ from summarize()", file=sys.stderr)
+        return 1
+    return _check_budget(args, results, worst)
+
+
+def _synthetic_route(points, seed):
+    """A wandering ride: heading drifts a little every point, ~20 m steps"""
+    import math
+    import random
+    rng = random.Random(seed)
+    lat, lon, heading = 51.5, -0.12, rng.uniform(0, 2 * math.pi)
+    route = []
+    for _ in range(points):
+        heading += rng.gauss(0, 0.15)
+        lat += 0.00018 * math.cos(heading)
+        lon += 0.00028 * math.sin(heading)
+        route.append((lat, lon))
+    return route
+
+
+def _segment_distance(point, a, b):
+    (x, y), (x0, y0), (x1, y1) = point, a, b
+    dx, dy = x1 - x0, y1 - y0
+    length = dx * dx + dy * dy
+    t = max(0.0, min(1.0, ((x - x0) * dx + (y - y0) * dy) / length)) if length else 0.0
+    return ((x - x0 - t * dx) ** 2 + (y - y0 - t * dy) ** 2) ** 0.5
+
+
+def bench_route(args):
+    """What the board gets for LAST ROUTE, before (polyline) and after (route blob)"""
+    from ibis_route import (encode_polyline, decode_polyline, project, compile_route, unpack,
+                            error_bound, ROUTE_TOLERANCE)
+    from ibis_summary import summary_command
+
+    results = {'tolerance_px': ROUTE_TOLERANCE, 'error_bound_px': round(error_bound(), 2),
+               'routes': []}
+    worst = 0.0
+    beyond = 0
+    for count in (100, 500, 2000, 5000):
+        polyline = encode_polyline(_synthetic_route(count, seed=count))
+        times = []
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            blob = compile_route(polyline)
+            times.append(time.perf_counter() - start)
+        worst = max(worst, max(times))
+        drawn = unpack(blob)
+        # How far the exact projection of every point is from the line the board draws
+        error = max(min(_segment_distance(point, a, b) for a, b in zip(drawn, drawn[1:]))
+                    for point in project(decode_polyline(polyline)))
+        beyond += error > error_bound()
+        summary = {'now': 0, 'poly': polyline}
+        line = summary_command(summary)
+        results['routes'].append({
+            'points': count,
+            'polyline_chars': len(polyline),
+            'board_floats_bytes': count * 8,      # std::vector<Point>, two floats a point
+            'route_points': len(drawn),
+            'route_chars': len(blob),
+            'route_bytes': len(drawn) * 2,
+            'max_error_px': round(error, 2),
+            'compile_ms': round(sum(times) / len(times) * 1000, 2),
+            'set_summary_bytes': len(line.encode('utf-8')),
+            'polyline_fits': len(f'SET_SUMMARY:{{"now":0,"poly":"{polyline}"}}') <= 2048,
+        })
+    if beyond:
+        print(json.dumps(results, indent=2))
+        print(f"{beyond} routes stray further than {error_bound():.2f} px", file=sys.stderr)
+        return 1
+    return _check_budget(args, results, worst)
+
+
+def bench_geo(args):
+    """Decode every cached route and answer region queries: batch + index vs a Python scan"""
+    import math
+    import random
+    import tempfile
+    from ibis_geo import RouteIndex, decode_polylines
+    from ibis_route import decode_polyline
+    from ibis_store import ActivityStore
+
+    count = args.activities or 5000
+    strava = StravaStandIn(activities=count, seed=1)      # only its generated activities are used
+    polylines = [a['map']['summary_polyline'] for a in strava.activities]
+    starts = [a['_epoch'] for a in strava.activities]
+
+    start = time.perf_counter()
+    decoded = [decode_polyline(p) for p in polylines]
+    loop_s = time.perf_counter() - start
+    start = time.perf_counter()
+    lat, lon, offsets = decode_polylines(polylines)
+    batch_s = time.perf_counter() - start
+    mismatched = sum(1 for i, points in enumerate(decoded)
+                     if len(points) != offsets[i + 1] - offsets[i]
+                     or any(abs(a - b) > 1e-9 for point, batch in
+                            zip(points, zip(lat[offsets[i]:offsets[i + 1]], lon[offsets[i]:offsets[i + 1]]))
+                            for a, b in zip(point, batch)))
+
+    start = time.perf_counter()
+    index = RouteIndex(range(count), starts, lat, lon, offsets)
+    build_s = time.perf_counter() - start
+
+    def scan_near(lat0, lon0, radius_m):
+        """The no-index answer: every point of every route"""
+        hits = []
+        for i, points in enumerate(decoded):
+            for plat, plon in points:
+                x = math.radians(plon - lon0) * math.cos(math.radians(lat0))
+                y = math.radians(plat - lat0)
+                if (x * x + y * y) * 6371000.0 ** 2 <= radius_m ** 2:
+                    hits.append(i)
+                    break
+        return sorted(hits, key=lambda i: -starts[i])
+
+    rng = random.Random(2)
+    queries = [(51.5 + rng.uniform(-0.04, 0.04), -0.12 + rng.uniform(-0.04, 0.04), 300)
+               for _ in range(args.rounds * 4)]
+    start = time.perf_counter()
+    answers = [index.near(*query) for query in queries]
+    query_s = (time.perf_counter() - start) / len(queries)
+    start = time.perf_counter()
+    expected = [scan_near(*query) for query in queries[:3]]
+    scan_s = (time.perf_counter() - start) / 3
+    wrong = sum(1 for got, want in zip(answers, expected) if got != want)
+
+    # A store with nothing in it yet (first run, or just cleared) gives an empty index
+    with tempfile.TemporaryDirectory() as folder:
+        store = ActivityStore(os.path.join(folder, "activities.db"))
+        store.upsert(strava.activities[:3])
+        store.clear()
+        empty = RouteIndex.from_store(store)
+        if len(empty) or empty.near(51.5, -0.12, 300) or empty.most_recent_near(51.5, -0.12, 300):
+            wrong += 1
+
+    results = {'routes': count, 'points': int(offsets[-1]),
+               'decode_loop_s': round(loop_s, 4), 'decode_batch_s': round(batch_s, 4),
+               'decode_mismatches': mismatched, 'index_build_s': round(build_s, 4),
+               'grid_pairs': len(index.cell_keys),
+               'near_300m_index_ms': round(query_s * 1000, 3), 'near_300m_scan_ms': round(scan_s * 1000, 1),
+               'mean_hits': round(sum(map(len, answers)) / len(answers), 1), 'query_mismatches': wrong}
+    if mismatched or wrong:
+        print(json.dumps(results, indent=2))
+        print("Batch decode or index disagrees with the one-route-at-a-time answer", file=sys.stderr)
+        return 1
+    return _check_budget(args, results, query_s)
+
+
+BENCHES = {
+    'write': bench_write,
+    'connect': bench_connect,
+    'provision': bench_provision,
+    'setup': bench_setup,
+    'nav': bench_nav,
+    'startup': bench_startup,
+    'hotplug': bench_hotplug,
+    'find': bench_find,
+    'summary': bench_summary,
+    'cache': bench_cache,
+    'stats': bench_stats,
+    'route': bench_route,
+    'geo': bench_geo,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ibis Setup timing harnesses")
+    parser.add_argument('bench', choices=sorted(BENCHES))
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--speed', type=float, default=0.01,
+                        help="simulated board delay multiplier (1 = real board timing)")
+    parser.add_argument('--budget', type=float, help="fail if the bench takes longer (seconds)")
+    parser.add_argument('--activities', type=int,
+                        help="activities to work with (summary/cache: 600, stats: 100000, geo: 5000)")
+    parser.add_argument('--rtt', type=float, default=0.15,
+                        help="Strava stand-in seconds per request (summary bench)")
+    args = parser.parse_args(argv)
+    return BENCHES[args.bench](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
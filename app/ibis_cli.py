@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+🪶 Ibis CLI 🪶 - Headless board setup, no window needed
+
+    python Ibis.py get-config --port COM5
+    python Ibis.py provision  --port COM5 --config board.json
+    python Ibis.py test-wifi  --port COM5
+    python Ibis.py fetch      --port COM5
+    python Ibis.py wipe       --port COM5 --yes
+    python Ibis.py provision-all --config board.json [--workers 8] [--ports COM5 COM7] [--all-ports]
+
+board.json uses the same keys the board stores (ssid, password, name, clientID,
+clientSecret, refreshToken, sport, goal, trackPeriod, refreshHours). Keys left
+out are kept as they are on the board.
+
+provision-all probes every USB serial port (or just --ports) at once, keeps the
+ones that answer PING and report usbIdentity "Ibis Dash", and provisions them
+side by side on a bounded pool of workers - a batch takes about as long as its
+slowest board. Progress per board and a summary table go to stderr.
+
+Results are printed as one JSON document with timings for each step. Exit code
+is 0 when every step succeeded, 1 when one failed, 2 for bad arguments. Board
+chatter goes to stderr so stdout stays machine-readable.
+
+Only the serial link is imported here - never tkinter - so this starts fast
+and runs on machines without a display.
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import json
+import sys
+import threading
+import time
+
+import serial
+import serial.tools.list_ports
+
+from ibis_link import (BoardLink, BAUD_RATE, HandshakeError,
+                       SPORT_TYPES, TRACK_PERIODS, REFRESH_OPTIONS, CONFIG_KEYS, USB_IDENTITY,
+                       APPLY_STAGES, ApplyTransaction, command_name)
+from ibis_ports import is_usb
+
+PROVISION_WORKERS = 8
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def normalize_config(config):
+    """Check a board.json dict and convert it to what SET_CONFIG expects
+
+    trackPeriod may be given by name ("Monthly") or index; text fields are
+    stripped like the wizard does.
+    """
+    if not isinstance(config, dict):
+        raise ConfigError("config must be a JSON object")
+    unknown = sorted(set(config) - set(CONFIG_KEYS))
+    if unknown:
+        raise ConfigError(f"unknown config keys: {', '.join(unknown)}")
+
+    out = {}
+    for key, value in config.items():
+        if key in ('goal', 'trackPeriod', 'refreshHours'):
+            continue
+        if not isinstance(value, str):
+            raise ConfigError(f"{key} must be a string")
+        out[key] = value if key == 'password' else value.strip()
+
+    if 'sport' in out and out['sport'] not in SPORT_TYPES:
+        raise ConfigError(f"sport must be one of {', '.join(SPORT_TYPES)}")
+    if 'goal' in config:
+        try:
+            out['goal'] = float(config['goal'])
+        except (TypeError, ValueError):
+            raise ConfigError("goal must be a number") from None
+    if 'trackPeriod' in config:
+        period = config['trackPeriod']
+        if period in TRACK_PERIODS:
+            period = TRACK_PERIODS.index(period)
+        if not isinstance(period, int) or not 0 <= period < len(TRACK_PERIODS):
+            raise ConfigError(f"trackPeriod must be one of {', '.join(TRACK_PERIODS)}")
+        out['trackPeriod'] = period
+    if 'refreshHours' in config:
+        hours = [v for _, v, _ in REFRESH_OPTIONS]
+        if config['refreshHours'] not in hours:
+            raise ConfigError(f"refreshHours must be one of {', '.join(map(str, hours))}")
+        out['refreshHours'] = config['refreshHours']
+    return out
+
+
+def load_config(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"can't read {path}: {e}") from None
+    return normalize_config(config)
+
+
+# ==================== STEPS ====================
+class Run:
+    """One CLI invocation against one board: the open link plus timed steps"""
+
+    def __init__(self, action, port, keep_log=False, on_step=None):
+        self.link = None
+        self.keep_log = keep_log
+        self.on_step = on_step or (lambda port, step: None)
+        self.result = {'action': action, 'port': port, 'ok': False, 'steps': []}
+        self._start = time.perf_counter()
+
+    def connect(self):
+        start = time.perf_counter()
+        self.link = BoardLink(self.result['port'], BAUD_RATE).open()
+        hello = self.link.handshake()
+        self._record({'step': 'connect', 'ok': True,
+                      'seconds': round(time.perf_counter() - start, 3), 'pings': hello['pings']})
+
+    def command(self, command):
+        """Send one command and record it as a step; returns the response (or None)"""
+        name = command_name(command)
+        start = time.perf_counter()
+        response = self.link.command(command)
+        step = {'step': name, 'ok': bool(response and response.ok),
+                'seconds': round(time.perf_counter() - start, 3)}
+        if response:
+            step['reply'] = response.terminator
+            if self.keep_log:
+                step['log'] = response.log
+        self._record(step)
+        return response
+
+    def stage(self, stage, step):
+        """ApplyTransaction progress -> a step named after the stage's command"""
+        if step['status'] == 'running':
+            return
+        record = {'step': APPLY_STAGES[stage], 'ok': step['status'] != 'failed',
+                  'seconds': step['seconds'], 'reply': step['reply']}
+        if step['status'] == 'skipped':
+            record['skipped'] = "unchanged"
+        if 'breakdown' in step:
+            record['stages'] = step['breakdown']
+        self._record(record)
+
+    def _record(self, step):
+        self.result['steps'].append(step)
+        self.on_step(self.result['port'], step)
+
+    def close(self):
+        if self.link:
+            self.link.close()
+        self.result['total_s'] = round(time.perf_counter() - self._start, 3)
+
+
+def get_config(run, args):
+    response = run.command("GET_CONFIG")
+    if response and response.payload is not None:
+        run.result['config'] = response.payload
+    return bool(response and response.ok)
+
+
+def provision(run, args):
+    """Save the config, then check WiFi and draw the dashboard - stops at the first failure
+
+    Only settings that differ from the board's are sent; if none do, the
+    NVS write is skipped altogether.
+    """
+    if run.link.config is None:
+        run.command("GET_CONFIG")
+    return ApplyTransaction(run.link, args.config, on_stage=run.stage).run()
+
+
+def identify(run):
+    """True if the board behind this link is an Ibis Dash (and note what it runs)"""
+    response = run.command("GET_CONFIG")
+    board = response.payload if response else None
+    if not board or board.get('usbIdentity') != USB_IDENTITY:
+        return False
+    run.result['board'] = {'name': board.get('name', ''),
+                           'firmwareVersion': board.get('firmwareVersion', '')}
+    return True
+
+
+def test_wifi(run, args):
+    return ApplyTransaction(run.link, {}, stages=('test_wifi',), on_stage=run.stage).run()
+
+
+def fetch(run, args):
+    return ApplyTransaction(run.link, {}, stages=('fetch',), on_stage=run.stage).run()
+
+
+def wipe(run, args):
+    # DELETE_DATA, like the wizard: erase NVS and put the setup screen back up
+    response = run.command("DELETE_DATA")
+    return bool(response and response.ok)
+
+
+ACTIONS = {
+    'get-config': get_config,
+    'provision': provision,
+    'test-wifi': test_wifi,
+    'fetch': fetch,
+    'wipe': wipe,
+}
+
+
+def run_action(action, port, args):
+    """Connect, run one action and return its result dict"""
+    run = Run(action, port, keep_log=args.log)
+    try:
+        run.connect()
+        run.result['ok'] = ACTIONS[action](run, args)
+    except (HandshakeError, serial.SerialException, OSError, ValueError) as e:
+        run.result['error'] = str(e)
+    finally:
+        run.close()
+    return run.result
+
+
+# ==================== MANY BOARDS ====================
+def provision_board(port, args, on_step):
+    """Probe one port and, if it's an Ibis board, provision it
+
+    Ports that can't be opened, don't answer PING or aren't ours come back
+    without a 'board' entry and are reported as skipped.
+    """
+    run = Run('provision', port, keep_log=args.log, on_step=on_step)
+    try:
+        run.connect()
+        if identify(run):
+            run.result['ok'] = provision(run, args)
+    except (HandshakeError, serial.SerialException, OSError, ValueError) as e:
+        run.result['error'] = str(e)
+    finally:
+        run.close()
+    return run.result
+
+
+def provision_all(args):
+    # Opening a modem or Bluetooth port can hang or reset it - only USB unless asked
+    ports = args.ports or [p.device for p in serial.tools.list_ports.comports()
+                           if args.all_ports or is_usb(p)]
+    print_lock = threading.Lock()
+
+    def progress(port, step):
+        with print_lock:
+            print(f"[{port}] {step['step']:<12} {'ok' if step['ok'] else 'FAILED':<6} "
+                  f"{step['seconds']:.2f}s", file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(lambda port: provision_board(port, args, progress), ports))
+    total = time.perf_counter() - start
+
+    boards = [r for r in results if 'board' in r]
+    summary = {
+        'action': 'provision-all',
+        'ok': bool(boards) and all(r['ok'] for r in boards),
+        'boards': boards,
+        'skipped': [{'port': r['port'], 'reason': r.get('error', "not an Ibis board")}
+                    for r in results if 'board' not in r],
+        'workers': args.workers,
+        'total_s': round(total, 3),
+        'sequential_s': round(sum(r['total_s'] for r in boards), 3),
+    }
+    print_summary(summary)
+    return summary
+
+
+def print_summary(summary):
+    """Human-readable table on stderr, one row per board"""
+    columns = ["SET_CONFIG", "TEST_WIFI", "FETCH_STRAVA"]
+    rows = [["PORT", "NAME", "RESULT", *columns, "TOTAL"]]
+    for r in summary['boards']:
+        times = {s['step']: f"{s['seconds']:.2f}" for s in r['steps']}
+        failed = next((s.get('reply') or s['step'] for s in r['steps'] if not s['ok']), None)
+        result = "ok" if r['ok'] else (failed or r.get('error', "FAILED"))
+        rows.append([r['port'], r['board']['name'] or '-', result,
+                     *(times.get(c, '-') for c in columns), f"{r['total_s']:.2f}"])
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(rows[0]))]
+    print(file=sys.stderr)
+    for row in rows:
+        print("  ".join(str(cell).ljust(w) for cell, w in zip(row, widths)), file=sys.stderr)
+    ok = sum(1 for r in summary['boards'] if r['ok'])
+    print(f"\n{ok}/{len(summary['boards'])} boards provisioned in {summary['total_s']:.1f}s "
+          f"({summary['sequential_s']:.1f}s one after another), "
+          f"{len(summary['skipped'])} ports skipped", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="Ibis.py", description="Set up an Ibis Dash board without the window")
+    actions = parser.add_subparsers(dest='action', required=True)
+    for action, help_text in (('get-config', "print the board's stored settings"),
+                              ('provision', "save settings, test WiFi and draw the dashboard"),
+                              ('test-wifi', "check the board can join its WiFi"),
+                              ('fetch', "fetch Strava data and redraw the dashboard"),
+                              ('wipe', "erase all settings from the board")):
+        sub = actions.add_parser(action, help=help_text)
+        sub.add_argument('--port', required=True, help="serial port, e.g. COM5 or /dev/ttyACM0")
+        sub.add_argument('--log', action='store_true', help="include the board's log lines per step")
+        if action == 'provision':
+            sub.add_argument('--config', required=True, help="board.json with the settings to save")
+        if action == 'wipe':
+            sub.add_argument('--yes', action='store_true', help="really erase the board")
+    sub = actions.add_parser('provision-all', help="find every Ibis board and provision them all at once")
+    sub.add_argument('--config', required=True, help="board.json with the settings to save")
+    sub.add_argument('--ports', nargs='+', help="only these ports (default: every USB serial port)")
+    sub.add_argument('--all-ports', action='store_true',
+                     help="also probe serial ports without a USB VID (modems, Bluetooth)")
+    sub.add_argument('--workers', type=int, default=PROVISION_WORKERS,
+                     help=f"boards handled at the same time (default {PROVISION_WORKERS})")
+    sub.add_argument('--log', action='store_true', help="include the board's log lines per step")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.action in ('provision', 'provision-all'):
+        try:
+            args.config = load_config(args.config)
+        except ConfigError as e:
+            parser.error(str(e))
+    if args.action == 'wipe' and not args.yes:
+        parser.error("wipe erases WiFi, Strava and all settings - pass --yes to confirm")
+
+    if args.action == 'provision-all' and args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    # Link and retry messages are for humans; keep stdout for the JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.action == 'provision-all':
+            result = provision_all(args)
+        else:
+            result = run_action(args.action, args.port, args)
+    print(json.dumps(result, indent=2))
+    return 0 if result['ok'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
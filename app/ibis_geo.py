@@ -0,0 +1,198 @@
+"""
+🪶 Ibis Geo 🪶 - Where have I been? Spatial queries over the activity cache
+
+Picking what the dashboard shows by place ("the last ride through the
+park", "the most recent route near home") means looking at thousands of
+routes at once. Two pieces make that quick:
+
+- decode_polylines() decodes any number of summary_polyline strings in
+  one NumPy pass into flat lat/lon arrays plus an offsets array - route i
+  is lat[offsets[i]:offsets[i+1]]. Same format decodePolyline() reads on
+  the board (and ibis_route.decode_polyline() here).
+- RouteIndex keeps a bounding box per route and a uniform grid of the
+  cells each route has points in, so a region query only looks at the
+  points of routes that touch the region's cells.
+
+A route counts as passing through an area when one of its points lies in
+it. Summary polylines have a point every few hundred metres, well under
+GRID_CELL, so that is close enough for picking a dashboard route.
+
+NumPy is only needed by whoever imports this module.
+"""
+
+import math
+
+import numpy as np
+
+GRID_CELL = 0.01            # degrees - about 1.1 km north-south
+MAX_QUERY_CELLS = 4096      # bigger regions just check every bounding box
+EARTH_RADIUS_M = 6371000.0
+
+
+def decode_polylines(polylines):
+    """Many encoded polylines -> (lat, lon, offsets) flat arrays, all routes in one pass
+
+    Every polyline is turned into bytes and laid end to end; the 5-bit
+    chunks are joined into varints with reduceat, zigzag-decoded, and the
+    per-route running sums give the coordinates - the same points
+    ibis_route.decode_polyline() gives, polyline by polyline.
+    """
+    encoded = [(p or "").encode('ascii', errors='ignore') for p in polylines]
+    lengths = np.fromiter((len(e) for e in encoded), np.int64, len(encoded))
+    empty = (np.zeros(0), np.zeros(0), np.zeros(len(encoded) + 1, dtype=np.int64))
+    if not lengths.sum():
+        return empty
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.int64) - 63
+    route_of_byte = np.repeat(np.arange(len(encoded)), lengths)
+
+    # A varint ends at a byte without the continuation bit - or at the end of its polyline
+    ends = (data & 0x20) == 0
+    ends[np.cumsum(lengths)[lengths > 0] - 1] = True
+    end_at = np.flatnonzero(ends)
+    start_at = np.concatenate(([0], end_at[:-1] + 1))
+    shift = 5 * (np.arange(len(data)) - np.repeat(start_at, end_at - start_at + 1))
+    values = np.add.reduceat((data & 0x1F) << shift, start_at)
+    values = np.where(values & 1, ~(values >> 1), values >> 1)
+
+    # Numbers come in lat, lon pairs; a dangling lat (cut short) keeps the previous lon
+    route_of_value = route_of_byte[end_at]
+    per_route = np.bincount(route_of_value, minlength=len(encoded))
+    index_in_route = np.arange(len(values)) - np.repeat(np.cumsum(per_route) - per_route, per_route)
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum((per_route + 1) // 2, out=offsets[1:])
+    point = offsets[route_of_value] + index_in_route // 2
+    is_lon = index_in_route % 2 == 1
+    lat_delta = np.zeros(offsets[-1], dtype=np.int64)
+    lon_delta = np.zeros(offsets[-1], dtype=np.int64)
+    lat_delta[point[~is_lon]] = values[~is_lon]
+    lon_delta[point[is_lon]] = values[is_lon]
+    return (_running_sum(lat_delta, offsets) / 1e5,
+            _running_sum(lon_delta, offsets) / 1e5, offsets)
+
+
+def _running_sum(deltas, offsets):
+    """cumsum that starts over at every route"""
+    before = np.concatenate(([0], np.cumsum(deltas)))
+    return before[1:] - np.repeat(before[offsets[:-1]], np.diff(offsets))
+
+
+def _ranges(starts, stops):
+    """Concatenated arange(start, stop) for every pair - the points of many routes at once"""
+    counts = stops - starts
+    total = counts.sum()
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+
+
+class RouteIndex:
+    """Bounding boxes plus a uniform grid over many routes, for region queries
+
+    ids and starts (epoch seconds) say which activity each route belongs
+    to and when it started; queries return activity ids, newest first.
+    """
+
+    def __init__(self, ids, starts, lat, lon, offsets, cell=GRID_CELL):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.lat, self.lon, self.offsets = lat, lon, offsets
+        self.cell = cell
+        routes = len(self.ids)
+        counts = np.diff(offsets)
+        route_of_point = np.repeat(np.arange(routes), counts)
+
+        # Bounding boxes; routes without points get one nothing can overlap
+        self.south = np.full(routes, np.inf)
+        self.north = np.full(routes, -np.inf)
+        self.west = np.full(routes, np.inf)
+        self.east = np.full(routes, -np.inf)
+        drawn = counts > 0
+        if drawn.any():
+            first = offsets[:-1][drawn]
+            self.south[drawn] = np.minimum.reduceat(lat, first)
+            self.north[drawn] = np.maximum.reduceat(lat, first)
+            self.west[drawn] = np.minimum.reduceat(lon, first)
+            self.east[drawn] = np.maximum.reduceat(lon, first)
+
+        # Grid: every (cell, route) pair once, sorted by cell for searchsorted. Cell keys
+        # already take 64 bits, so the pairs are sorted as pairs, not packed into one number
+        keys = self._cell_keys(lat, lon)
+        order = np.lexsort((route_of_point, keys))
+        keys, owners = keys[order], route_of_point[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = (keys[1:] != keys[:-1]) | (owners[1:] != owners[:-1])
+        self.cell_keys = keys[first]
+        self.cell_routes = owners[first]
+
+    @classmethod
+    def from_activities(cls, activities, cell=GRID_CELL):
+        """From Strava activity dicts (e.g. ActivityStore.activities())"""
+        from ibis_store import start_epoch
+        lat, lon, offsets = decode_polylines([(a.get('map') or {}).get('summary_polyline')
+                                              for a in activities])
+        return cls([a['id'] for a in activities], [start_epoch(a) for a in activities],
+                   lat, lon, offsets, cell)
+
+    @classmethod
+    def from_store(cls, store, cell=GRID_CELL):
+        """Every route in an ActivityStore - only the polylines are read, not whole activities"""
+        rows = store.routes()
+        ids, starts, polylines = zip(*rows) if rows else ((), (), ())
+        lat, lon, offsets = decode_polylines(polylines)
+        return cls(ids, starts, lat, lon, offsets, cell)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _cell_keys(self, lat, lon):
+        rows = np.floor(np.asarray(lat) / self.cell).astype(np.int64)
+        cols = np.floor(np.asarray(lon) / self.cell).astype(np.int64)
+        return (rows << 32) + (cols + (1 << 31))
+
+    # ==================== QUERIES ====================
+    def candidates(self, south, west, north, east):
+        """Routes that might have a point in the box - grid cells first, then bounding boxes"""
+        rows = np.arange(math.floor(south / self.cell), math.floor(north / self.cell) + 1)
+        cols = np.arange(math.floor(west / self.cell), math.floor(east / self.cell) + 1)
+        if len(rows) * len(cols) > MAX_QUERY_CELLS:
+            routes = np.arange(len(self.ids))
+        else:
+            keys = ((rows[:, None] << 32) + (cols[None, :] + (1 << 31))).ravel()
+            lo = np.searchsorted(self.cell_keys, keys, 'left')
+            hi = np.searchsorted(self.cell_keys, keys, 'right')
+            routes = np.unique(self.cell_routes[_ranges(lo, hi)])
+        overlap = ((self.south[routes] <= north) & (self.north[routes] >= south)
+                   & (self.west[routes] <= east) & (self.east[routes] >= west))
+        return routes[overlap]
+
+    def within(self, south, west, north, east):
+        """Activity ids with a route point inside the box, newest first"""
+        routes, lat, lon, owner = self._points_of(self.candidates(south, west, north, east))
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        return self._newest_first(np.unique(owner[inside]))
+
+    def near(self, lat, lon, radius_m):
+        """Activity ids with a route point within radius_m of (lat, lon), newest first"""
+        dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+        dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        routes, plat, plon, owner = self._points_of(
+            self.candidates(lat - dlat, lon - dlon, lat + dlat, lon + dlon))
+        # Equirectangular is plenty at these distances
+        x = np.radians(plon - lon) * math.cos(math.radians(lat))
+        y = np.radians(plat - lat)
+        close = (x * x + y * y) * EARTH_RADIUS_M ** 2 <= radius_m ** 2
+        return self._newest_first(np.unique(owner[close]))
+
+    def most_recent_near(self, lat, lon, radius_m):
+        """The newest activity that came within radius_m of (lat, lon), or None"""
+        found = self.near(lat, lon, radius_m)
+        return found[0] if found else None
+
+    def _points_of(self, routes):
+        points = _ranges(self.offsets[routes], self.offsets[routes + 1])
+        owner = np.repeat(routes, self.offsets[routes + 1] - self.offsets[routes])
+        return routes, self.lat[points], self.lon[points], owner
+
+    def _newest_first(self, routes):
+        order = np.argsort(-self.starts[routes], kind='stable')
+        return [int(i) for i in self.ids[routes[order]]]
@@ -0,0 +1,809 @@
+"""
+🪶 Ibis Link 🪶 - Serial connection to an Ibis Dash board
+
+One BoardLink per open port. A background reader thread blocks on the port,
+splits the byte stream into lines and feeds them to the command currently in
+flight. As soon as that command's terminator line arrives, the finished
+response is handed back through a thread-safe queue - no polling, no waiting
+for the next tick.
+
+Terminators are matched against whole lines only, exactly as printed by
+processSerialCommand() in IBIS_V40.ino, so a log line like "JSON parsed OK,
+saving to NVS..." can never end a read early.
+"""
+
+import collections
+import json
+import queue
+import random
+import re
+import threading
+import time
+
+import serial
+
+BAUD_RATE = 115200
+SERIAL_TIMEOUT = 15
+WRITE_TIMEOUT = 15
+
+# Every command is echoed within milliseconds; no echo at all this long after
+# writing means the line (or its newline) never made it to the board
+FIRST_REPLY_TIMEOUT = 2.0
+
+# Connect handshake: PING every HANDSHAKE_PING_INTERVAL until PONG comes back.
+# A port that stays completely silent is given up after HANDSHAKE_SILENT_TIMEOUT;
+# a board that shows signs of life (boot banner, logs) gets the full HANDSHAKE_TIMEOUT.
+HANDSHAKE_TIMEOUT = 8
+HANDSHAKE_SILENT_TIMEOUT = 3
+HANDSHAKE_PING_INTERVAL = 0.25
+BOOT_BANNER = "IBIS DASH"
+
+# handleSerialCommands() keeps at most this many characters of one command line
+# and silently drops the rest, so longer commands are refused before sending
+MAX_COMMAND_BYTES = 2048
+
+# Write pacing: full speed by default, chunked only after the board dropped bytes
+CONSERVATIVE_CHUNK = 32
+CONSERVATIVE_RATE = 640        # bytes/s - the old fixed 32 B per 50 ms pacing
+PACER_RECOVER_AFTER = 5        # clean commands before going back to full speed
+
+# The reader thread blocks in read(); this only bounds how long close() waits
+# for it on platforms where cancel_read() is not available
+READ_WAKEUP = 0.5
+
+# Whole-line terminators per command: (success lines, failure lines)
+TERMINATORS = {
+    "PING": (("PONG",), ()),
+    "GET_CONFIG": (("OK",), ()),
+    "SET_CONFIG": (("SUCCESS",), ()),
+    "WIPE_CONFIG": (("WIPED",), ()),
+    "DELETE_DATA": (("SETUP_SCREEN_DRAWN",), ()),
+    "TEST_WIFI": (("WIFI_OK",), ("WIFI_FAILED", "NO_WIFI_CREDENTIALS")),
+    "FETCH_STRAVA": (("DASHBOARD_DRAWN",), ("NO_WIFI_CREDENTIALS", "NO_STRAVA_CREDENTIALS",
+                                            "WIFI_CONNECT_FAILED", "TOKEN_REFRESH_FAILED")),
+    "SET_SUMMARY": (("DASHBOARD_DRAWN",), ()),
+    "SHOW_SETUP_SCREEN": (("SETUP_SCREEN_DRAWN",), ()),
+    "GO_SLEEP": (("OK",), ()),
+    "RESTART": (("OK",), ()),
+}
+# How each command is sent and waited for (BoardLink.command):
+#   idempotent - safe to send again when its reply goes missing. Anything else
+#                is sent once: the firmware only reads serial from loop(), so a
+#                board still busy with an e-paper refresh echoes late, and a
+#                resend would run the command twice
+#   first_byte - the echo must start arriving this soon after the write
+#   idle       - longest the board may go quiet once it has started answering,
+#                so slow commands are judged by silence rather than wall time
+#   deadline   - cap on one attempt, however chatty the board is
+#   attempts   - sends at most; between them sleep a random 0..backoff*2^n s
+CommandPolicy = collections.namedtuple(
+    'CommandPolicy', 'idempotent first_byte idle deadline attempts backoff')
+COMMAND_POLICIES = {
+    "PING": CommandPolicy(True, 1.0, 1.0, 2, 3, 0.1),
+    "GET_CONFIG": CommandPolicy(True, FIRST_REPLY_TIMEOUT, 3, SERIAL_TIMEOUT, 3, 0.25),
+    "SET_CONFIG": CommandPolicy(True, FIRST_REPLY_TIMEOUT, 5, 10, 3, 0.25),
+    # Joining WiFi prints a dot every 500 ms
+    "TEST_WIFI": CommandPolicy(True, FIRST_REPLY_TIMEOUT, 10, 30, 2, 1.0),
+    # These end in an e-paper refresh - the longest silence the firmware has
+    "FETCH_STRAVA": CommandPolicy(False, FIRST_REPLY_TIMEOUT, 30, 180, 1, 1.0),
+    "SET_SUMMARY": CommandPolicy(False, FIRST_REPLY_TIMEOUT, 30, 90, 1, 1.0),
+    "DELETE_DATA": CommandPolicy(False, FIRST_REPLY_TIMEOUT, 30, 90, 1, 1.0),
+    "SHOW_SETUP_SCREEN": CommandPolicy(False, FIRST_REPLY_TIMEOUT, 30, 90, 1, 1.0),
+    "WIPE_CONFIG": CommandPolicy(False, FIRST_REPLY_TIMEOUT, 5, 10, 1, 0.25),
+    "GO_SLEEP": CommandPolicy(False, FIRST_REPLY_TIMEOUT, 5, 10, 1, 0.25),
+    "RESTART": CommandPolicy(False, FIRST_REPLY_TIMEOUT, 5, 10, 1, 0.25),
+}
+DEFAULT_POLICY = CommandPolicy(False, FIRST_REPLY_TIMEOUT, 5, SERIAL_TIMEOUT, 1, 0.25)
+BACKOFF_CAP = 5.0
+# Anything the firmware doesn't know (or can't parse) ends with ERROR
+FAILURE_TERMINATORS = ("ERROR",)
+GENERIC_TERMINATORS = (("OK", "SUCCESS", "WIPED"), ("FAILED",))
+
+
+# Every command is echoed first as "CMD[<length>]: <first 50 chars>"
+ECHO_RE = re.compile(r'^CMD\[(\d+)\]: ')
+
+
+def command_name(command):
+    """'SET_CONFIG:{...}' -> 'SET_CONFIG'"""
+    return command.split(':', 1)[0].strip()
+
+
+def command_policy(command):
+    return COMMAND_POLICIES.get(command_name(command), DEFAULT_POLICY)
+
+
+def _span(start, end):
+    return round(end - start, 4) if start is not None and end is not None else None
+
+
+# ==================== BOARD CONFIG ====================
+# What the board stores in NVS (see saveConfigFromSerial / sendCurrentConfig)
+SPORT_TYPES = ["Run", "Ride", "Swim", "Hike", "Walk"]
+TRACK_PERIODS = ["Yearly", "Monthly", "Weekly"]
+REFRESH_OPTIONS = [
+    ("Every hour", 1, "~3-5 days battery"),
+    ("Every 6 hours", 6, "~2-3 weeks battery"),
+    ("Every 12 hours", 12, "~1 month battery"),
+    ("Once a day", 24, "~2 months battery"),
+    ("Every 2 days", 48, "~3-4 months battery"),
+    ("Once a week", 168, "~6+ months battery")
+]
+USB_IDENTITY = "Ibis Dash"      # sendCurrentConfig's usbIdentity - how we know it's our board
+CONFIG_KEYS = ('ssid', 'password', 'name', 'title', 'clientID', 'clientSecret',
+               'refreshToken', 'sport', 'goal', 'trackPeriod', 'refreshHours')
+
+
+def config_command(config):
+    """The SET_CONFIG line for a config dict - compact, the board keeps 2048 chars"""
+    return f"SET_CONFIG:{json.dumps(config, separators=(',', ':'))}"
+
+
+def same_setting(key, a, b):
+    """Compare one setting the way the board stores it (goal is a 32-bit float in NVS)"""
+    if key == 'goal' and isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return abs(a - b) < 1e-3
+    return a == b
+
+
+def has_wifi(config):
+    return bool(config.get('ssid'))
+
+
+def has_strava(config):
+    return bool(config.get('clientID') and config.get('clientSecret') and config.get('refreshToken'))
+
+
+class WritePacer:
+    """Adaptive write pacing for one link
+
+    USB CDC has its own flow control, so as long as the board keeps up the
+    whole command goes out in a single write with no sleeps at all, and we
+    only measure how fast it was accepted. The board echoes the length of
+    every command it received (CMD[n]); if that ever comes back short, bytes
+    were dropped and we fall back to small chunks paced at a safe rate until
+    the board has handled a few commands cleanly again.
+    """
+
+    def __init__(self):
+        self.conservative = False
+        self.rate = None            # measured bytes/s, smoothed
+        self.clean = 0
+        self.drops = 0
+
+    def write(self, port, data):
+        """Push one command line out, return seconds spent writing"""
+        start = time.perf_counter()
+        if not self.conservative:
+            port.write(data)
+            port.flush()
+        else:
+            rate = min(self.rate or CONSERVATIVE_RATE, CONSERVATIVE_RATE)
+            for i in range(0, len(data), CONSERVATIVE_CHUNK):
+                chunk = data[i:i + CONSERVATIVE_CHUNK]
+                port.write(chunk)
+                port.flush()
+                time.sleep(len(chunk) / rate)
+        elapsed = time.perf_counter() - start
+        if not self.conservative and elapsed > 0 and len(data) >= CONSERVATIVE_CHUNK:
+            measured = len(data) / elapsed
+            self.rate = measured if self.rate is None else 0.7 * self.rate + 0.3 * measured
+        return elapsed
+
+    def confirm(self, sent, echoed):
+        """Compare what we sent with the length the board says it received
+
+        echoed is None when the board printed no echo (older firmware), and 0
+        when it never reacted at all - the newline itself was lost.
+        """
+        if echoed is None:
+            return True
+        if echoed < sent:
+            self.drops += 1
+            self.clean = 0
+            if not self.conservative:
+                print(f"Board received {echoed}/{sent} bytes - pacing writes")
+            self.conservative = True
+            return False
+        self.clean += 1
+        if self.conservative and self.clean >= PACER_RECOVER_AFTER:
+            self.conservative = False
+        return True
+
+
+class LineParser:
+    """Incremental bytes -> lines splitter
+
+    Each byte is scanned for a newline once and each complete line is
+    decoded once; a partial line just waits in the buffer for the rest.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        scan_from = len(self._buffer)
+        self._buffer += data
+        lines = []
+        start = 0
+        while True:
+            nl = self._buffer.find(b"\n", scan_from)
+            if nl < 0:
+                break
+            lines.append(self._buffer[start:nl].decode('utf-8', errors='replace').rstrip('\r'))
+            start = scan_from = nl + 1
+        if start:
+            del self._buffer[:start]
+        return lines
+
+
+class HandshakeError(Exception):
+    """The port never answered PING within the handshake budget"""
+
+
+class PendingCommand:
+    """A command in flight - filled line by line by the reader thread
+
+    Once finished it doubles as the structured response: the JSON line(s)
+    the firmware printed end up in payload, everything else in log.
+    """
+
+    def __init__(self, command, timeout=SERIAL_TIMEOUT, on_line=None):
+        self.command = command
+        self.name = command_name(command)
+        self.timeout = timeout
+        self.on_line = on_line     # called on the reader thread for every line
+        self.success, failure = TERMINATORS.get(self.name, GENERIC_TERMINATORS)
+        self.failure = failure + FAILURE_TERMINATORS
+        self.lines = []
+        self.log = []
+        self.payload = None
+        self.echo_length = None
+        self.first_line_at = None
+        self.sent_at = None        # write started / finished / reply ended (time.time())
+        self.written_at = None
+        self.finished_at = None
+        self.terminator = None
+        self.error = None
+        self.finished = False
+        self.foreign = False       # inside another command's reply
+        # The reader thread puts this command here once it is finished
+        self.reply = queue.Queue(maxsize=1)
+
+    @property
+    def ok(self):
+        return self.terminator in self.success
+
+    @property
+    def sent_length(self):
+        """Length as the firmware counts it (after String.trim())"""
+        return len(self.command.strip().encode('utf-8'))
+
+    @property
+    def dropped(self):
+        """True if the board echoed fewer bytes than we sent"""
+        return self.echo_length is not None and self.echo_length < self.sent_length
+
+    @property
+    def response(self):
+        return "\n".join(self.lines)
+
+    def feed(self, line):
+        """Add one line, return True if it ends the response"""
+        if self.first_line_at is None:
+            self.first_line_at = time.time()
+        if self.on_line:
+            self.on_line(line)
+        text = line.strip()
+        echo = ECHO_RE.match(text)
+        if echo:
+            # Our reply starts at our echo - anything before it was left over
+            # from an earlier command, and so is everything after the late
+            # echo of a command given up on
+            self.foreign = command_name(text[echo.end():]) != self.name
+            if not self.foreign:
+                self.echo_length = int(echo.group(1))
+                self.lines = []
+                self.log = []
+                self.payload = None
+        if self.foreign:
+            return False
+        self.lines.append(line)
+        if text in self.success or text in self.failure:
+            self.terminator = text
+            return True
+        if text.startswith('{') and text.endswith('}'):
+            try:
+                self.payload = json.loads(text)
+                return False
+            except ValueError:
+                pass
+        self.log.append(line)
+        return False
+
+    def wait(self, timeout=None):
+        """Block until the reader thread finishes this command (or timeout)"""
+        if self.finished and self.reply.empty():
+            return True
+        try:
+            self.reply.get(timeout=timeout)
+            return True
+        except queue.Empty:
+            return False
+
+
+class BoardLink:
+    """Serial port + reader thread for one board"""
+
+    def __init__(self, port, baud=BAUD_RATE):
+        self.port = port
+        self.baud = baud
+        self.serial = None
+        self.error = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.last_rx = None        # time.time() of the last byte from the board
+        self.pacer = WritePacer()
+        # Lines that arrived while no command was waiting (boot logs etc.)
+        self.unsolicited = collections.deque(maxlen=200)
+        self.config = None         # last settings read from / written to the board
+        self.on_command = None     # on_command(timing) after every command(), on the caller's thread
+        self._pending = None
+        self._parser = LineParser()
+        self._lock = threading.Lock()
+        self._command_lock = threading.Lock()
+        self._reader = None
+        self._running = False
+
+    @property
+    def is_open(self):
+        return self._running and self.serial is not None
+
+    def open(self):
+        self.serial = serial.Serial(self.port, self.baud, timeout=READ_WAKEUP,
+                                    write_timeout=WRITE_TIMEOUT)
+        self.error = None
+        self._running = True
+        self._reader = threading.Thread(target=self._read_loop, name=f"ibis-reader-{self.port}",
+                                        daemon=True)
+        self._reader.start()
+        return self
+
+    def close(self):
+        self._running = False
+        if self.serial:
+            try:
+                self.serial.cancel_read()
+            except Exception:
+                pass
+            try:
+                self.serial.close()
+            except Exception:
+                pass
+        if self._reader and self._reader is not threading.current_thread():
+            self._reader.join(READ_WAKEUP * 2)
+        self._reader = None
+        self.serial = None
+        with self._lock:
+            pending = self._pending
+        if pending:
+            self._finish(pending, serial.SerialException("Port closed"))
+
+    # ==================== READER THREAD ====================
+    def _read_loop(self):
+        while self._running:
+            try:
+                # Blocks until at least one byte arrives, then grab the rest
+                data = self.serial.read(1)
+                if data and self.serial.in_waiting:
+                    data += self.serial.read(self.serial.in_waiting)
+            except (OSError, TypeError, AttributeError, serial.SerialException) as e:
+                if self._running:
+                    print(f"Reader stopped on {self.port}: {e}")
+                    self.error = e if isinstance(e, (OSError, serial.SerialException)) \
+                        else serial.SerialException(str(e))
+                    self._running = False
+                    with self._lock:
+                        pending = self._pending
+                    if pending:
+                        self._finish(pending, self.error)
+                return
+            if data:
+                self._feed(data)
+
+    def _feed(self, data):
+        self.bytes_in += len(data)
+        self.last_rx = time.time()
+        for line in self._parser.feed(data):
+            self._on_line(line)
+
+    def _on_line(self, line):
+        with self._lock:
+            pending = self._pending
+        if pending is None:
+            self.unsolicited.append(line)
+        elif pending.feed(line):
+            self._finish(pending)
+
+    def _finish(self, pending, error=None):
+        with self._lock:
+            if pending.finished:
+                return
+            pending.finished = True
+            pending.finished_at = time.time()
+            pending.error = error
+            if self._pending is pending:
+                self._pending = None
+        pending.reply.put(pending)
+
+    # ==================== HANDSHAKE ====================
+    def handshake(self, timeout=HANDSHAKE_TIMEOUT, silent_timeout=HANDSHAKE_SILENT_TIMEOUT,
+                  interval=HANDSHAKE_PING_INTERVAL):
+        """PING until the board answers PONG, return what we learned
+
+        Replaces a fixed settle delay: an awake board answers the first PING
+        within milliseconds, a booting board is recognised by its banner and
+        given the full budget, and a dead port fails after silent_timeout.
+        """
+        start = time.time()
+        banner = list(self.unsolicited)
+        with self._command_lock:
+            pending = PendingCommand("PING", timeout)
+            with self._lock:
+                self._pending = pending
+            pings = 0
+            try:
+                while True:
+                    self._write(b"PING\n")
+                    pings += 1
+                    if pending.wait(interval):
+                        break
+                    elapsed = time.time() - start
+                    if self.bytes_in == 0 and elapsed >= silent_timeout:
+                        raise HandshakeError(f"No data from {self.port} after {elapsed:.1f}s")
+                    if elapsed >= timeout:
+                        raise HandshakeError(f"Board on {self.port} did not answer PING "
+                                             f"within {timeout}s")
+            except (OSError, serial.SerialException) as e:
+                self._finish(pending, e)
+                raise
+            finally:
+                self._finish(pending)
+            if isinstance(pending.error, (OSError, serial.SerialException)):
+                raise pending.error
+            if pings > 1:
+                # Let PONGs for the extra PINGs drain so they don't leak into the next reply
+                time.sleep(interval)
+        banner += [line for line in pending.log if line]
+        return {
+            'elapsed': time.time() - start,
+            'pings': pings,
+            'booting': any(BOOT_BANNER in line for line in banner),
+            'log': banner,
+        }
+    
+    # ==================== CONFIG SNAPSHOT ====================
+    def config_delta(self, config):
+        """The part of config the board doesn't already hold
+
+        Compared against the last GET_CONFIG / SET_CONFIG on this link. An
+        empty dict means there is nothing to write; with no snapshot yet,
+        everything is sent.
+        """
+        if self.config is None:
+            return dict(config)
+        return {key: value for key, value in config.items()
+                if key not in self.config or not same_setting(key, self.config[key], value)}
+
+    def _remember(self, pending, command):
+        """Keep the config snapshot in step with what the board acknowledged"""
+        if pending.name in ("WIPE_CONFIG", "DELETE_DATA"):
+            self.config = None
+        if not pending.ok:
+            return
+        if pending.name == "GET_CONFIG" and isinstance(pending.payload, dict):
+            self.config = {k: pending.payload[k] for k in CONFIG_KEYS if k in pending.payload}
+        elif pending.name == "SET_CONFIG":
+            sent = json.loads(command.split(':', 1)[1])
+            self.config = {**(self.config or {}), **sent}
+        elif pending.name == "SET_SUMMARY" and self.config is not None:
+            sent = json.loads(command.split(':', 1)[1])
+            if 'refreshToken' in sent:
+                self.config['refreshToken'] = sent['refreshToken']
+
+    # ==================== COMMANDS ====================
+    def _write(self, data):
+        self.pacer.write(self.serial, data)
+        self.bytes_out += len(data)
+
+    def submit(self, command, timeout=None, on_line=None):
+        """Send a command and return its PendingCommand without waiting"""
+        if not self.is_open:
+            raise self.error or serial.SerialException("Port not open")
+        line = command.encode('utf-8')
+        if len(line) > MAX_COMMAND_BYTES:
+            raise ValueError(f"{command_name(command)} is {len(line)} bytes, the board "
+                             f"keeps at most {MAX_COMMAND_BYTES}")
+        # The leading newline flushes any half line a previous write left in
+        # the board's buffer; the firmware ignores empty lines
+        data = b"\n" + line + b"\n"
+        pending = PendingCommand(command, timeout or command_policy(command).deadline, on_line)
+        # Register before writing so a fast reply can't slip past us
+        with self._lock:
+            self._pending = pending
+        pending.sent_at = time.time()
+        try:
+            self._write(data)
+        except Exception as e:
+            self._finish(pending, e)
+        pending.written_at = time.time()
+        return pending
+
+    def command(self, command, timeout=None, on_line=None):
+        """Send a command, return the finished PendingCommand (or None)
+
+        Check .ok for the success terminator; a reply that timed out
+        without any terminator still carries whatever lines did arrive.
+        Timing and retries follow the command's COMMAND_POLICIES entry;
+        timeout overrides its deadline. on_line(line) sees every line as
+        it arrives, on the reader thread. Blocks the calling thread - the
+        GUI only calls this from its workers.
+        """
+        started = time.time()
+        bytes_in, bytes_out = self.bytes_in, self.bytes_out
+        attempts = []
+        result = None
+        try:
+            result = self._command(command, timeout, on_line, attempts)
+            return result
+        finally:
+            if self.on_command and attempts:
+                last = attempts[-1]
+                self.on_command({
+                    'command': last.name,
+                    'ok': bool(result and result.ok),
+                    'terminator': last.terminator,
+                    'write_s': _span(last.sent_at, last.written_at),
+                    'first_byte_s': _span(last.sent_at, last.first_line_at),
+                    'terminator_s': _span(last.sent_at, last.finished_at) if last.terminator else None,
+                    'total_s': round(time.time() - started, 4),
+                    'bytes_out': self.bytes_out - bytes_out,
+                    'bytes_in': self.bytes_in - bytes_in,
+                    'retries': len(attempts) - 1,
+                })
+
+    def _command(self, command, timeout, on_line, attempts):
+        policy = command_policy(command)
+        with self._command_lock:
+            for attempt in range(policy.attempts):
+                if attempt:
+                    time.sleep(random.uniform(0, min(BACKOFF_CAP, policy.backoff * 2 ** (attempt - 1))))
+                pending = self.submit(command, timeout, on_line)
+                attempts.append(pending)
+                deadline = time.time() + pending.timeout
+                if not pending.wait(min(policy.first_byte, pending.timeout)) \
+                        and pending.first_line_at is None:
+                    # Not even an echo: the command never reached the board intact
+                    self._finish(pending)
+                    self.pacer.confirm(pending.sent_length, 0)
+                    print(f"No echo for {pending.name} (attempt {attempt+1}/{policy.attempts})")
+                    continue
+                if not self._wait_reply(pending, policy, deadline):
+                    print(f"{pending.name} went quiet without finishing "
+                          f"(attempt {attempt+1}/{policy.attempts})")
+                self._finish(pending)
+                if isinstance(pending.error, (OSError, serial.SerialException)):
+                    raise pending.error
+                if pending.error:
+                    print(f"Send error (attempt {attempt+1}/{policy.attempts}): {pending.error}")
+                    if policy.idempotent:
+                        continue
+                    return None
+                if not self.pacer.confirm(pending.sent_length, pending.echo_length) \
+                        and (policy.idempotent or pending.terminator in pending.failure):
+                    # The board saw a mangled command - send it again, paced this time
+                    continue
+                if pending.terminator is None and policy.idempotent \
+                        and attempt + 1 < policy.attempts:
+                    # Went quiet halfway - harmless to ask again
+                    continue
+                if pending.lines:
+                    self._remember(pending, command)
+                    return pending
+        return None
+
+    def _wait_reply(self, pending, policy, deadline):
+        """Wait for the terminator while the board keeps talking
+
+        False once the board has been quiet for policy.idle or the deadline
+        passed. Any byte counts as talking - WiFi joins print bare dots.
+        """
+        while True:
+            now = time.time()
+            quiet = now - max(self.last_rx or 0, pending.first_line_at or 0)
+            remaining = min(deadline - now, policy.idle - quiet)
+            if remaining <= 0:
+                return False
+            if pending.wait(remaining):
+                return True
+
+
+# ==================== FETCH PROGRESS ====================
+# FETCH_STRAVA's log lines that open each stage (processSerialCommand,
+# fetchStravaData, drawDashboard) and each stage's rough share of a real
+# fetch - the e-paper refresh alone is about half of it
+FETCH_STAGES = [
+    ('wifi', "Connecting to WiFi...", 0.15),
+    ('token', "Refreshing token...", 0.05),
+    ('pages', "Fetching Strava data...", 0.25),
+    ('aggregate', "=== Strava Fetch Complete ===", 0.05),
+    ('render', "Drawing dashboard...", 0.50),
+]
+# Worth noting inside a stage: a token cache hit, the e-paper refresh starting
+FETCH_MARKS = ("Using cached access token", "Starting display refresh...")
+FETCH_MAX_PAGES = 10           # fetchStravaData stops after 10 pages of 30
+PAGE_RE = re.compile(r'^Page (\d+): (\d+) activities')
+
+
+class FetchProgress:
+    """Typed progress events from the lines FETCH_STRAVA streams
+
+    feed() runs on the reader thread and only appends; the UI reads
+    .stage / .fraction / .events whenever it redraws.
+    Each event is {'stage', 'event' ('start', 'page', 'mark', 'end'), 'time',
+    'detail'}
+    with time in seconds since the command was sent.
+    """
+
+    def __init__(self):
+        self.start = time.time()
+        self.events = []
+        self.stage = None
+        self.pages = 0
+        self.activities = 0
+        self.finished = False
+        self._markers = {marker: stage for stage, marker, _ in FETCH_STAGES}
+
+    def feed(self, line):
+        text = line.strip()
+        if text in self._markers:
+            self.stage = self._markers[text]
+            self._event('start', text)
+            return
+        page = PAGE_RE.match(text)
+        if page:
+            self.pages = int(page.group(1))
+            self.activities += int(page.group(2))
+            self._event('page', text)
+        elif text in FETCH_MARKS:
+            self._event('mark', text)
+        elif text in TERMINATORS["FETCH_STRAVA"][0] + TERMINATORS["FETCH_STRAVA"][1]:
+            self.finished = True
+            self._event('end', text)
+
+    def _event(self, kind, detail):
+        self.events.append({'stage': self.stage, 'event': kind,
+                            'time': round(time.time() - self.start, 3), 'detail': detail})
+
+    @property
+    def fraction(self):
+        """0..1 for a progress bar: finished stages plus pages read so far"""
+        if self.finished:
+            return 1.0
+        done = 0.0
+        for stage, _, share in FETCH_STAGES:
+            if stage == self.stage:
+                if stage == 'pages':
+                    done += share * min(self.pages / FETCH_MAX_PAGES, 1.0)
+                return done
+            done += share
+        return 0.0
+
+    def breakdown(self):
+        """Seconds spent in each stage that started"""
+        starts = [(e['stage'], e['time']) for e in self.events if e['event'] == 'start']
+        end = self.events[-1]['time'] if self.events else 0.0
+        if not self.finished:
+            end = round(time.time() - self.start, 3)
+        times = {}
+        for i, (stage, t) in enumerate(starts):
+            until = starts[i + 1][1] if i + 1 < len(starts) else end
+            times[stage] = round(until - t, 3)
+        return times
+
+
+# ==================== APPLY ====================
+# Stage -> command it sends ('save' is SET_CONFIG with just the changed settings)
+APPLY_STAGES = {
+    'save': "SET_CONFIG",
+    'test_wifi': "TEST_WIFI",
+    'fetch': "FETCH_STRAVA",
+    'summary': "SET_SUMMARY",
+    'setup_screen': "SHOW_SETUP_SCREEN",
+}
+
+
+class ApplyTransaction:
+    """Push settings to the board and bring it up, as one resumable job
+
+    Stages run back to back - each command goes out the moment the previous
+    terminator arrives. A failed stage stops the run with the position kept,
+    so calling run() again retries from that stage and nothing that already
+    succeeded is repeated.
+
+    on_stage(stage, step) is called when a stage starts (status 'running') and
+    when it ends ('ok', 'failed' or 'skipped'). The fetch stage's running step
+    carries a FetchProgress to watch; its end step a per-stage 'breakdown'.
+
+    The summary stage asks summary(config) for a SET_SUMMARY line worked
+    out on this machine (see ibis_summary). If that fails - no internet,
+    Strava down - the board is sent FETCH_STRAVA and does the work itself.
+    """
+
+    def __init__(self, link, config, stages=('save', 'test_wifi', 'fetch'), on_stage=None,
+                 summary=None):
+        self.link = link
+        self.config = config
+        self.stages = list(stages)
+        self.on_stage = on_stage or (lambda stage, step: None)
+        self.summary = summary
+        self.position = 0
+        self.steps = {}
+        self.response = None
+
+    @property
+    def done(self):
+        return self.position >= len(self.stages)
+
+    @property
+    def stage(self):
+        """The stage that runs next - after a failure, the one that failed"""
+        return None if self.done else self.stages[self.position]
+
+    def run(self):
+        """Run the remaining stages; True once every stage has succeeded
+
+        Serial errors propagate with the position kept, like any failure.
+        """
+        while not self.done:
+            stage = self.stages[self.position]
+            command = APPLY_STAGES[stage]
+            if stage == 'save':
+                delta = self.link.config_delta(self.config)
+                if not delta:
+                    self._report(stage, {'status': 'skipped', 'seconds': 0.0, 'reply': None})
+                    self.position += 1
+                    continue
+                command = config_command(delta)
+            elif stage == 'summary':
+                command = self._summary_command()
+
+            progress = FetchProgress() if command == "FETCH_STRAVA" else None
+            self.on_stage(stage, {'stage': stage, 'status': 'running', 'progress': progress})
+            start = time.perf_counter()
+            self.response = self.link.command(command, on_line=progress and progress.feed)
+            ok = bool(self.response and self.response.ok)
+            step = {'status': 'ok' if ok else 'failed',
+                    'seconds': round(time.perf_counter() - start, 3),
+                    'reply': self.response.terminator if self.response else None}
+            if progress:
+                step['breakdown'] = progress.breakdown()
+            self._report(stage, step)
+            if not ok:
+                return False
+            self.position += 1
+        return True
+
+    def _summary_command(self):
+        if self.summary:
+            try:
+                return self.summary(self.config)
+            except Exception as e:
+                print(f"Couldn't add up Strava here ({e}) - the board will fetch it")
+        return "FETCH_STRAVA"
+
+    def _report(self, stage, step):
+        step = {'stage': stage, **step}
+        self.steps[stage] = step
+        self.on_stage(stage, step)
+
@@ -0,0 +1,134 @@
+"""
+🪶 Ibis OAuth 🪶 - Strava authorization callback for the Ibis Setup app
+
+Strava redirects the browser to http://127.0.0.1:<port>/callback with the
+authorization code. OAuthServer is one long-lived loopback server for
+that redirect:
+
+- it is listening before the browser is opened (ready is set once the
+  socket is bound), so the redirect can never beat the bind
+- the redirect names 127.0.0.1, the address actually bound: where
+  localhost resolves to ::1 first the browser would knock on the wrong
+  door. Strava accepts localhost and 127.0.0.1 whatever callback domain
+  the app has set
+- if 8089 is taken it falls back to any free port - Strava only checks
+  the callback domain, not the port
+- every authorize URL carries a random state; callbacks without a state
+  we handed out are refused, and favicon or other stray requests get a
+  404 without using anything up
+- it keeps serving until shutdown(), so a second attempt needs no restart
+
+The wizard imports this module on a worker once the Strava step is shown,
+so the HTTP server machinery stays out of startup.
+"""
+
+import http.server
+import secrets
+import threading
+import urllib.parse
+
+REDIRECT_PORT = 8089
+AUTH_URL = "https://www.strava.com/oauth/authorize"
+SCOPE = "read,activity:read_all"
+
+PAGE_STYLE = "font-family:'Segoe UI',Arial,sans-serif;background:#1a1a2e;text-align:center;padding:60px 20px;"
+SUCCESS_PAGE = f"""<html><body style="{PAGE_STYLE}color:#eaeaea;">
+    <h1 style="color:#4ecca3;font-size:52px;font-weight:900;letter-spacing:3px;margin-bottom:10px;">SUCCESS!!!</h1>
+    <p style="font-size:20px;color:#9da3cc;margin-top:20px;">YOU CAN NOW CLOSE THIS WINDOW</p></body></html>"""
+FAILED_PAGE = f"""<html><body style="{PAGE_STYLE}color:#e94560;"><h1>Authorization failed.</h1></body></html>"""
+STALE_PAGE = f"""<html><body style="{PAGE_STYLE}color:#e94560;"><h1>This sign-in link has expired.</h1>
+    <p style="font-size:18px;color:#9da3cc;">Click 'Let Ibis In' in Ibis Setup to get a fresh one.</p></body></html>"""
+
+
+class OAuthCallbackHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path != '/callback':
+            self._reply(404, "")
+            return
+        params = urllib.parse.parse_qs(url.query)
+        state = params.get('state', [''])[0]
+        if not self.server.owner.claim(state):
+            self._reply(400, STALE_PAGE)
+            return
+        code = params.get('code', [None])[0]
+        self._reply(200, SUCCESS_PAGE if code else FAILED_PAGE)
+        self.server.owner.on_result(code)
+
+    def _reply(self, status, page):
+        body = page.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OAuthServer:
+    """Loopback server that hands each Strava authorization code to on_result(code)
+
+    on_result runs on a server thread and gets None when the user said no.
+    """
+
+    def __init__(self, on_result, port=REDIRECT_PORT):
+        self.on_result = on_result
+        self.port = port
+        self.ready = threading.Event()
+        self._states = set()
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    def start(self):
+        try:
+            self._httpd = http.server.ThreadingHTTPServer(("127.0.0.1", self.port), OAuthCallbackHandler)
+        except OSError as e:
+            print(f"Port {self.port} is busy ({e}) - using a free one")
+            self._httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), OAuthCallbackHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.owner = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="ibis-oauth",
+                                        daemon=True)
+        self._thread.start()
+        self.ready.set()
+        return self
+
+    @property
+    def redirect_uri(self):
+        return f"http://127.0.0.1:{self.port}/callback"
+
+    def authorize_url(self, client_id):
+        """A fresh Strava authorize URL - its state is good for one callback"""
+        state = secrets.token_urlsafe(16)
+        with self._lock:
+            self._states.add(state)
+        return f"{AUTH_URL}?" + urllib.parse.urlencode({
+            'client_id': client_id,
+            'redirect_uri': self.redirect_uri,
+            'response_type': 'code',
+            'scope': SCOPE,
+            'approval_prompt': 'auto',
+            'state': state,
+        })
+
+    def claim(self, state):
+        """True (once) for a state we handed out"""
+        with self._lock:
+            if state in self._states:
+                self._states.discard(state)
+                return True
+        return False
+
+    def shutdown(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        if self._thread:
+            self._thread.join(1)
+            self._thread = None
+        self.ready.clear()
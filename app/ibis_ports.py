@@ -0,0 +1,166 @@
+"""
+🪶 Ibis Ports 🪶 - Finding the board among the serial ports
+
+PortWatcher keeps an eye on the port list from a background thread and
+reports only what changed. A port is known by its device name plus USB
+VID/PID/serial number, so an unchanged list costs one comports() call and
+a set comparison - and a different board turning up on the same COM
+number still counts as new.
+
+probe_board() checks a port the way the wizard connects: PING until PONG,
+then GET_CONFIG and a look at usbIdentity. An Ibis Dash comes back with
+its link still open, ready to use. find_board() probes a list of ports all
+at once and keeps the first Ibis Dash to answer.
+"""
+
+import queue
+import threading
+import time
+
+from ibis_link import (BoardLink, HandshakeError, BAUD_RATE, HANDSHAKE_TIMEOUT,
+                       HANDSHAKE_SILENT_TIMEOUT, USB_IDENTITY, command_policy)
+
+WATCH_INTERVAL = 1.0    # seconds between port list checks
+FIND_TIMEOUT = 3.0      # per-port PING budget when searching - a booting board still fits
+
+
+def list_ports():
+    import serial.tools.list_ports
+    return sorted(serial.tools.list_ports.comports(), key=lambda p: p.device)
+
+
+def port_key(info):
+    """What tells two ports apart - the same board re-plugged elsewhere is a new port"""
+    return (info.device, info.vid, info.pid, info.serial_number)
+
+
+def port_label(info):
+    return f"{info.device} - {info.description}"
+
+
+def is_usb(info):
+    """Bluetooth and legacy COM ports have no VID - never worth a PING"""
+    return info.vid is not None
+
+
+def _identify(link, timeout, cancelled=None):
+    """Open link and return the board's config if it is an Ibis Dash, else None"""
+    try:
+        link.open()
+        if cancelled and cancelled.is_set():
+            return None
+        link.handshake(timeout=timeout, silent_timeout=min(timeout, HANDSHAKE_SILENT_TIMEOUT))
+        response = link.command("GET_CONFIG")
+        config = response.payload if response else None
+        if config and config.get('usbIdentity') == USB_IDENTITY:
+            return config
+    except (HandshakeError, OSError) as e:
+        if not (cancelled and cancelled.is_set()):
+            print(f"No board on {link.port}: {e}")
+    return None
+
+
+def probe_board(port, timeout=HANDSHAKE_TIMEOUT, baud=BAUD_RATE):
+    """(link, config) if an Ibis Dash answers on port, else None
+
+    The link is left open on success and closed otherwise.
+    """
+    link = BoardLink(port, baud)
+    config = _identify(link, timeout)
+    if config:
+        return link, config
+    link.close()
+    return None
+
+
+def find_board(ports, timeout=FIND_TIMEOUT, baud=BAUD_RATE):
+    """(link, config) for the first of ports where an Ibis Dash answers, else None
+
+    Every port is probed at the same time, so a search costs about as much
+    as the fastest board instead of the sum of every dud's timeout. The
+    moment one board is identified the other links are closed, which also
+    cuts their handshakes short.
+    """
+    links = [BoardLink(port, baud) for port in ports]
+    results = queue.SimpleQueue()
+    cancelled = threading.Event()
+
+    def attempt(link):
+        config = _identify(link, timeout, cancelled)
+        if config is None or cancelled.is_set():
+            link.close()
+            config = None
+        results.put((link, config))
+
+    for link in links:
+        threading.Thread(target=attempt, args=(link,), name=f"ibis-find-{link.port}",
+                         daemon=True).start()
+
+    found = None
+    deadline = time.time() + timeout + command_policy("GET_CONFIG").deadline
+    for _ in links:
+        try:
+            link, config = results.get(timeout=max(0, deadline - time.time()))
+        except queue.Empty:
+            break
+        if config:
+            found = link, config
+            break
+    cancelled.set()
+    for link in links:
+        if not found or link is not found[0]:
+            link.close()
+    return found
+
+
+class PortWatcher:
+    """Polls the port list and calls on_change(ports, added, removed) when it changes
+
+    on_change runs on the watcher thread. The first scan is the baseline: it
+    reports the ports with nothing added, since probing opens a port and that
+    resets whatever ESP32 or Arduino is behind it - boards already plugged in
+    are left to "find my board". rescan() looks again straight away and
+    reports even if nothing changed.
+    """
+
+    def __init__(self, on_change, interval=WATCH_INTERVAL, scan=list_ports):
+        self.on_change = on_change
+        self.interval = interval
+        self.scan = scan
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._forced = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ibis-ports", daemon=True)
+        self._thread.start()
+        return self
+
+    def rescan(self):
+        self._forced = True
+        self._wake.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def _run(self):
+        known = None
+        while not self._stopped.is_set():
+            forced, self._forced = self._forced, False
+            try:
+                ports = {port_key(p): p for p in self.scan()}
+            except Exception as e:
+                print(f"Port scan failed: {e}")
+                ports = None
+            if ports is not None and (forced or known is None or ports.keys() != known.keys()):
+                added = [p for key, p in ports.items() if known is not None and key not in known]
+                removed = [p for key, p in (known or {}).items() if key not in ports]
+                known = ports
+                try:
+                    self.on_change(list(ports.values()), added, removed)
+                except Exception as e:
+                    print(f"Port change handler failed: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
@@ -0,0 +1,167 @@
+"""
+🪶 Ibis Route 🪶 - The LAST ROUTE panel, worked out on the desktop
+
+drawDashboard() used to decode summary_polyline into a vector of float
+points and project every segment itself, once per display page. Long
+rides mean thousands of points on the ESP32. compile_route() does it all
+here:
+
+1. decode the polyline
+2. project it into the route box exactly as drawDashboard() does - the
+   same aspect fit on raw lat/lon - keeping fractional pixels
+3. simplify with Ramer-Douglas-Peucker, in pixels, so the tolerance is
+   how far (at most) the line may move
+4. round to whole pixels, pack the points as x,y byte pairs relative to
+   the box and base64 them
+
+Rounding moves every point up to half a pixel along each axis on top of
+the simplification, so the drawn line stays within error_bound() of the
+route - 1.21 px at ROUTE_TOLERANCE.
+
+The board copies the pairs to the screen with no floats and no vector.
+ROUTE_BOX must stay in step with the layout constants in drawDashboard().
+"""
+
+import base64
+import math
+
+# drawDashboard(): W=800, margin 20, colGap 14 -> colW 244, x3 536; the route
+# panel starts 32 above runsLabelY (278) and stops 30 short of H=480; the
+# title takes 45 of it and the line keeps drawMargin 2 from every edge
+ROUTE_COLUMN_W = (800 - 2 * 20 - 2 * 14) // 3
+ROUTE_AREA_H = (480 - (278 - 32) - 30) - 45
+ROUTE_DRAW_MARGIN = 2
+ROUTE_BOX = (ROUTE_COLUMN_W - 2 * ROUTE_DRAW_MARGIN, ROUTE_AREA_H - 2 * ROUTE_DRAW_MARGIN)   # 240 x 155
+
+ROUTE_TOLERANCE = 0.5               # px the simplified line may stray from the route
+ROUNDING_ERROR = 0.5 * math.sqrt(2)  # px - whole pixels, half a pixel off in x and y at most
+
+
+# ==================== POLYLINES ====================
+def decode_polyline(encoded):
+    """Google encoded polyline -> [(lat, lon), ...], as decodePolyline() reads it"""
+    points = []
+    index = lat = lon = 0
+    while index < len(encoded):
+        for axis in range(2):
+            shift = result = 0
+            while index < len(encoded):
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            delta = ~(result >> 1) if result & 1 else result >> 1
+            if axis == 0:
+                lat += delta
+            else:
+                lon += delta
+        points.append((lat / 1e5, lon / 1e5))
+    return points
+
+
+def encode_polyline(points):
+    """[(lat, lon), ...] -> Google encoded polyline"""
+    chunks = []
+    previous = (0, 0)
+    for point in points:
+        current = (round(point[0] * 1e5), round(point[1] * 1e5))
+        for value, last in zip(current, previous):
+            delta = value - last
+            delta = ~(delta << 1) if delta < 0 else delta << 1
+            while delta >= 0x20:
+                chunks.append(chr((0x20 | (delta & 0x1F)) + 63))
+                delta >>= 5
+            chunks.append(chr(delta + 63))
+        previous = current
+    return "".join(chunks)
+
+
+# ==================== PIPELINE ====================
+def project(points, box=ROUTE_BOX):
+    """Lat/lon points -> (x, y) pixels in a box-sized area, as drawDashboard() fits them
+
+    Like the board, the fit works on raw degrees (no cos(latitude)) and
+    centres the route along the spare axis. Pixels stay fractional here;
+    pack() rounds them.
+    """
+    width, height = box
+    lats = [lat for lat, _ in points]
+    lons = [lon for _, lon in points]
+    min_lat, min_lon = min(lats), min(lons)
+    lat_range = max(max(lats) - min_lat, 1e-6)
+    lon_range = max(max(lons) - min_lon, 1e-6)
+    route_aspect = lon_range / lat_range
+    offset_x = offset_y = 0
+    if route_aspect > width / height:
+        fit_w, fit_h = width, int(width / route_aspect)
+        offset_y = (height - fit_h) // 2
+    else:
+        fit_w, fit_h = int(height * route_aspect), height
+        offset_x = (width - fit_w) // 2
+    return [(offset_x + (lon - min_lon) / lon_range * fit_w,
+             offset_y + (1.0 - (lat - min_lat) / lat_range) * fit_h) for lat, lon in points]
+
+
+def simplify(points, tolerance=ROUTE_TOLERANCE):
+    """Ramer-Douglas-Peucker: the fewest points that stay within tolerance of the line"""
+    if len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    limit = tolerance * tolerance
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x0, y0), (x1, y1) = points[first], points[last]
+        dx, dy = x1 - x0, y1 - y0
+        length = dx * dx + dy * dy
+        worst, worst_i = -1.0, None
+        for i in range(first + 1, last):
+            x, y = points[i]
+            if length:
+                # Distance to the segment, not the infinite line - routes double back
+                t = max(0.0, min(1.0, ((x - x0) * dx + (y - y0) * dy) / length))
+                ex, ey = x - x0 - t * dx, y - y0 - t * dy
+            else:
+                ex, ey = x - x0, y - y0
+            error = ex * ex + ey * ey
+            if error > worst:
+                worst, worst_i = error, i
+        if worst > limit:
+            keep[worst_i] = True
+            stack.append((first, worst_i))
+            stack.append((worst_i, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def pack(pixels):
+    """(x, y) pixels -> base64 of x,y byte pairs, rounded to whole pixels, repeats dropped"""
+    data = bytearray()
+    previous = None
+    for x, y in pixels:
+        point = (round(x), round(y))
+        if point != previous:
+            data += bytes(point)
+            previous = point
+    return base64.b64encode(bytes(data)).decode('ascii')
+
+
+def unpack(blob):
+    """base64 route -> [(x, y), ...] - what the board will draw"""
+    data = base64.b64decode(blob)
+    return list(zip(data[0::2], data[1::2]))
+
+
+def error_bound(tolerance=ROUTE_TOLERANCE):
+    """How far (px) the drawn route may be from the projected polyline"""
+    return tolerance + ROUNDING_ERROR
+
+
+def compile_route(polyline, tolerance=ROUTE_TOLERANCE, box=ROUTE_BOX):
+    """summary_polyline -> the route blob for SET_SUMMARY, '' when there is nothing to draw"""
+    points = decode_polyline(polyline)
+    if len(points) < 2:
+        return ""
+    return pack(simplify(project(points, box), tolerance))
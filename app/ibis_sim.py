@@ -0,0 +1,634 @@
+#!/usr/bin/env python3
+"""
+🪶 Ibis Sim 🪶 - A pretend Ibis Dash board on a pseudo-terminal
+
+Speaks the serial protocol from processSerialCommand() in IBIS_V40.ino -
+same echo lines, log lines and terminators - so every serial code path in
+the app can be exercised without an ESP32-S3 on the desk:
+
+    python ibis_sim.py                  # prints a port, connect Ibis Setup to it
+    python ibis_sim.py --speed 0.1      # everything 10x faster
+    python ibis_sim.py --drop-rate 0.01 --disconnect-on FETCH_STRAVA
+    python ibis_sim.py --strava 300     # plus a Strava stand-in with 300 activities
+
+Latency, dropped bytes and disconnects can be injected; the stored config
+lives in a dict standing in for NVS. Linux/macOS only (needs a pty).
+
+StravaStandIn is a local HTTP server that answers the two Strava calls the
+app makes to build a summary (token refresh and activity pages), so the
+desktop-side aggregation can run without a Strava account or internet.
+"""
+
+import argparse
+import http.server
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.parse
+
+# Seconds each command takes on a real board (display refresh dominates)
+DEFAULT_LATENCY = {
+    'PING': 0.002,
+    'GET_CONFIG': 0.02,
+    'SET_CONFIG': 0.15,
+    'WIPE_CONFIG': 0.1,
+    'DELETE_DATA': 18.0,
+    'TEST_WIFI': 3.0,
+    'FETCH_STRAVA': 30.0,
+    'SET_SUMMARY': 19.0,        # just FETCH_STRAVA's dashboard draw
+    'SHOW_SETUP_SCREEN': 18.0,
+    'GO_SLEEP': 0.1,
+    'RESTART': 0.5,
+}
+BOOT_TIME = 4.0
+SERIAL_BUFFER_LIMIT = 2048      # handleSerialCommands() cap
+ACTIVITIES_PER_PAGE = 30
+MAX_PAGES = 10
+
+# sendCurrentConfig() defaults for keys that were never written
+NVS_DEFAULTS = {
+    'ssid': "", 'password': "", 'name': "", 'sport': "Run", 'goal': 1000.0,
+    'clientID': "", 'clientSecret': "", 'refreshToken': "", 'refreshHours': 12,
+    'trackPeriod': 0, 'title': "",
+}
+NVS_TYPES = {'goal': float, 'refreshHours': int, 'trackPeriod': int}
+LOGGED_KEYS = ('ssid', 'password', 'clientID', 'clientSecret', 'refreshToken')
+STRAVA_KEYS = ('clientID', 'clientSecret', 'refreshToken')
+
+
+class BoardDisconnected(Exception):
+    pass
+
+
+class SimulatedBoard:
+    """One pretend board. Start it, hand .port to the app, stop it when done.
+
+    latency       - {command: seconds} overrides for DEFAULT_LATENCY
+    speed         - multiplier for every delay (0.01 = 100x faster)
+    drop_rate     - probability that any received byte is lost
+    fifo          - bytes the board can take in one burst; the rest of a
+                    burst is lost, like an overrun RX buffer
+    disconnect_on - command name that makes the board vanish mid-command
+    nvs           - initial stored config
+    """
+
+    def __init__(self, nvs=None, latency=None, speed=1.0, drop_rate=0.0, fifo=None,
+                 disconnect_on=None, boot=False, wifi_ok=True, strava_ok=True, activities=42,
+                 seed=None):
+        self.nvs = dict(nvs or {})
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.speed = speed
+        self.drop_rate = drop_rate
+        self.fifo = fifo
+        self.disconnect_on = disconnect_on
+        self.boot = boot
+        self.wifi_ok = wifi_ok
+        self.strava_ok = strava_ok
+        self.activities = activities
+        self.random = random.Random(seed)
+        self.commands = []          # every command line the board processed
+        self.summary = None         # last SET_SUMMARY the board accepted
+        self.token_cached = False
+        self.port = None
+        self._master = None
+        self._slave = None
+        self._thread = None
+        self._running = False
+
+    # ==================== LIFECYCLE ====================
+    def start(self):
+        import tty
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="ibis-sim", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._master = self._slave = None
+
+    @property
+    def alive(self):
+        return self._running
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def disconnect(self):
+        """Yank the cable: the app's next read fails"""
+        fd, self._master = self._master, None
+        self._running = False
+        if fd is not None:
+            os.close(fd)
+
+    # ==================== SERIAL PLUMBING ====================
+    def _println(self, text=""):
+        if self._master is None:
+            raise BoardDisconnected()
+        try:
+            os.write(self._master, f"{text}\r\n".encode('utf-8'))
+        except OSError:
+            raise BoardDisconnected()
+
+    def _work(self, command, share):
+        """Spend share (0..1) of the command's latency"""
+        delay = self.latency.get(command, 0) * share * self.speed
+        if delay > 0:
+            time.sleep(delay)
+
+    def _run(self):
+        try:
+            if self.boot:
+                self._boot_banner()
+            line = bytearray()
+            while self._running:
+                try:
+                    data = os.read(self._master, 4096)
+                except (OSError, TypeError):
+                    return
+                if self.fifo:
+                    data = data[:self.fifo]
+                for byte in data:
+                    if self.drop_rate and self.random.random() < self.drop_rate:
+                        continue
+                    if byte in (0x0A, 0x0D):
+                        if line:
+                            self._process(line.decode('utf-8', errors='ignore'))
+                            line = bytearray()
+                    elif len(line) < SERIAL_BUFFER_LIMIT:
+                        line.append(byte)
+        except BoardDisconnected:
+            return
+
+    def _boot_banner(self):
+        self._println()
+        self._println("=" * 70)
+        self._println("              IBIS DASH V4.0 - USB Composite Device")
+        self._println("              Board identifies as: Ibis Dash (CDC+HID)")
+        self._println("=" * 70)
+        self._println(f"Configured: {'YES' if self.nvs.get('ssid') else 'NO'}")
+        self._println("PMU stabilization (2s)...")
+        time.sleep(BOOT_TIME * self.speed)
+        self._println("[OK] Display ready")
+
+    # ==================== COMMANDS ====================
+    def _process(self, command):
+        command = command.strip()
+        self.commands.append(command)
+        self._println(f"CMD[{len(command.encode('utf-8'))}]: "
+                      + (command[:50] + "..." if len(command) > 50 else command))
+        name = command.split(':', 1)[0]
+        if name == self.disconnect_on:
+            self._work(name, 0.3)
+            self.disconnect()
+            raise BoardDisconnected()
+        handler = {
+            'GET_CONFIG': self._get_config,
+            'SET_CONFIG': lambda: self._set_config(command[11:]),
+            'WIPE_CONFIG': self._wipe,
+            'DELETE_DATA': self._delete_data,
+            'TEST_WIFI': self._test_wifi,
+            'FETCH_STRAVA': self._fetch_strava,
+            'SET_SUMMARY': lambda: self._set_summary(command[12:]),
+            'SHOW_SETUP_SCREEN': self._show_setup_screen,
+            'GO_SLEEP': self._go_sleep,
+            'RESTART': self._restart,
+            'PING': self._ping,
+        }.get(name)
+        if handler:
+            handler()
+        elif command:
+            self._println(f"Unknown command: {command}")
+            self._println("ERROR")
+
+    def _ping(self):
+        self._work('PING', 1)
+        self._println("PONG")
+        self._println("IBIS_DASH_V40")
+
+    def stored(self):
+        """Config as sendCurrentConfig() would report it"""
+        doc = dict(NVS_DEFAULTS)
+        doc.update(self.nvs)
+        doc['configured'] = bool(doc['ssid'])
+        doc['hasStrava'] = bool(doc['clientID'])
+        doc['firmwareVersion'] = "4.0"
+        doc['usbIdentity'] = "Ibis Dash"
+        return doc
+
+    def _get_config(self):
+        self._println("Sending configuration...")
+        self._work('GET_CONFIG', 1)
+        self._println(json.dumps(self.stored(), separators=(',', ':')))
+        self._println("OK")
+
+    def _set_config(self, text):
+        self._println("Parsing configuration...")
+        self._println(f"JSON length: {len(text)}")
+        try:
+            doc = json.loads(text)
+            if not isinstance(doc, dict):
+                raise ValueError("not an object")
+        except ValueError:
+            self._println("JSON error: InvalidInput")
+            self._println("ERROR")
+            return
+        self._println("JSON parsed OK, saving to NVS...")
+        for key in NVS_DEFAULTS:
+            if key in doc:
+                try:
+                    self.nvs[key] = NVS_TYPES.get(key, str)(doc[key])
+                except (TypeError, ValueError):
+                    self.nvs[key] = NVS_DEFAULTS[key]
+                if key in LOGGED_KEYS:
+                    self._println(f"  - {key} saved")
+        self._work('SET_CONFIG', 1)
+        self._load_configuration()
+        if any(key in doc for key in STRAVA_KEYS):
+            self.token_cached = False
+            self._println("  - Token cache cleared")
+        self._println("Configuration saved!")
+        self._println("SUCCESS")
+
+    def _load_configuration(self):
+        c = self.stored()
+        self._println("=== Loading Configuration from NVS ===")
+        self._println("[OK] Configuration loaded:")
+        self._println(f"  Configured: {'YES' if c['configured'] else 'NO'}")
+        self._println(f"  WiFi SSID: {c['ssid'] or '(not set)'}")
+        self._println(f"  Sport Type: {c['sport']}")
+        self._println()
+
+    def _wipe(self):
+        self._println("Wiping all configuration...")
+        self._work('WIPE_CONFIG', 1)
+        self.nvs.clear()
+        self.token_cached = False
+        self._println("Configuration wiped!")
+        self._println("WIPED")
+
+    def _draw_setup_screen(self, command):
+        self._println("Drawing setup screen...")
+        self._println("=== Drawing Setup Screen ===")
+        self._println("Stabilizing power...")
+        self._work(command, 1)
+        self._println("Setup screen complete!")
+        self._println("SETUP_SCREEN_DRAWN")
+
+    def _delete_data(self):
+        self._wipe()
+        self._draw_setup_screen('DELETE_DATA')
+
+    def _show_setup_screen(self):
+        self._draw_setup_screen('SHOW_SETUP_SCREEN')
+
+    def _test_wifi(self):
+        self._load_configuration()
+        if not self.nvs.get('ssid'):
+            self._println("NO_WIFI_CREDENTIALS")
+            return
+        self._println("Testing WiFi connection...")
+        self._work('TEST_WIFI', 1)
+        if self.wifi_ok:
+            self._println("..... WiFi OK!")
+            self._println("WIFI_OK")
+        else:
+            self._println(".................... WiFi FAILED!")
+            self._println("WIFI_FAILED")
+
+    def _fetch_strava(self):
+        c = self.stored()
+        self._println()
+        self._println("=== FINISH SETUP ===")
+        self._load_configuration()
+        if not c['ssid']:
+            self._println("NO_WIFI_CREDENTIALS")
+            return
+        if not (c['clientID'] and c['clientSecret'] and c['refreshToken']):
+            self._println("NO_STRAVA_CREDENTIALS")
+            return
+        self._println("Connecting to WiFi...")
+        self._println(f"Connecting to WiFi: {c['ssid']}")
+        self._work('FETCH_STRAVA', 0.1)
+        if not self.wifi_ok:
+            self._println(" FAILED!")
+            self._println("WIFI_CONNECT_FAILED")
+            return
+        self._println("..... Connected!")
+        self._println("IP: 192.168.1.42")
+        self._println("Syncing time...")
+        self._work('FETCH_STRAVA', 0.03)
+        self._println("Time synced: 2026-01-15 07:30:00")
+        self._println("Refreshing token...")
+        if self.token_cached:
+            self._println("Using cached access token")
+        else:
+            self._println("Refreshing Strava access token...")
+            self._work('FETCH_STRAVA', 0.04)
+            if not self.strava_ok:
+                self._println("[FAIL] Token refresh: 401")
+                self._println("TOKEN_REFRESH_FAILED")
+                return
+            self.token_cached = True
+            self._println("[OK] Token refreshed and cached")
+        self._println("Fetching Strava data...")
+        self._println("=== Fetching Strava Data ===")
+        self._println(f"Tracking period: {['Yearly', 'Monthly', 'Weekly'][c['trackPeriod'] % 3]}")
+        self._println(f"Filtering for sport type: {c['sport']}")
+        remaining = self.activities
+        pages = min(MAX_PAGES, remaining // ACTIVITIES_PER_PAGE + 1)
+        for page in range(1, pages + 1):
+            self._work('FETCH_STRAVA', 0.2 / pages)
+            count = min(ACTIVITIES_PER_PAGE, remaining)
+            remaining -= count
+            if count == 0:
+                self._println("No more activities")
+                break
+            self._println(f"Page {page}: {count} activities")
+            if page == MAX_PAGES:
+                self._println("Reached max pages (10)")
+        fetched = self.activities - remaining
+        distance = round(fetched * 8.4, 1)
+        hours = round(fetched * 0.75, 1)
+        self._println("=== Strava Fetch Complete ===")
+        self._println(f"Total activities fetched: {fetched}")
+        self._println(f"Matching activities ({c['sport']}): {fetched}")
+        self._println(f"Distance: {distance}km")
+        self._println(f"Time: {hours} hours")
+        self._println("STRAVA_OK")
+        self._println(f"Activities: {fetched}")
+        self._println(f"Distance: {distance:.2f}km")
+        self._println(f"Time: {hours:.2f} hours")
+        self._println("Battery: 87% (4.02V) [USB]")
+        self._println("Drawing dashboard...")
+        self._println("=== Drawing Dashboard ===")
+        self._work('FETCH_STRAVA', 0.05)
+        self._println("Reinitializing display hardware...")
+        self._println("Starting display refresh...")
+        self._work('FETCH_STRAVA', 0.58)
+        self._println("Dashboard update complete!")
+        self._println("DASHBOARD_DRAWN")
+
+    def _set_summary(self, text):
+        self._println()
+        self._println("=== FINISH SETUP ===")
+        self._load_configuration()
+        self._println("Parsing summary...")
+        self._println(f"JSON length: {len(text)}")
+        try:
+            doc = json.loads(text)
+            if not isinstance(doc, dict) or not isinstance(doc.get('now'), int):
+                raise ValueError("no time")
+        except ValueError:
+            self._println("JSON error: InvalidInput")
+            self._println("ERROR")
+            return
+        self.summary = doc
+        if 'token' in doc:
+            self.token_cached = True
+            self._println("  - Access token cached")
+        if 'refreshToken' in doc:
+            self.nvs['refreshToken'] = str(doc['refreshToken'])
+            self._println("  - refreshToken saved")
+        self._println("SUMMARY_OK")
+        self._println(f"Activities: {doc.get('count', 0)}")
+        self._println(f"Distance: {doc.get('dist', 0):.2f}km")
+        self._println(f"Time: {doc.get('hours', 0):.2f} hours")
+        self._println("Battery: 87% (4.02V) [USB]")
+        self._println("Drawing dashboard...")
+        self._println("=== Drawing Dashboard ===")
+        self._work('SET_SUMMARY', 0.1)
+        self._println("Reinitializing display hardware...")
+        self._println("Starting display refresh...")
+        self._work('SET_SUMMARY', 0.9)
+        self._println("Dashboard update complete!")
+        self._println("DASHBOARD_DRAWN")
+
+    def _go_sleep(self):
+        self._println("Sleep requested")
+        self._println("OK")
+        self._work('GO_SLEEP', 1)
+
+    def _restart(self):
+        self._println("OK")
+        self._println("Restarting...")
+        self._work('RESTART', 1)
+        self.token_cached = False
+        self._boot_banner()
+
+
+# ==================== STRAVA STAND-IN ====================
+STAND_IN_TYPES = ("Run", "Run", "Ride", "VirtualRide", "VirtualRun", "Walk", "Hike")
+
+
+class StravaStandInHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"       # keep-alive, like the real API
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        form = urllib.parse.parse_qs(self.rfile.read(length).decode())
+        self.server.owner.handle(self, 'POST', urllib.parse.urlsplit(self.path).path,
+                                 {key: values[0] for key, values in form.items()})
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = {key: values[0] for key, values in urllib.parse.parse_qs(url.query).items()}
+        self.server.owner.handle(self, 'GET', url.path, params)
+
+    def reply(self, status, doc):
+        body = json.dumps(doc).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StravaStandIn:
+    """A pretend www.strava.com on 127.0.0.1 - hand .url to StravaClient(base_url=...)
+
+    activities    - how many, spread over the days before now (newest last)
+    latency       - seconds every request takes
+    refresh_token - the one token refresh accepts
+    rotate        - token refresh hands out a new refresh token each time
+    fail_status   - answer every request with this status instead
+    """
+
+    def __init__(self, activities=300, days=365, now=None, latency=0.0,
+                 refresh_token="a1b2c3d4e5f60718293a4b5c6d7e8f9012345678", rotate=False,
+                 fail_status=None, seed=None):
+        self.now = int(time.time() if now is None else now)
+        self.latency = latency
+        self.refresh_token = refresh_token
+        self.rotate = rotate
+        self.fail_status = fail_status
+        self.requests = []          # (method, path, params) in arrival order
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.activities = self._make_activities(activities, days, random.Random(seed))
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    def start(self):
+        self._httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StravaStandInHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.owner = self
+        threading.Thread(target=self._httpd.serve_forever, name="ibis-strava-stand-in",
+                         daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def _make_activities(self, count, days, rng):
+        from ibis_route import encode_polyline
+        activities = []
+        for i in range(count):
+            start = self.now - int((count - i) * days * 86400 / max(count, 1)) + rng.randint(0, 3600)
+            kind = STAND_IN_TYPES[i % len(STAND_IN_TYPES)]
+            km = rng.uniform(15, 90) if "Ride" in kind else rng.uniform(3, 21)
+            lat, lon = 51.5 + rng.uniform(-0.05, 0.05), -0.12 + rng.uniform(-0.05, 0.05)
+            route = []
+            for _ in range(rng.randint(40, 400)):
+                lat += rng.uniform(-0.0008, 0.0008)
+                lon += rng.uniform(-0.0008, 0.0008)
+                route.append((lat, lon))
+            activity = {
+                'id': 1000000 + i,
+                'name': f"{kind} #{i + 1}" if i % 17 else "",
+                'type': kind,
+                'sport_type': kind,
+                'start_date': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(start)),
+                'start_date_local': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(start + 3600)),
+                'distance': round(km * 1000, 1),
+                'moving_time': int(km * rng.uniform(150, 420 if "Ride" not in kind else 180)),
+                'map': {'summary_polyline': encode_polyline(route)},
+                '_epoch': start,
+            }
+            if "Ride" in kind:
+                activity['average_watts'] = round(rng.uniform(120, 260), 1)
+            activities.append(activity)
+        return activities
+
+    def handle(self, handler, method, path, params):
+        with self._lock:
+            self.requests.append((method, path, params))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if self.fail_status:
+                handler.reply(self.fail_status, {'message': "Stand-in failure"})
+            elif method == 'POST' and path == "/oauth/token":
+                self._token(handler, params)
+            elif method == 'GET' and path == "/api/v3/athlete/activities":
+                self._activities(handler, params)
+            else:
+                handler.reply(404, {'message': "Record Not Found"})
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _token(self, handler, params):
+        if params.get('grant_type') != 'refresh_token' or params.get('refresh_token') != self.refresh_token:
+            handler.reply(400, {'message': "Bad Request", 'errors': [{'field': 'refresh_token',
+                                                                      'code': 'invalid'}]})
+            return
+        if self.rotate:
+            self.refresh_token = f"{random.getrandbits(160):040x}"
+        handler.reply(200, {'token_type': "Bearer", 'access_token': f"{random.getrandbits(160):040x}",
+                            'expires_at': int(time.time()) + 21600, 'expires_in': 21600,
+                            'refresh_token': self.refresh_token})
+
+    def _activities(self, handler, params):
+        if not handler.headers.get('Authorization', '').startswith("Bearer "):
+            handler.reply(401, {'message': "Authorization Error"})
+            return
+        after = int(params.get('after', 0))
+        before = int(params.get('before', 2 ** 62))
+        per_page = min(int(params.get('per_page', 30)), 200)
+        page = max(int(params.get('page', 1)), 1)
+        chosen = [a for a in self.activities if after < a['_epoch'] < before]
+        if 'after' not in params:
+            chosen.reverse()        # newest first, unless 'after' is given
+        chosen = chosen[(page - 1) * per_page:page * per_page]
+        handler.reply(200, [{k: v for k, v in a.items() if k != '_epoch'} for a in chosen])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pretend Ibis Dash board on a pty")
+    parser.add_argument('--speed', type=float, default=1.0, help="delay multiplier (0.1 = 10x faster)")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="chance of losing each byte")
+    parser.add_argument('--fifo', type=int, help="bytes per burst before the RX buffer overruns")
+    parser.add_argument('--disconnect-on', help="command that makes the board vanish")
+    parser.add_argument('--latency', action='append', default=[], metavar='CMD=SECONDS')
+    parser.add_argument('--nvs', help="JSON file with the initial stored config")
+    parser.add_argument('--no-wifi', action='store_true', help="WiFi tests fail")
+    parser.add_argument('--boot', action='store_true', help="print the boot banner first")
+    parser.add_argument('--strava', type=int, metavar='ACTIVITIES',
+                        help="also run a Strava stand-in with this many activities")
+    args = parser.parse_args(argv)
+
+    latency = {}
+    for item in args.latency:
+        name, _, seconds = item.partition('=')
+        latency[name.strip().upper()] = float(seconds)
+    nvs = None
+    if args.nvs:
+        with open(args.nvs, encoding='utf-8') as f:
+            nvs = json.load(f)
+
+    board = SimulatedBoard(nvs=nvs, latency=latency, speed=args.speed, drop_rate=args.drop_rate,
+                           fifo=args.fifo, disconnect_on=args.disconnect_on, boot=args.boot,
+                           wifi_ok=not args.no_wifi).start()
+    print(f"🪶 Simulated Ibis Dash on {board.port} (Ctrl+C to stop)")
+    strava = None
+    if args.strava is not None:
+        strava = StravaStandIn(activities=args.strava).start()
+        print(f"🪶 Strava stand-in on {strava.url} (refresh token {strava.refresh_token})")
+    try:
+        while board.alive:
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        board.stop()
+        if strava:
+            strava.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+🪶 Ibis Stats 🪶 - Column-wise dashboard totals for the Ibis Setup app
+
+ibis_summary adds up one sport over one tracking period, activity by
+activity, the way fetchStravaData() does on the board. ActivityTable holds
+activities as NumPy columns instead and works out the totals for every
+sport in SPORT_TYPES and every period in TRACK_PERIODS in one pass:
+
+- which sport an activity counts for is a lookup table over its type,
+  built with matches_sport() (Ride and Run take in their virtual variants)
+- which periods it falls in comes from period_bounds(), the port of
+  getTrackingPeriodTimestamps() - start strictly between after and before,
+  as Strava filters
+- the 0-1000 km / 0-100 h sanity bounds drop the same activities
+
+The totals are then two matrix products, (sports x activities) times
+(activities x periods). `python ibis_bench.py stats` checks them against
+summarize() and times them over 100k activities.
+
+NumPy is only needed by whoever imports this module.
+"""
+
+import numpy as np
+
+from ibis_link import SPORT_TYPES, TRACK_PERIODS
+from ibis_summary import (matches_sport, period_bounds, KM_TO_MILES,
+                          MAX_ACTIVITY_KM, MAX_ACTIVITY_HOURS)
+
+
+class ActivityTable:
+    """Activities as columns: start (epoch s), type code, km, hours"""
+
+    def __init__(self, start, type_code, km, hours, types):
+        self.start = np.asarray(start, dtype=np.int64)
+        self.type_code = np.asarray(type_code, dtype=np.int32)
+        self.km = np.asarray(km, dtype=np.float64)
+        self.hours = np.asarray(hours, dtype=np.float64)
+        self.types = list(types)        # type_code -> Strava activity type
+
+    @classmethod
+    def from_activities(cls, activities):
+        """Build from Strava activity dicts (an API page, or ActivityStore.activities())"""
+        types, codes = {}, []
+        for activity in activities:
+            codes.append(types.setdefault(activity.get('type') or "", len(types)))
+        # 'YYYY-MM-DDTHH:MM:SSZ' - NumPy parses it once the zone letter is gone
+        start = np.array([a['start_date'][:19] for a in activities],
+                         dtype='datetime64[s]').astype(np.int64)
+        km = np.fromiter((a.get('distance') or 0 for a in activities), np.float64,
+                         len(activities)) / 1000.0
+        hours = np.fromiter((a.get('moving_time') or 0 for a in activities), np.float64,
+                            len(activities)) / 3600.0
+        return cls(start, codes, km, hours, types)
+
+    def __len__(self):
+        return len(self.start)
+
+    def sport_matrix(self, sports=SPORT_TYPES):
+        """(sports x activities) 1.0 where the activity counts for the sport and passes the bounds"""
+        lookup = np.array([[matches_sport(sport, kind) for kind in self.types] for sport in sports],
+                          dtype=np.float64).reshape(len(sports), len(self.types))
+        valid = ((self.km > 0) & (self.km < MAX_ACTIVITY_KM)
+                 & (self.hours > 0) & (self.hours < MAX_ACTIVITY_HOURS))
+        return lookup[:, self.type_code] * valid
+
+    def period_matrix(self, now=None):
+        """(activities x periods) 1.0 where the activity falls in the period around now"""
+        bounds = np.array([period_bounds(period, now)[:2] for period in range(len(TRACK_PERIODS))])
+        start = self.start[:, None]
+        return ((start > bounds[:, 0]) & (start < bounds[:, 1])).astype(np.float64)
+
+    def totals(self, now=None, kilometers=True):
+        """{sport: {period name: {'dist', 'hours', 'count'}}} for every sport and period"""
+        sports = self.sport_matrix()
+        periods = self.period_matrix(now)
+        factor = 1.0 if kilometers else KM_TO_MILES
+        dist = (sports * (self.km * factor)) @ periods
+        hours = (sports * self.hours) @ periods
+        count = sports @ periods
+        return {sport: {period: {'dist': round(float(dist[s, p]), 2),
+                                 'hours': round(float(hours[s, p]), 2),
+                                 'count': int(count[s, p])}
+                        for p, period in enumerate(TRACK_PERIODS)}
+                for s, sport in enumerate(SPORT_TYPES)}
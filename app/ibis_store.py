@@ -0,0 +1,221 @@
+"""
+🪶 Ibis Store 🪶 - Local cache of Strava activities for the Ibis Setup app
+
+Every summary used to pull the whole tracking period from Strava again.
+ActivityStore keeps what was fetched in a small SQLite file, indexed by
+start date and sport type. There is one file per Strava API app (client
+ID) - an app made at strava.com/settings/api only connects its owner
+until Strava raises its athlete limit, so that is one athlete per file.
+
+- the first sync fetches everything from the requested start onwards
+- after that only activities that started after the newest stored one
+  are asked for - usually one request with an almost empty page
+- activities are keyed by Strava id, so anything fetched twice is updated
+  in place rather than counted twice
+
+The newest start date is pulled back by SYNC_OVERLAP, so an activity that
+reaches Strava late (a watch synced a day after the phone) is still picked
+up; the overlap costs nothing extra since it fits in the same page.
+
+Edits and deletions further back never show up that way, so reconcile()
+fetches the tracking period whole at most every RECONCILE_EVERY, updates
+what changed and drops what Strava no longer returns.
+
+Every call opens its own connection, so the store can be used from any
+worker thread.
+"""
+
+import calendar
+import contextlib
+import json
+import os
+import sqlite3
+import time
+
+from ibis_summary import SPORT_GROUPS, PER_PAGE, MAX_PAGES, fetch_activities
+
+STORE_DIR = os.path.join(os.path.expanduser("~"), ".ibis")
+SYNC_OVERLAP = 3 * 86400    # seconds re-checked before the newest stored activity
+QUERY_CHUNK = 500           # ids per IN (...) - older SQLite allows 999 parameters
+RECONCILE_EVERY = 86400     # seconds between full checks of a tracking period
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS activities (
+    id INTEGER PRIMARY KEY,
+    start_date INTEGER NOT NULL,    -- epoch seconds (UTC)
+    type TEXT NOT NULL,
+    data TEXT NOT NULL              -- the activity as Strava sent it
+);
+CREATE INDEX IF NOT EXISTS activities_start ON activities (start_date);
+CREATE INDEX IF NOT EXISTS activities_type_start ON activities (type, start_date);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER
+);
+"""
+
+
+def store_path(client_id, folder=STORE_DIR):
+    return os.path.join(folder, f"activities-{client_id or 'default'}.db")
+
+
+def start_epoch(activity):
+    """Strava's start_date ('2025-01-02T14:30:00Z') as epoch seconds"""
+    return calendar.timegm(time.strptime(activity['start_date'], "%Y-%m-%dT%H:%M:%SZ"))
+
+
+class ActivityStore:
+    """SQLite cache of one athlete's activities"""
+
+    def __init__(self, path):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """A connection for one call - committed on the way out, then closed"""
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    # ==================== SYNC ====================
+    def sync(self, client, access_token, since):
+        """Bring the store up to date from since (epoch) onwards; returns what changed
+
+        Costs the whole range the first time (or when since is earlier than
+        anything synced before), and from the newest stored activity after that.
+        A whole-range sync also counts as a reconcile() of that range.
+        """
+        covered = self._meta('covered_from')
+        newest = self.newest()
+        full = covered is None or since < covered or newest is None
+        after = since - 1 if full else max(since, newest - SYNC_OVERLAP) - 1
+        requests = client.requests
+        fetched = fetch_activities(client, access_token, after, None)
+        added, updated = self.upsert(fetched)
+        removed = self._match(fetched, after) if full else 0
+        if full:
+            self._set_meta('covered_from', since)
+        self._set_meta('synced_at', int(time.time()))
+        return {'after': after, 'fetched': len(fetched), 'added': added, 'updated': updated,
+                'removed': removed or 0, 'requests': client.requests - requests}
+
+    def upsert(self, activities):
+        """Insert new activities and update changed ones; returns (added, updated)"""
+        rows = [(a['id'], start_epoch(a), a.get('type') or "", json.dumps(a, separators=(',', ':')))
+                for a in activities]
+        if not rows:
+            return 0, 0
+        known = {}
+        with self._connect() as db:
+            for i in range(0, len(rows), QUERY_CHUNK):
+                ids = [row[0] for row in rows[i:i + QUERY_CHUNK]]
+                known.update(db.execute(
+                    f"SELECT id, data FROM activities WHERE id IN ({','.join('?' * len(ids))})", ids))
+            db.executemany(
+                "INSERT INTO activities (id, start_date, type, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET start_date = excluded.start_date, "
+                "type = excluded.type, data = excluded.data", rows)
+        added = sum(1 for row in rows if row[0] not in known)
+        updated = sum(1 for row in rows if row[0] in known and known[row[0]] != row[3])
+        return added, updated
+
+    def reconcile(self, client, access_token, after, before, max_age=RECONCILE_EVERY):
+        """Fetch (after, before) whole and make the store match it; returns what changed
+
+        Activities Strava no longer returns in that range (deleted, or
+        made private) are dropped. Skipped - returning None - when the same
+        range or a wider one was checked less than max_age seconds ago.
+        """
+        checked_at = self._meta('reconciled_at')
+        checked_from = self._meta('reconciled_from')
+        if checked_at is not None and checked_from is not None and checked_from <= after \
+                and time.time() - checked_at < max_age:
+            return None
+        requests = client.requests
+        fetched = fetch_activities(client, access_token, after, before)
+        added, updated = self.upsert(fetched)
+        removed = self._match(fetched, after, before)
+        return {'fetched': len(fetched), 'added': added, 'updated': updated, 'removed': removed,
+                'complete': removed is not None, 'requests': client.requests - requests}
+
+    def _match(self, fetched, after, before=None):
+        """Drop stored activities in (after, before) that fetched - all of that range - lacks
+
+        Returns how many went, or None when fetched was cut short at
+        MAX_PAGES: then nothing is dropped and the range isn't marked checked.
+        """
+        if len(fetched) >= PER_PAGE * MAX_PAGES:
+            return None
+        keep = {activity['id'] for activity in fetched}
+        query, params = "SELECT id FROM activities WHERE start_date > ?", [int(after)]
+        if before is not None:
+            query += " AND start_date < ?"
+            params.append(int(before))
+        with self._connect() as db:
+            gone = [row for row in db.execute(query, params) if row[0] not in keep]
+            db.executemany("DELETE FROM activities WHERE id = ?", gone)
+        self._set_meta('reconciled_at', int(time.time()))
+        self._set_meta('reconciled_from', int(after))
+        return len(gone)
+
+    # ==================== QUERIES ====================
+    def activities(self, after=None, before=None, sport=None):
+        """Stored activities that started strictly between after and before, oldest first
+
+        sport narrows them to the selected sport's group (see SPORT_GROUPS).
+        """
+        where, params = [], []
+        if sport:
+            types = SPORT_GROUPS.get(sport, (sport,))
+            where.append(f"type IN ({','.join('?' * len(types))})")
+            params += types
+        if after is not None:
+            where.append("start_date > ?")
+            params.append(int(after))
+        if before is not None:
+            where.append("start_date < ?")
+            params.append(int(before))
+        query = "SELECT data FROM activities"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        with self._connect() as db:
+            return [json.loads(row[0]) for row in db.execute(query + " ORDER BY start_date", params)]
+
+    def routes(self):
+        """(id, start epoch, summary_polyline) for every stored activity, oldest first"""
+        with self._connect() as db:
+            return db.execute("SELECT id, start_date, json_extract(data, '$.map.summary_polyline') "
+                              "FROM activities ORDER BY start_date").fetchall()
+
+    def newest(self):
+        """Start date (epoch) of the newest stored activity, None when empty"""
+        with self._connect() as db:
+            return db.execute("SELECT MAX(start_date) FROM activities").fetchone()[0]
+
+    def count(self):
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM activities").fetchone()[0]
+
+    def clear(self):
+        with self._connect() as db:
+            db.execute("DELETE FROM activities")
+            db.execute("DELETE FROM meta")
+
+    def _meta(self, key):
+        with self._connect() as db:
+            row = db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        with self._connect() as db:
+            db.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                       "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (key, value))
@@ -0,0 +1,167 @@
+"""
+🪶 Ibis Strava 🪶 - Strava HTTP client for the Ibis Setup app
+
+One StravaClient is shared by everything on the desktop side that talks to
+Strava (token exchange, token refresh, activity pages). It keeps a small
+pool of keep-alive connections, so a run of requests pays for the TLS
+handshake once, and it is safe to use from several worker threads at the
+same time.
+
+Failures that are worth another go - connection errors, timeouts, a
+keep-alive connection the server already dropped, and 5xx replies - are
+retried a bounded number of times with jittered exponential backoff - for
+the refresh and the GETs, which are safe to repeat. An authorization code
+works only once, so its exchange is a single attempt: a retry after a lost
+reply would turn a success into "invalid code". Everything else (4xx,
+including 429 rate limiting) is raised as StravaError straight away.
+
+Calls block; the wizard runs them on its TkExecutor workers and gets the
+results back through on_done / on_error callbacks on the Tk thread.
+"""
+
+import http.client
+import json
+import queue
+import random
+import threading
+import time
+import urllib.parse
+
+STRAVA_URL = "https://www.strava.com"
+TOKEN_PATH = "/oauth/token"
+ACTIVITIES_PATH = "/api/v3/athlete/activities"
+
+HTTP_TIMEOUT = 15       # seconds per attempt
+HTTP_ATTEMPTS = 3
+HTTP_BACKOFF = 0.5      # first retry waits up to this, then doubling
+POOL_SIZE = 4           # keep-alive connections (and requests in flight) at most
+
+
+class StravaError(Exception):
+    """Strava answered, but not with what we asked for"""
+
+    def __init__(self, status, message):
+        super().__init__(f"Strava said {status}: {message}")
+        self.status = status
+
+
+class StravaClient:
+    """Pooled keep-alive HTTPS client for the Strava API"""
+
+    def __init__(self, base_url=STRAVA_URL, pool_size=POOL_SIZE, timeout=HTTP_TIMEOUT,
+                 attempts=HTTP_ATTEMPTS, backoff=HTTP_BACKOFF):
+        url = urllib.parse.urlsplit(base_url)
+        self._connection_class = (http.client.HTTPSConnection if url.scheme == 'https'
+                                  else http.client.HTTPConnection)
+        self.host = url.netloc
+        self.timeout = timeout
+        self.attempts = attempts
+        self.backoff = backoff
+        self.requests = 0           # HTTP requests sent, retries included
+        self.connections = 0        # connections opened - stays low while keep-alive works
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._count_lock = threading.Lock()    # the counters are bumped from every worker
+
+    # ==================== CALLS ====================
+    def exchange_token(self, client_id, client_secret, code):
+        """Trade an OAuth authorization code for tokens - once, the code can't be used twice"""
+        return self.request('POST', TOKEN_PATH, form={
+            'client_id': client_id,
+            'client_secret': client_secret,
+            'code': code,
+            'grant_type': 'authorization_code',
+        }, retry=False)
+
+    def refresh_token(self, client_id, client_secret, refresh_token):
+        """A fresh access token (and maybe a new refresh token)"""
+        return self.request('POST', TOKEN_PATH, form={
+            'client_id': client_id,
+            'client_secret': client_secret,
+            'refresh_token': refresh_token,
+            'grant_type': 'refresh_token',
+        })
+
+    def activities(self, access_token, page=1, per_page=30, after=None, before=None):
+        """One page of the athlete's activities, newest first"""
+        params = {'page': page, 'per_page': per_page}
+        if after is not None:
+            params['after'] = int(after)
+        if before is not None:
+            params['before'] = int(before)
+        return self.request('GET', ACTIVITIES_PATH, params=params, token=access_token)
+
+    # ==================== TRANSPORT ====================
+    def request(self, method, path, params=None, form=None, token=None, retry=True):
+        """Send one request (retrying where it makes sense) and return the parsed JSON
+
+        retry=False is for calls that must not reach Strava twice: one
+        attempt, on a new connection rather than a keep-alive one Strava may
+        already have dropped.
+        """
+        if params:
+            path += "?" + urllib.parse.urlencode(params)
+        headers = {'Accept': 'application/json'}
+        body = None
+        if form is not None:
+            body = urllib.parse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if token:
+            headers['Authorization'] = f"Bearer {token}"
+
+        error = None
+        attempts = self.attempts if retry else 1
+        for attempt in range(attempts):
+            if attempt:
+                time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+            with self._slots:
+                connection = self._connection(reuse=retry)
+                try:
+                    with self._count_lock:
+                        self.requests += 1
+                    connection.request(method, path, body=body, headers=headers)
+                    response = connection.getresponse()
+                    data = response.read()
+                except (OSError, http.client.HTTPException) as e:
+                    # Timeouts, resets, or a keep-alive connection Strava already closed
+                    connection.close()
+                    error = e
+                    print(f"Strava {method} {path.split('?')[0]} failed "
+                          f"(attempt {attempt+1}/{attempts}): {e}")
+                    continue
+                if response.will_close:
+                    connection.close()
+                else:
+                    self._idle.put(connection)
+            if response.status >= 500:
+                error = StravaError(response.status, response.reason)
+                continue
+            if response.status >= 400:
+                raise StravaError(response.status, _message(data) or response.reason)
+            return json.loads(data.decode('utf-8')) if data else None
+        raise error
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _connection(self, reuse=True):
+        if reuse:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+        with self._count_lock:
+            self.connections += 1
+        return self._connection_class(self.host, timeout=self.timeout)
+
+
+def _message(data):
+    """Strava's error JSON says what went wrong in 'message'"""
+    try:
+        return json.loads(data.decode('utf-8')).get('message')
+    except (ValueError, AttributeError):
+        return None
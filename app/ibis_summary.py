@@ -0,0 +1,219 @@
+"""
+🪶 Ibis Summary 🪶 - Adding up Strava on the desktop for the Ibis Setup app
+
+On Finish Setup the board used to join WiFi, refresh its token and page
+through /athlete/activities 30 at a time, parsing every page itself. The
+app already has the refresh token, so it does that work here instead:
+
+- activity pages are 200 long (Strava's maximum) with several in flight
+  on the shared StravaClient
+- the sums follow fetchStravaData() in IBIS_V40.ino - same sport groups,
+  same tracking periods (UTC, like the board's clock), same sanity bounds
+- the result goes to the board as one SET_SUMMARY line, so the first
+  dashboard draws without the board touching WiFi
+
+The last route goes over already projected to screen pixels (ibis_route).
+"""
+
+import calendar
+import concurrent.futures
+import datetime
+import json
+import time
+
+from ibis_link import MAX_COMMAND_BYTES
+from ibis_route import compile_route, ROUTE_TOLERANCE
+
+PER_PAGE = 200          # Strava's largest page
+PAGES_IN_FLIGHT = 4     # matches the client's connection pool
+MAX_PAGES = 50          # 10,000 activities in one tracking period is plenty
+KM_TO_MILES = 0.62      # the firmware's factor
+ROUTE_TOLERANCES = (ROUTE_TOLERANCE, 1, 2, 4, 8)    # px, tried in turn until the route fits
+
+# matchesSelectedSport() - Ride and Run take in their variants, the rest match exactly
+SPORT_GROUPS = {
+    'Ride': ("Ride", "VirtualRide", "EBikeRide", "MountainBikeRide"),
+    'Run': ("Run", "VirtualRun"),
+}
+
+# The firmware only trusts activities inside these (km, hours)
+MAX_ACTIVITY_KM = 1000
+MAX_ACTIVITY_HOURS = 100
+
+MONTH_NAMES = ("January", "February", "March", "April", "May", "June", "July",
+               "August", "September", "October", "November", "December")
+
+TRACK_YEARLY, TRACK_MONTHLY, TRACK_WEEKLY = 0, 1, 2
+
+
+def matches_sport(selected, activity_type):
+    return activity_type in SPORT_GROUPS.get(selected, (selected,))
+
+
+def period_bounds(track_period, now=None):
+    """(after, before, header) for the tracking period around now
+
+    after/before are epoch seconds - start of the period and start of the
+    next one - and header has the year/month/week the dashboard title uses,
+    all as getTrackingPeriodTimestamps() works them out on the board.
+    """
+    today = datetime.datetime.fromtimestamp(time.time() if now is None else now,
+                                            datetime.timezone.utc).date()
+    header = {'year': today.year}
+    if track_period == TRACK_WEEKLY:
+        start = today - datetime.timedelta(days=today.weekday())    # Monday
+        end = start + datetime.timedelta(days=7)
+        header['month'] = today.month
+        header['week'] = (today.timetuple().tm_yday - 1) // 7 + 1
+    elif track_period == TRACK_MONTHLY:
+        start = today.replace(day=1)
+        end = (start + datetime.timedelta(days=32)).replace(day=1)
+        header['month'] = today.month
+    else:
+        start = today.replace(month=1, day=1)
+        end = start.replace(year=start.year + 1)
+    return calendar.timegm(start.timetuple()), calendar.timegm(end.timetuple()), header
+
+
+def fetch_activities(client, access_token, after, before, per_page=PER_PAGE,
+                     in_flight=PAGES_IN_FLIGHT, max_pages=MAX_PAGES):
+    """Every activity between after and before, with up to in_flight pages requested at once
+
+    The page count isn't known up front. Page 1 goes out alone - most
+    ranges fit in it, and then that is the only request. A full first page
+    opens a sliding window: each full page lets the next ones go out, the
+    first short page ends the run, and pages past the end are dropped.
+    """
+    pages = {}
+    last_page = max_pages
+    with concurrent.futures.ThreadPoolExecutor(in_flight, thread_name_prefix="ibis-pages") as pool:
+        def request(page):
+            return pool.submit(client.activities, access_token, page=page, per_page=per_page,
+                               after=after, before=before)
+
+        running = {request(1): 1}
+        next_page = 2
+        while running:
+            finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                page = running.pop(future)
+                pages[page] = future.result() or []
+                if len(pages[page]) < per_page:
+                    last_page = min(last_page, page)
+            while len(running) < in_flight and next_page <= last_page and len(pages[page]) == per_page:
+                running[request(next_page)] = next_page
+                next_page += 1
+    return [activity for page in sorted(pages) if page <= last_page for activity in pages[page]]
+
+
+def summarize(activities, sport, kilometers=True):
+    """The dashboard numbers for activities of the selected sport
+
+    The board takes the first activity of the first page as "last"; with
+    'after' set Strava lists oldest first, so here it is the newest one by
+    start date instead.
+    """
+    factor = 1.0 if kilometers else KM_TO_MILES
+    summary = {'dist': 0.0, 'hours': 0.0, 'count': 0}
+    last = None
+    for activity in activities:
+        if not matches_sport(sport, activity.get('type')):
+            continue
+        km = (activity.get('distance') or 0) / 1000.0
+        hours = (activity.get('moving_time') or 0) / 3600.0
+        if not (0 < km < MAX_ACTIVITY_KM and 0 < hours < MAX_ACTIVITY_HOURS):
+            continue
+        summary['dist'] += km * factor
+        summary['hours'] += hours
+        summary['count'] += 1
+        if last is None or activity.get('start_date', '') > last.get('start_date', ''):
+            last = activity
+    summary['dist'] = round(summary['dist'], 2)
+    summary['hours'] = round(summary['hours'], 2)
+    if last:
+        summary.update(_last_activity(last, sport, factor))
+    return summary
+
+
+def _last_activity(activity, sport, factor):
+    km = activity['distance'] / 1000.0
+    seconds = int(activity['moving_time'])
+    date = _day_month(activity.get('start_date_local') or "")
+    last = {
+        'title': activity.get('name') or f"Untitled {sport}",
+        'date': date,
+        'line': f"{km:.1f} km  {seconds / 3600.0:.1f}h  {date}",
+        'lastDist': round(km * factor, 2),
+        'lastSecs': seconds,
+        'watts': int(activity.get('average_watts') or 0),
+    }
+    polyline = (activity.get('map') or {}).get('summary_polyline')
+    if polyline:
+        last['poly'] = polyline
+    return last
+
+
+def _day_month(start_date_local):
+    """'2025-02-02T14:30:00Z' -> '2 February', as the board formats it"""
+    if len(start_date_local) < 10:
+        return start_date_local
+    try:
+        month, day = int(start_date_local[5:7]), int(start_date_local[8:10])
+    except ValueError:
+        return start_date_local[:10]
+    return f"{day} {MONTH_NAMES[month - 1]}" if 1 <= month <= 12 else start_date_local[:10]
+
+
+def build_summary(client, config, now=None, store=None):
+    """Refresh the token, fetch the tracking period and add it up - blocks, run it on a worker
+
+    config is the wizard's settings dict. With an ActivityStore the store
+    is synced (from the earliest start of any tracking period, so switching
+    periods later costs nothing) and read instead of fetching the period;
+    about once a day the period is fetched whole to catch edits and
+    deletions (ActivityStore.reconcile).
+
+    The summary also carries the fresh access token for the board to cache
+    and, if Strava rotated it, the new refresh token (the old one stops
+    working).
+    """
+    now = int(time.time() if now is None else now)
+    token = client.refresh_token(config['clientID'], config['clientSecret'], config['refreshToken'])
+    after, before, header = period_bounds(config.get('trackPeriod', TRACK_YEARLY), now)
+    if store is None:
+        activities = fetch_activities(client, token['access_token'], after, before)
+    else:
+        since = min(period_bounds(period, now)[0]
+                    for period in (TRACK_YEARLY, TRACK_MONTHLY, TRACK_WEEKLY))
+        store.sync(client, token['access_token'], since)
+        store.reconcile(client, token['access_token'], after, before)
+        activities = store.activities(after, before, config.get('sport', "Run"))
+    summary = {'now': now, **summarize(activities, config.get('sport', "Run")), **header}
+    summary['updated'] = time.strftime("%d-%m-%y", time.gmtime(now))
+    summary['token'] = token['access_token']
+    summary['expiresAt'] = int(token.get('expires_at') or now + token.get('expires_in', 21600))
+    if token.get('refresh_token') and token['refresh_token'] != config['refreshToken']:
+        summary['refreshToken'] = token['refresh_token']
+    return summary
+
+
+def summary_command(summary):
+    """The SET_SUMMARY line for summary
+
+    The polyline goes over as a precompiled route (see ibis_route). Should
+    that not fit the board's buffer, the route is simplified harder, and
+    left out as a last resort.
+    """
+    summary = dict(summary)
+    polyline = summary.pop('poly', None)
+    if polyline:
+        for tolerance in ROUTE_TOLERANCES:
+            line = _summary_line({**summary, 'route': compile_route(polyline, tolerance)})
+            if len(line.encode('utf-8')) <= MAX_COMMAND_BYTES:
+                return line
+    return _summary_line(summary)
+
+
+def _summary_line(summary):
+    return f"SET_SUMMARY:{json.dumps(summary, separators=(',', ':'), ensure_ascii=False)}"
+
@@ -0,0 +1,182 @@
+"""
+🪶 Ibis Tasks 🪶 - Background work for the Tk window
+
+Tk may only be touched from the thread running mainloop(). TkExecutor runs
+the blocking parts of the wizard (serial commands, HTTP) on worker threads
+and hands back a concurrent.futures.Future. Results come back to the window
+only through a root.after pump: on_done / on_error run on the Tk thread,
+between two frames, never from a worker and never from a nested event loop.
+
+AnimationClock is the one timer behind everything that moves on screen.
+Animations register a step and an interval instead of running their own
+after() chains, so there is never more than one pending after handle for
+all of them - and none at all while nothing is animating.
+"""
+
+import concurrent.futures
+import math
+import queue
+import time
+
+WORKERS = 4
+BUSY_POLL_MS = 16      # while work is running: results land within a frame
+IDLE_POLL_MS = 100     # otherwise just keep an ear out for call_soon()
+FRAME_BUDGET_MS = 16   # one tick of the clock should never cost more than a frame
+
+
+class TkExecutor:
+    """Thread pool whose callbacks are delivered on the Tk thread"""
+
+    def __init__(self, root, max_workers=WORKERS):
+        self.root = root
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers,
+                                                           thread_name_prefix="ibis-worker")
+        self._calls = queue.SimpleQueue()
+        self._running = 0
+        self._pump_id = None
+        self._closed = False
+
+    def start(self):
+        self._schedule(IDLE_POLL_MS)
+        return self
+
+    def submit(self, fn, *args, on_done=None, on_error=None):
+        """Run fn(*args) on a worker; on_done(result) / on_error(exc) run on the Tk thread"""
+        future = self._pool.submit(fn, *args)
+        self._running += 1
+        future.add_done_callback(lambda f: self._calls.put((self._settle, (f, on_done, on_error))))
+        if self._pump_id is not None:
+            # Poll at frame rate from now on instead of waiting out the idle tick
+            self.root.after_cancel(self._pump_id)
+            self._pump_id = None
+        self._schedule(BUSY_POLL_MS)
+        return future
+
+    def call_soon(self, fn, *args):
+        """Run fn(*args) on the Tk thread - safe to call from any thread"""
+        self._calls.put((fn, args))
+
+    def shutdown(self):
+        self._closed = True
+        if self._pump_id is not None:
+            try:
+                self.root.after_cancel(self._pump_id)
+            except Exception:
+                pass
+            self._pump_id = None
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _settle(self, future, on_done, on_error):
+        self._running -= 1
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            if on_error:
+                on_error(error)
+            else:
+                print(f"Background task failed: {error}")
+        elif on_done:
+            on_done(future.result())
+
+    def _schedule(self, delay):
+        if self._pump_id is None and not self._closed:
+            self._pump_id = self.root.after(delay, self._pump)
+
+    def _pump(self):
+        self._pump_id = None
+        while True:
+            try:
+                fn, args = self._calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"Callback error: {e}")
+        self._schedule(BUSY_POLL_MS if self._running else IDLE_POLL_MS)
+
+
+class AnimationClock:
+    """Single after() chain driving every animation in the window"""
+
+    def __init__(self, root, budget_ms=FRAME_BUDGET_MS):
+        self.root = root
+        self.budget_ms = budget_ms
+        self._animations = {}    # name -> [step, interval_s, next_due]
+        self._after_id = None
+        self._ticking = False
+        self._expected = 0.0
+        self.frames = 0
+        self.over_budget = 0
+        self.worst_ms = 0.0
+        self.worst_late_ms = 0.0
+
+    def add(self, name, step, interval_ms):
+        """Call step() every interval_ms until remove(name) - adding a name again replaces it"""
+        self._animations[name] = [step, interval_ms / 1000, time.perf_counter()]
+        if self._after_id is not None:
+            # Pull the tick forward so the new animation shows its first frame now
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self._schedule(0)
+
+    def remove(self, name):
+        self._animations.pop(name, None)
+        if not self._animations and self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def running(self, name):
+        return name in self._animations
+
+    def stop(self):
+        self._animations.clear()
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'over_budget': self.over_budget,
+            'worst_ms': round(self.worst_ms, 2),
+            'worst_late_ms': round(self.worst_late_ms, 2),
+        }
+
+    def _schedule(self, delay_ms):
+        # While ticking, _tick() reschedules itself once it has run every step
+        if self._after_id is None and not self._ticking and self._animations:
+            self._expected = time.perf_counter() + delay_ms / 1000
+            self._after_id = self.root.after(delay_ms, self._tick)
+
+    def _tick(self):
+        self._after_id = None
+        self._ticking = True
+        start = time.perf_counter()
+        try:
+            for name, animation in list(self._animations.items()):
+                step, interval, due = animation
+                if start < due:
+                    continue
+                # Skip missed frames rather than playing them back in a burst
+                animation[2] = max(due + interval, start)
+                try:
+                    step()
+                except Exception as e:
+                    print(f"Animation {name} failed: {e}")
+                    self._animations.pop(name, None)
+        finally:
+            self._ticking = False
+        spent = (time.perf_counter() - start) * 1000
+        self.frames += 1
+        self.worst_ms = max(self.worst_ms, spent)
+        self.worst_late_ms = max(self.worst_late_ms, (start - self._expected) * 1000)
+        if spent > self.budget_ms:
+            self.over_budget += 1
+        if self._animations:
+            next_due = min(animation[2] for animation in self._animations.values())
+            self._schedule(max(0, math.ceil((next_due - time.perf_counter()) * 1000)))
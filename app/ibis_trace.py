@@ -0,0 +1,122 @@
+"""
+🪶 Ibis Trace 🪶 - Opt-in instrumentation for the Ibis Setup app
+
+Off unless asked for: set IBIS_TRACE=trace.jsonl before starting the app,
+or press Ctrl+Shift+D for the debug panel. While on, Trace records:
+
+- stall:   the Tk thread missed a heartbeat by ms (the window was frozen)
+- command: one BoardLink.command() - write, first byte and terminator
+           times, bytes in/out and retries
+- step / action / action_end: what the wizard was doing at the time
+
+Every event carries the wizard action that was running, so a freeze or a
+slow command can be traced back to the click that caused it. Events are
+kept in memory for the panel and, with IBIS_TRACE, appended to the file
+as JSON lines as they happen.
+"""
+
+import collections
+import json
+import threading
+import time
+
+HEARTBEAT_MS = 50       # Tk-thread heartbeat while tracing
+STALL_MS = 50           # a heartbeat this late is recorded as a stall
+TRACE_EVENTS = 2000     # kept in memory for the panel / export
+
+
+class Trace:
+    """Thread-safe event log for UI stalls and board commands"""
+
+    def __init__(self):
+        self.enabled = False
+        self.action = None
+        self.events = collections.deque(maxlen=TRACE_EVENTS)
+        self.version = 0           # bumped on every event - lets the panel skip redraws
+        self._lock = threading.Lock()
+        self._sink = None
+        self._clock = None
+        self._last_beat = None
+
+    def start(self, clock, path=None):
+        """Start the heartbeat on the window's AnimationClock; path also streams events to disk"""
+        if path and not self._sink:
+            self._sink = open(path, 'a', encoding='utf-8')
+        if not self.enabled:
+            self.enabled = True
+            self._clock = clock
+            self._last_beat = None
+            clock.add('heartbeat', self._beat, HEARTBEAT_MS)
+        return self
+
+    def stop(self):
+        if self._clock:
+            self._clock.remove('heartbeat')
+        self.enabled = False
+        with self._lock:
+            if self._sink:
+                self._sink.close()
+                self._sink = None
+
+    def begin(self, action):
+        self.action = action
+        self.record('action', name=action)
+
+    def end(self):
+        if self.action:
+            self.record('action_end', name=self.action)
+            self.action = None
+
+    def record(self, kind, **fields):
+        if not self.enabled:
+            return
+        event = {'t': round(time.time(), 3), 'kind': kind, 'action': self.action, **fields}
+        with self._lock:
+            self.events.append(event)
+            self.version += 1
+            if self._sink:
+                self._sink.write(json.dumps(event) + "\n")
+                self._sink.flush()
+
+    def command(self, timing):
+        """BoardLink.on_command hook - runs on whichever thread sent the command"""
+        self.record('command', **timing)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.events)
+
+    def clear(self):
+        with self._lock:
+            self.events.clear()
+            self.version += 1
+
+    def export(self, path):
+        """Write the events in memory to path as JSON lines, return how many"""
+        events = self.snapshot()
+        with open(path, 'w', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+        return len(events)
+
+    def summary(self, events=None):
+        events = self.snapshot() if events is None else events
+        stalls = [e['ms'] for e in events if e['kind'] == 'stall']
+        commands = [e for e in events if e['kind'] == 'command']
+        slowest = max(commands, key=lambda e: e['total_s'], default=None)
+        return {
+            'stalls': len(stalls),
+            'worst_stall_ms': max(stalls, default=0.0),
+            'commands': len(commands),
+            'failed': sum(1 for e in commands if not e['ok']),
+            'retries': sum(e['retries'] for e in commands),
+            'slowest': slowest and f"{slowest['command']} {slowest['total_s']:.2f}s",
+        }
+
+    def _beat(self):
+        now = time.perf_counter()
+        if self._last_beat is not None:
+            late = (now - self._last_beat) * 1000 - HEARTBEAT_MS
+            if late >= STALL_MS:
+                self.record('stall', ms=round(late, 1))
+        self._last_beat = now
@@ -52,7 +52,9 @@
 #include <WiFi.h>
 #include <HTTPClient.h>
 #include <ArduinoJson.h>
+#include "mbedtls/base64.h"
 #include <time.h>
+#include <sys/time.h>
 #include <SPI.h>
 #include <GxEPD2_7C.h>
 
@@ -264,6 +266,11 @@ String accessToken = "";
 String lastTitle = "";
 String lastLine = "";
 String lastPolyline = "";
+// LAST ROUTE precompiled by the Ibis Setup app (SET_SUMMARY "route"): x,y
+// byte pairs already projected into the route box, drawn instead of lastPolyline
+#define ROUTE_MAX_BYTES 1536
+uint8_t routeXY[ROUTE_MAX_BYTES];
+size_t routeLen = 0;
 float lastDist = 0;        // Last activity distance in km/mi (dependent on KILOMETERS value)
 int lastMovingSecs = 0;       // Last activity moving time in seconds
 int lastAvgWatts = 0;         // Last activity average power (watts) - mainly for rides
@@ -1144,6 +1151,7 @@ void fetchStravaData() {
     lastTitle = "No Strava";
     lastLine = "Configure in Ibis Setup app";
     lastPolyline = "";
+    routeLen = 0;
     return;
   }
 
@@ -1157,6 +1165,7 @@ void fetchStravaData() {
   lastTitle = "";
   lastLine = "";
   lastPolyline = "";
+  routeLen = 0;
   lastDist = 0;
   lastMovingSecs = 0;
   lastAvgWatts = 0;   // <-- added
@@ -1616,7 +1625,19 @@ void drawDashboard() {
     int polylineAreaW = colW;
     int polylineAreaH = routeH - titleAreaHeight;
     
-    if (lastPolyline.length() > 0) {
+    if (routeLen >= 4) {
+      // Already projected and simplified by the app - just join the dots
+      int drawX = polylineAreaX + 2;
+      int drawY = polylineAreaY + 2;
+      for (size_t i = 2; i + 1 < routeLen; i += 2) {
+        int px0 = drawX + routeXY[i - 2];
+        int py0 = drawY + routeXY[i - 1];
+        int px1 = drawX + routeXY[i];
+        int py1 = drawY + routeXY[i + 1];
+        display.drawLine(px0, py0, px1, py1, GxEPD_BLACK);
+        display.drawLine(px0 + 1, py0, px1 + 1, py1, GxEPD_BLACK);
+      }
+    } else if (lastPolyline.length() > 0) {
       std::vector<Point> pts = decodePolyline(lastPolyline);
       
       if (pts.size() >= 2) {
@@ -2054,6 +2075,22 @@ void processSerialCommand(String command) {
       }
     }
   }
+  else if (command.startsWith("SET_SUMMARY:")) {
+    // "Finish Setup" when the app could reach Strava itself - no WiFi needed
+    USBSerial.println("\n=== FINISH SETUP ===");
+    loadConfiguration();
+    if (saveSummaryFromSerial(command.substring(12))) {
+      printBatteryStatus();
+      USBSerial.println("Drawing dashboard...");
+      drawDashboard();
+      USBSerial.println("DASHBOARD_DRAWN");
+
+      if (!PMU.isVbusIn()) {
+        USBSerial.println(">>> On battery - will sleep <<<");
+        sleepRequested = true;
+      }
+    }
+  }
   else if (command == "SHOW_SETUP_SCREEN") {
     // Draw setup screen (used after wipe)
     USBSerial.println("Drawing setup screen...");
@@ -2189,6 +2226,78 @@ void saveConfigFromSerial(String jsonStr) {
   USBSerial.println("SUCCESS");
 }
 
+// SET_SUMMARY - the Ibis Setup app already added up the tracking period
+// on the PC, so the board takes the numbers as they are and skips WiFi.
+// Keys (all but "now" optional): now (epoch), dist, hours, count, title,
+// date, line, lastDist, lastSecs, watts, route (or poly), updated, year, month, week,
+// token + expiresAt (a fresh access token), refreshToken (if Strava rotated it)
+bool saveSummaryFromSerial(String jsonStr) {
+  USBSerial.println("Parsing summary...");
+  USBSerial.print("JSON length: ");
+  USBSerial.println(jsonStr.length());
+
+  JsonDocument doc;
+  DeserializationError error = deserializeJson(doc, jsonStr);
+
+  if (error || !doc["now"].is<long>()) {
+    USBSerial.print("JSON error: ");
+    USBSerial.println(error ? error.c_str() : "no time");
+    USBSerial.println("ERROR");
+    return false;
+  }
+
+  // The PC's clock stands in for NTP
+  struct timeval tv = { (time_t)doc["now"].as<long>(), 0 };
+  settimeofday(&tv, NULL);
+  lastNtpSyncEpoch = tv.tv_sec;
+  lastStravaFetchEpoch = tv.tv_sec;
+
+  distDone = doc["dist"] | 0.0f;
+  timeHours = doc["hours"] | 0.0f;
+  activitiesCount = doc["count"] | 0;
+  lastTitle = doc["title"] | "";
+  lastDateStr = doc["date"] | "";
+  lastLine = doc["line"] | "";
+  lastDist = doc["lastDist"] | 0.0f;
+  lastMovingSecs = doc["lastSecs"] | 0;
+  lastAvgWatts = doc["watts"] | 0;
+  lastPolyline = doc["poly"] | "";
+  routeLen = 0;
+  if (doc["route"].is<const char*>()) {
+    const char* route = doc["route"].as<const char*>();
+    if (mbedtls_base64_decode(routeXY, sizeof(routeXY), &routeLen,
+                              (const unsigned char*)route, strlen(route)) != 0) {
+      USBSerial.println("  - Route unreadable, skipped");
+      routeLen = 0;
+    }
+  }
+  lastUpdateTime = doc["updated"] | "";
+  dashYear = doc["year"] | dashYear;
+  dashMonth = doc["month"] | dashMonth;
+  dashWeek = doc["week"] | dashWeek;
+
+  if (doc["token"].is<const char*>()) {
+    strncpy(cachedAccessToken, doc["token"].as<const char*>(), sizeof(cachedAccessToken) - 1);
+    cachedAccessToken[sizeof(cachedAccessToken) - 1] = '\0';
+    tokenExpiresAt = doc["expiresAt"] | 0L;
+    USBSerial.println("  - Access token cached");
+  }
+  if (doc["refreshToken"].is<const char*>()) {
+    // Strava hands out a new refresh token now and then and retires the old one
+    REFRESH_TOKEN = doc["refreshToken"].as<String>();
+    preferences.begin("config", false);
+    preferences.putString("refreshToken", REFRESH_TOKEN);
+    preferences.end();
+    USBSerial.println("  - refreshToken saved");
+  }
+
+  USBSerial.println("SUMMARY_OK");
+  USBSerial.print("Activities: "); USBSerial.println(activitiesCount);
+  USBSerial.print("Distance: "); USBSerial.print(distDone); USBSerial.println(distUnit);
+  USBSerial.print("Time: "); USBSerial.print(timeHours); USBSerial.println(" hours");
+  return true;
+}
+
 void wipeConfig() {
   // Called by WIPE_CONFIG command - clears everything but does NOT draw
   // (Used internally by EXE when updating settings)
@@ -2219,6 +2328,7 @@ void wipeConfig() {
   lastTitle = "";
   lastLine = "";
   lastPolyline = "";
+  routeLen = 0;
   lastUpdateTime = "";
   lastDist = 0;
   lastMovingSecs = 0;